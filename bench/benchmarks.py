@@ -0,0 +1,299 @@
+''' Benchmarks of the parsing, serialization and kinematics hot paths.
+
+They run on synthetic packets, so no robot is needed. Run them from the
+root of the repository with
+
+    python -m bench.benchmarks
+
+Each benchmark reports the operations per second and the percentiles of
+the time per call, and its median time per call is compared with the one
+in bench/baseline.json. The median is used because the mean is dominated
+by the outliers of e.g. the RTDE round trip. The exit status is 1 if an
+operation is slower than the baseline by more than the tolerance, or has
+no baseline. Use --save to store the current results as the new baseline.
+'''
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+
+from vsurt.urmsgs.urmsgs import cUrMessage, cUrJointData, cUrCartesianInfo
+from vsurt.urmsgs.urmsgs import cUrKinematicsInfo, cUrConfigurationData
+from vsurt.urmsgs.urmsgs import cUrRobotModeData, getRobotStatePacketArray
+from vsurt.urmsgs.rtde import serialize, rtde
+from vsurt.urmsgs.rtde.rtde_server import RTDEServer
+from vsurt.urdk.urdk import cUrdk, forward_kinematics
+from vsurt.urdk.urdk import forward_kinematics_batch
+from vsurt.urdk.kinematicdata import cUR5
+from test.builders import data_config, data_payload
+from test.builders import unpack_joint_data_reference
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+# A wide RTDE output recipe, similar to the ones used to log the robot.
+RTDE_RECIPE = [
+    ('timestamp', 'DOUBLE'),
+    ('target_q', 'VECTOR6D'),
+    ('target_qd', 'VECTOR6D'),
+    ('target_qdd', 'VECTOR6D'),
+    ('target_current', 'VECTOR6D'),
+    ('target_moment', 'VECTOR6D'),
+    ('actual_q', 'VECTOR6D'),
+    ('actual_qd', 'VECTOR6D'),
+    ('actual_current', 'VECTOR6D'),
+    ('joint_control_output', 'VECTOR6D'),
+    ('actual_TCP_pose', 'VECTOR6D'),
+    ('actual_TCP_speed', 'VECTOR6D'),
+    ('actual_TCP_force', 'VECTOR6D'),
+    ('target_TCP_pose', 'VECTOR6D'),
+    ('target_TCP_speed', 'VECTOR6D'),
+    ('actual_digital_input_bits', 'UINT64'),
+    ('joint_temperatures', 'VECTOR6D'),
+    ('robot_mode', 'INT32'),
+    ('joint_mode', 'VECTOR6INT32'),
+    ('safety_mode', 'INT32'),
+    ('speed_scaling', 'DOUBLE'),
+    ('runtime_state', 'UINT32'),
+    ('output_int_register_0', 'INT32'),
+    ('output_double_register_0', 'DOUBLE'),
+]
+
+
+def joint_data_packet():
+    jd = cUrJointData()
+    jd.q_actual_ = np.random.rand(6)
+    jd.q_target_ = np.random.rand(6)
+    jd.qd_actual_ = np.random.rand(6)
+    jd.i_actual_ = np.random.rand(6)
+    jd.v_actual_ = np.random.rand(6)
+    jd.t_motor_ = np.random.rand(6)
+    jd.t_micro_ = np.random.rand(6)
+    jd.joint_mode_ = np.full((6, ), 253)
+    return jd.pack()
+
+
+def robot_state_message():
+    ''' A ROBOT_STATE message with the packets which have a decoder.'''
+    cinf = cUrCartesianInfo()
+    cinf.tcp_pose_ = np.random.rand(6)
+    cinf.tcp_offset_ = np.random.rand(6)
+    data = b''.join([
+        cUrRobotModeData().pack(),
+        joint_data_packet(),
+        cinf.pack(),
+        cUrKinematicsInfo().pack(),
+        cUrConfigurationData().pack(),
+    ])
+    data = struct.pack('>iB', len(data) + 5, 16) + data
+    return cUrMessage().unpack(data)
+
+
+def rtde_round_trip(_frequency=0):
+    ''' Returns a function which writes an input register in a local RTDE
+    server and waits until the server echoes it in the output state, i.e.
+    the latency of a control loop step. The server and the connection live
+    as long as the process.'''
+    server = RTDEServer(frequency=_frequency).start()
+    con = rtde.RTDE('127.0.0.1', server.port)
+    con.connect()
+    con.send_output_setup(['timestamp', 'actual_q', 'output_int_register_0'])
+    inputs = con.send_input_setup(['input_int_register_0'])
+    con.send_start()
+    counter = [0]
+
+    def step():
+        counter[0] += 1
+        inputs.input_int_register_0 = counter[0]
+        con.send(inputs)
+        while con.receive(latest=True).output_int_register_0 != counter[0]:
+            pass
+
+    return step
+
+
+def prepared(_function):
+    ''' setup of a benchmark which needs no preparation.'''
+    return lambda: _function
+
+
+def benchmarks():
+    ''' Returns a list of (name, setup) with the operations to time. setup()
+    prepares the operation and returns the function which runs it once, so
+    the benchmarks which are filtered out are not set up, e.g. the RTDE
+    server of the round trip.'''
+    result = []
+
+    packet = joint_data_packet()
+    jd = cUrJointData()
+    result.append(('cUrJointData.unpack',
+                   prepared(lambda: jd.unpack(packet))))
+    result.append(('JOINT_DATA per-field unpack',
+                   prepared(lambda: unpack_joint_data_reference(packet))))
+
+    msg = robot_state_message()
+    result.append(('getRobotStatePacketArray',
+                   prepared(lambda: getRobotStatePacketArray(msg))))
+
+    config = data_config(RTDE_RECIPE)
+    payload = data_payload(config)
+    state = config.unpack(payload)
+    result.append(('DataConfig.unpack',
+                   prepared(lambda: config.unpack(payload))))
+    result.append(('DataConfig.pack', prepared(lambda: config.pack(state))))
+
+    inputs = serialize.DataConfig.unpack_recipe(b'\x02' +
+                                                b','.join([b'DOUBLE'] * 7 +
+                                                          [b'INT32'] * 2))
+    inputs.names = ['input_double_register_%d' % i for i in range(7)] + \
+        ['input_int_register_%d' % i for i in range(2)]
+    command = serialize.DataObject.create_empty(inputs.names, inputs.id)
+    for name in inputs.names:
+        setattr(command, name, 1)
+    writer = inputs.writer()
+    qd = np.random.rand(6)
+    result.append(('input DataConfig.pack',
+                   prepared(lambda: b'\x00\x00U' + inputs.pack(command))))
+    result.append(('InputWriter.pack',
+                   prepared(lambda: writer.pack(
+                       (qd[0], qd[1], qd[2], qd[3], qd[4], qd[5], 1.0, 1,
+                        1)))))
+    # a float vector which covers the integer registers as well
+    command_vector = np.ones(9)
+    result.append(('InputWriter.pack numpy',
+                   prepared(lambda: writer.pack(command_vector))))
+    result.append(('DataObject.create_empty',
+                   prepared(lambda: serialize.DataObject.create_empty(
+                       config.names, 1))))
+
+    result.append(('RTDE round trip', rtde_round_trip))
+
+    # the model is built once, by the first cUrdk benchmark run
+    models = []
+
+    def urmodel():
+        if not models:
+            models.append(cUrdk(_model='ur5', _tcp_offset=np.zeros(6)))
+        return models[0]
+
+    q = np.random.rand(6)
+    # 100 configurations per call, in a loop and in a batch
+    qs = np.random.rand(100, 6)
+
+    def forward_kinematics_one():
+        model = urmodel()
+        return lambda: model(q)
+
+    def forward_kinematics_loop():
+        model = urmodel()
+        return lambda: [model(qi) for qi in qs]
+
+    def forward_kinematics_many():
+        model = urmodel()
+        return lambda: model.fk_batch(qs)
+
+    def jacobian():
+        model = urmodel()
+        return lambda: model.jac(q)
+
+    result.append(('cUrdk forward kinematics', forward_kinematics_one))
+    result.append(('cUrdk forward kinematics x100', forward_kinematics_loop))
+    result.append(('cUrdk.fk_batch x100', forward_kinematics_many))
+    result.append(('cUrdk jacobian', jacobian))
+    # the same batch against the per-configuration numpy path, which does
+    # not need vsdk
+    result.append(('forward_kinematics x100',
+                   prepared(lambda: [forward_kinematics(cUR5, qi)
+                                     for qi in qs])))
+    result.append(('forward_kinematics_batch x100',
+                   prepared(lambda: forward_kinematics_batch(cUR5, qs))))
+
+    return result
+
+
+def run(_function, _samples, _warmup=100):
+    ''' Time _samples calls of _function.
+
+    Returns a dict with the operations per second and the percentiles of
+    the time per call in microseconds.
+    '''
+    for _ in range(_warmup):
+        _function()
+    timer = time.perf_counter
+    dt = np.empty((_samples, ))
+    for i in range(_samples):
+        t0 = timer()
+        _function()
+        dt[i] = timer() - t0
+    dt *= 1.0e6
+    return {
+        'ops': _samples / np.sum(dt) * 1.0e6,
+        'p50': float(np.percentile(dt, 50)),
+        'p90': float(np.percentile(dt, 90)),
+        'p99': float(np.percentile(dt, 99)),
+    }
+
+
+def main(_argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.25,
+                        help='allowed relative loss of speed, on the '
+                        'median time per call')
+    parser.add_argument('--save',
+                        action='store_true',
+                        help='store the results as the new baseline')
+    parser.add_argument('--filter',
+                        default='',
+                        help='only run the benchmarks containing this text')
+    args = parser.parse_args(_argv)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    missing = []
+    print('{:32s} {:>12s} {:>9s} {:>9s} {:>9s} {:>9s}'.format(
+        'benchmark', 'ops/s', 'p50 us', 'p90 us', 'p99 us', 'vs base'))
+    for name, setup in benchmarks():
+        if args.filter not in name:
+            continue
+        res = run(setup(), args.samples)
+        results[name] = res
+        ratio = 'none'
+        if name in baseline:
+            r = baseline[name]['p50'] / res['p50']
+            ratio = '{:8.2f}x'.format(r)
+            if r < 1.0 - args.tolerance:
+                regressions.append(name)
+        else:
+            missing.append(name)
+        print('{:32s} {:12.0f} {:9.2f} {:9.2f} {:9.2f} {:>9s}'.format(
+            name, res['ops'], res['p50'], res['p90'], res['p99'], ratio))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        return 0
+
+    if missing:
+        print('No baseline, record it with --save: ' + ', '.join(missing))
+    if regressions:
+        print('Slower than the baseline: ' + ', '.join(regressions))
+    if missing or regressions:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
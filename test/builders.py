@@ -0,0 +1,86 @@
+''' Builders of UR and RTDE data shared by the tests and the benchmarks.'''
+import struct
+import numpy as np
+from vsurt.urmsgs.urmsgs import cUrJointData
+from vsurt.urmsgs.urcapture import cUrCaptureWriter, RTDE
+from vsurt.urmsgs.rtde import serialize
+
+RECIPE = [
+    ('timestamp', 'DOUBLE'),
+    ('actual_q', 'VECTOR6D'),
+    ('actual_TCP_force', 'VECTOR6D'),
+    ('elbow_position', 'VECTOR3D'),
+    ('joint_mode', 'VECTOR6INT32'),
+    ('actual_joint_voltage', 'VECTOR6D'),
+    ('robot_mode', 'INT32'),
+    ('runtime_state', 'UINT32'),
+    ('actual_digital_input_bits', 'UINT64'),
+    ('output_bit_register_64', 'UINT8'),
+]
+
+
+def joint_state_message(_q):
+    ''' Returns a ROBOT_STATE message with a JOINT_DATA packet at _q'''
+    jd = cUrJointData()
+    jd.q_actual_ = _q
+    jd.q_target_ = _q
+    jd.qd_actual_ = np.zeros(6)
+    jd.i_actual_ = np.zeros(6)
+    jd.v_actual_ = np.zeros(6)
+    jd.t_motor_ = np.zeros(6)
+    jd.t_micro_ = np.zeros(6)
+    jd.joint_mode_ = np.zeros(6)
+    data = jd.pack()
+    return struct.pack('>iB', len(data) + 5, 16) + data
+
+
+def unpack_joint_data_reference(_data):
+    ''' Per-field decoder of JOINT_DATA, the reference of the numpy decoder
+    of cUrJointData.'''
+    fmtsz = 6 * (3 * (('>d', 8), ) + 4 * (('>f', 4), ) + (('>B', 1), ))
+    rd = 5
+    d = []
+    for (fmt, sz) in fmtsz:
+        d.append(struct.unpack(fmt, _data[rd:rd + sz])[0])
+        rd += sz
+    return [np.array(d[i::8]) for i in range(8)]
+
+
+def data_config(_recipe, _id=1):
+    types = ','.join(t for _, t in _recipe)
+    config = serialize.DataConfig.unpack_recipe(
+        struct.pack('>B', _id) + types.encode('utf-8'))
+    config.names = [n for n, _ in _recipe]
+    return config
+
+
+def data_payload(_config):
+    values = [_config.id]
+    for t in _config.types:
+        size = serialize.get_item_size(t)
+        if t in ('VECTOR6D', 'VECTOR3D', 'DOUBLE'):
+            values.extend(np.random.rand(size))
+        else:
+            values.extend(np.random.randint(0, 100, size))
+    return struct.pack(_config.fmt, *values)
+
+
+def rtde_frame(_command, _payload):
+    return struct.pack('>HB', len(_payload) + 3, ord(_command)) + _payload
+
+
+def rtde_capture(_filename, _recipe, _n):
+    ''' Writes a RTDE capture with the setup of _recipe and _n data
+    packages whose timestamp field is the package number. Returns the
+    DataConfig of the recipe.'''
+    config = data_config(_recipe)
+    types = ','.join(config.types).encode('utf-8')
+    with cUrCaptureWriter(_filename, RTDE, 30004) as writer:
+        writer.write(rtde_frame('V', b'\x01'), 0.0)
+        writer.write(rtde_frame('O', b'\x01' + types), 0.0)
+        writer.write(rtde_frame('S', b'\x01'), 0.0)
+        for i in range(_n):
+            payload = bytearray(data_payload(config))
+            struct.pack_into('>d', payload, 1, float(i))
+            writer.write(rtde_frame('U', bytes(payload)), 0.002 * i)
+    return config
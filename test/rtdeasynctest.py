@@ -0,0 +1,125 @@
+''' Test the asyncio RTDE client against replayed captures.'''
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from vsurt.urmsgs.rtde.rtde_async import AsyncRTDE, RTDEError
+from vsurt.urmsgs.rtde.rtde_server import RTDEServer
+from vsurt.urmsgs.urcapture import cUrReplayServer
+from test.builders import RECIPE, rtde_capture
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory_ = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_)
+
+    def test_many_connections(self):
+        ''' Follow two RTDE servers in the same event loop
+        '''
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        filename = os.path.join(self.directory_, 'capture.bin')
+        rtde_capture(filename, RECIPE, 50)
+
+        async def follow(_port):
+            async with AsyncRTDE('127.0.0.1', _port) as con:
+                await con.send_output_setup(names, types)
+                self.assertTrue(await con.send_start())
+                return [state.timestamp async for state in con]
+
+        async def run(_ports):
+            return await asyncio.gather(*[follow(p) for p in _ports])
+
+        with cUrReplayServer(filename, _speed=5.0) as server_1, \
+                cUrReplayServer(filename, _speed=5.0) as server_2:
+            result = asyncio.run(run([server_1.port_, server_2.port_]))
+        self.assertEqual(result, [list(range(50))] * 2)
+
+    def test_latest(self):
+        ''' Only the newest package is decoded
+        '''
+        names = [n for n, _ in RECIPE]
+        filename = os.path.join(self.directory_, 'capture.bin')
+        rtde_capture(filename, RECIPE, 100)
+
+        async def run(_port):
+            async with AsyncRTDE('127.0.0.1', _port) as con:
+                await con.send_output_setup(names)
+                await con.send_start()
+                await asyncio.sleep(0.3)
+                state = await con.receive(latest=True)
+                return state.timestamp, con.skipped_packages
+
+        with cUrReplayServer(filename, _speed=None) as server:
+            timestamp, skipped = asyncio.run(run(server.port_))
+        self.assertEqual(timestamp, 99)
+        self.assertEqual(skipped, 99)
+
+    def test_errors(self):
+        ''' Failures raise instead of exiting
+        '''
+        names = [n for n, _ in RECIPE]
+        filename = os.path.join(self.directory_, 'capture.bin')
+        rtde_capture(filename, RECIPE, 1)
+
+        async def run(_port):
+            async with AsyncRTDE('127.0.0.1', _port) as con:
+                with self.assertRaises(RTDEError):
+                    await con.receive()
+                with self.assertRaises(RTDEError):
+                    await con.send_output_setup(names, ['DOUBLE'])
+
+        with cUrReplayServer(filename, _speed=None) as server:
+            asyncio.run(run(server.port_))
+
+    def test_rejected_setup(self):
+        ''' A rejected setup raises RTDEError and keeps the connection
+        '''
+        async def run(_port):
+            async with AsyncRTDE('127.0.0.1', _port) as con:
+                with self.assertRaises(RTDEError):
+                    await con.send_output_setup(['no_such_variable'])
+                with self.assertRaises(RTDEError):
+                    await con.send_input_setup(['no_such_register'])
+                self.assertTrue(con.is_connected())
+                await con.send_output_setup(['timestamp', 'actual_q'])
+                self.assertTrue(await con.send_start())
+                state = await con.receive()
+                self.assertEqual(len(state.actual_q), 6)
+
+        with RTDEServer() as server:
+            asyncio.run(run(server.port))
+
+    def test_many_recipes(self):
+        ''' Each package is decoded with the recipe of its id
+        '''
+        async def run(_port):
+            async with AsyncRTDE('127.0.0.1', _port) as con:
+                await con.send_output_setup(['timestamp', 'actual_q'])
+                await con.send_output_setup(['robot_mode'], frequency=50)
+                await con.send_start()
+                states = {}
+                while len(states) < 2:
+                    state = await con.receive()
+                    states[state.recipe_id] = state
+                return states
+
+        with RTDEServer() as server:
+            states = asyncio.run(run(server.port))
+        self.assertEqual(len(states[1].actual_q), 6)
+        self.assertIsInstance(states[2].robot_mode, int)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
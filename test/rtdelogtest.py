@@ -0,0 +1,125 @@
+''' Test the CSV and binary logs of RTDE data.'''
+import os
+import shutil
+import tempfile
+import numpy as np
+import unittest
+from vsurt.urmsgs.rtde.csv_reader import CSVReader, CSVColumnReader
+from vsurt.urmsgs.rtde.csv_reader import BinaryReader
+from vsurt.urmsgs.rtde.csv_writer import CSVWriter, BinaryWriter
+from test.builders import RECIPE, data_config, data_payload
+
+
+def random_states(_n):
+    config = data_config(RECIPE)
+    config.compile()
+    return [config.unpack(data_payload(config)) for _ in range(_n)]
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory_ = tempfile.mkdtemp()
+        self.names_ = [n for n, _ in RECIPE]
+        self.types_ = [t for _, t in RECIPE]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_)
+
+    def write_csv(self, _states):
+        filename = os.path.join(self.directory_, 'log.csv')
+        with open(filename, 'w', newline='') as f:
+            writer = CSVWriter(f, self.names_, self.types_)
+            writer.writeheader()
+            for state in _states:
+                writer.writerow(state)
+        return filename
+
+    def test_csv_columns(self):
+        ''' Read only some columns in chunks
+        '''
+        states = random_states(1000)
+        filename = self.write_csv(states)
+        with open(filename) as f:
+            reader = CSVColumnReader(f, ['actual_q', 'robot_mode'],
+                                     chunk_size=64)
+            chunks = list(reader.chunks())
+        self.assertEqual(len(chunks), 16)
+        q = np.concatenate([c['actual_q'] for c in chunks])
+        mode = np.concatenate([c['robot_mode'] for c in chunks])
+        self.assertTrue(np.allclose(q, [s.actual_q for s in states]))
+        self.assertTrue(np.array_equal(mode, [s.robot_mode for s in states]))
+
+        with open(filename) as f:
+            data = CSVColumnReader(f).read()
+        self.assertEqual(len(data), 32)
+        self.assertTrue(
+            np.allclose(data['elbow_position_2'],
+                        [s.elbow_position[2] for s in states]))
+        with open(filename) as f:
+            data = CSVColumnReader(f, self.names_).read()
+        self.assertEqual(data['elbow_position'].shape, (1000, 3))
+        self.assertEqual(data['output_bit_register_64'].shape, (1000, ))
+        with open(filename) as f:
+            with self.assertRaises(ValueError):
+                CSVColumnReader(f, ['unknown'])
+
+    def test_csv_reader(self):
+        ''' The whole file reader works on python 3
+        '''
+        states = random_states(100)
+        for i, state in enumerate(states):
+            state.runtime_state = 2 if i % 2 else 1
+        filename = self.write_csv(states)
+        with open(filename) as f:
+            reader = CSVReader(f, filter_running_program=True)
+        self.assertEqual(reader.get_samples(), 50)
+        self.assertTrue(
+            np.allclose(reader.actual_q_3, [s.actual_q[3] for s in states[1::2]]))
+        self.assertTrue(np.all(reader.runtime_state == 2))
+
+    def test_binary(self):
+        ''' Binary log written row by row and from arrays
+        '''
+        states = random_states(100)
+        config = data_config(RECIPE)
+        config.compile()
+        rows = np.empty((50, ), config.dtype)
+        for name in self.names_:
+            rows[name] = [getattr(s, name) for s in states[50:]]
+
+        filename = os.path.join(self.directory_, 'log.bin')
+        with open(filename, 'wb') as f:
+            writer = BinaryWriter(f, self.names_, self.types_)
+            writer.writeheader()
+            for state in states[:50]:
+                writer.writerow(state)
+            writer.writerows(rows)
+            # a row written partially is ignored
+            f.write(b'\x00' * 10)
+
+        log = BinaryReader(filename)
+        self.assertEqual(len(log), 100)
+        self.assertEqual(log.names, self.names_)
+        for name in self.names_:
+            self.assertTrue(
+                np.array_equal(log[name], [getattr(s, name) for s in states]))
+        self.assertIsInstance(log.data, np.memmap)
+
+        csv_size = os.path.getsize(self.write_csv(states))
+        self.assertLess(os.path.getsize(filename), csv_size / 2)
+
+        filename = os.path.join(self.directory_, 'empty.bin')
+        with open(filename, 'wb') as f:
+            BinaryWriter(f, self.names_, self.types_).writeheader()
+        self.assertEqual(len(BinaryReader(filename)), 0)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
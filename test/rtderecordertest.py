@@ -0,0 +1,100 @@
+''' Test the recorder of RTDE data packages.'''
+import io
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import unittest
+from vsurt.urmsgs.rtde import rtde
+from vsurt.urmsgs.rtde.rtde_recorder import RTDERecorder, RTDERecording
+from vsurt.urmsgs.rtde.rtde_server import RTDEServer
+from vsurt.urmsgs.rtde.csv_reader import CSVColumnReader
+
+NAMES = ['timestamp', 'actual_q', 'robot_mode', 'actual_digital_input_bits']
+TYPES = ['DOUBLE', 'VECTOR6D', 'INT32', 'UINT64']
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory_ = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory_)
+
+    def test_record(self):
+        ''' Record a connection in rotated and compressed segments
+        '''
+        directory = os.path.join(self.directory_, 'log')
+        # 75 bytes per record, about 20 records per segment
+        recorder = RTDERecorder(directory, NAMES, TYPES,
+                                segment_bytes=1500).start()
+        with RTDEServer() as server:
+            server.set_state(actual_q=[1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+            con = rtde.RTDE('127.0.0.1', server.port, capture=recorder)
+            con.connect()
+            # the log recipe is slower than the control recipe
+            con.add_output_setup(['timestamp'], frequency=500)
+            recorder.recipe_id = con.add_output_setup(NAMES, TYPES, 250)
+            con.send_start()
+            t0 = time.time()
+            while time.time() - t0 < 0.4:
+                con.receive()
+            con.disconnect()
+        recorder.close()
+        self.assertEqual(recorder.dropped, 0)
+        self.assertGreater(recorder.count, 60)
+
+        files = sorted(os.listdir(directory))
+        self.assertIn('index.json', files)
+        segments = [f for f in files if f.endswith('.rtde.gz')]
+        self.assertGreater(len(segments), 3)
+        self.assertEqual(len(segments) + 1, len(files))
+
+        recording = RTDERecording(directory)
+        self.assertEqual(len(recording), recorder.count)
+        data = recording.to_arrays()
+        self.assertEqual(len(data['t']), recorder.count)
+        self.assertTrue(np.all(np.diff(data['timestamp']) > 0))
+        self.assertTrue(np.all(np.diff(data['t']) >= 0))
+        self.assertTrue(np.all(data['actual_q'] == [1, 2, 3, 4, 5, 6]))
+        self.assertTrue(np.all(data['robot_mode'] == 7))
+        period = np.median(np.diff(data['timestamp']))
+        self.assertAlmostEqual(period, 1.0 / 250, delta=1.0e-3)
+
+        text = io.StringIO()
+        recording.to_csv(text)
+        text.seek(0)
+        columns = CSVColumnReader(text, ['t', 'timestamp', 'actual_q']).read()
+        self.assertTrue(np.allclose(columns['timestamp'], data['timestamp']))
+        self.assertTrue(np.allclose(columns['actual_q'], data['actual_q']))
+
+    def test_queue_full(self):
+        ''' The receive loop never blocks on the recorder
+        '''
+        recorder = RTDERecorder(os.path.join(self.directory_, 'log'),
+                                ['timestamp'], ['DOUBLE'], queue_size=10)
+        frame = b'\x00\x0cU\x01' + bytes(8)
+        for i in range(15):
+            recorder.write(frame, float(i))
+        # other recipes and packages are ignored
+        recorder.write(b'\x00\x0cU\x02' + bytes(8))
+        recorder.write(b'\x00\x04S\x01')
+        self.assertEqual(recorder.dropped, 5)
+        recorder.start()
+        recorder.close()
+        self.assertEqual(recorder.count, 10)
+        with self.assertRaises(ValueError):
+            RTDERecorder(os.path.join(self.directory_, 'log'), ['timestamp'],
+                         ['DOUBLE'])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
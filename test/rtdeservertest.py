@@ -0,0 +1,297 @@
+''' Test the RTDE client against the RTDE server simulator.'''
+import socket
+import threading
+import time
+import unittest
+from vsurt.urmsgs.urtransport import connect_tcp, cUrSocketTransport
+from vsurt.urmsgs.rtde import rtde
+from vsurt.urmsgs.rtde.rtde_server import RTDEServer
+
+OUTPUTS = ['timestamp', 'actual_q', 'robot_mode', 'output_int_register_0',
+           'output_double_register_0']
+INPUTS = ['input_int_register_0', 'input_double_register_0']
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def connect(self, _server):
+        con = rtde.RTDE('127.0.0.1', _server.port)
+        self.assertTrue(con.connect())
+        return con
+
+    def test_setup(self):
+        ''' Negotiation, version and recipes
+        '''
+        with RTDEServer(controller_version=(5, 9, 1, 1234)) as server:
+            con = self.connect(server)
+            self.assertEqual(con.get_controller_version(), (5, 9, 1, 1234))
+            self.assertTrue(
+                con.send_output_setup(OUTPUTS, [
+                    'DOUBLE', 'VECTOR6D', 'INT32', 'INT32', 'DOUBLE'
+                ]))
+            with self.assertRaises(ValueError):
+                con.send_input_setup(['input_int_register_0', 'unknown'])
+            self.assertIsNotNone(con.send_input_setup(INPUTS))
+            # the registers of a recipe can not be used by another client
+            other = self.connect(server)
+            with self.assertRaises(ValueError):
+                other.send_input_setup(INPUTS)
+            other.disconnect()
+            con.disconnect()
+
+    def test_echo(self):
+        ''' The input registers are echoed in the output registers
+        '''
+        with RTDEServer(frequency=500) as server:
+            server.set_state(actual_q=[1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+            con = self.connect(server)
+            con.send_output_setup(OUTPUTS)
+            inputs = con.send_input_setup(INPUTS)
+            self.assertTrue(con.send_start())
+            state = con.receive()
+            self.assertEqual(state.actual_q, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+            self.assertEqual(state.robot_mode, 7)
+            for i in range(1, 10):
+                inputs.input_int_register_0 = i
+                inputs.input_double_register_0 = 0.5 * i
+                con.send(inputs)
+                t0 = time.time()
+                while state.output_int_register_0 != i and \
+                        time.time() - t0 < 1.0:
+                    state = con.receive(latest=True)
+                self.assertEqual(state.output_int_register_0, i)
+                self.assertEqual(state.output_double_register_0, 0.5 * i)
+            writer = con.input_writer(inputs.recipe_id)
+            for i in range(10, 20):
+                con.send_frame(writer.pack((i, 0.5 * i)))
+                t0 = time.time()
+                while state.output_int_register_0 != i and \
+                        time.time() - t0 < 1.0:
+                    state = con.receive(latest=True)
+                self.assertEqual(state.output_double_register_0, 0.5 * i)
+            con.send_pause()
+            con.disconnect()
+
+    def test_many_recipes(self):
+        ''' Two output recipes at different frequencies
+        '''
+        with RTDEServer() as server:
+            con = self.connect(server)
+            fast = con.add_output_setup(['timestamp', 'actual_q'],
+                                        frequency=500)
+            slow = con.add_output_setup(OUTPUTS, frequency=50)
+            self.assertNotEqual(fast, slow)
+            log = con.subscribe(slow)
+            con.send_start()
+            first = con.receive()
+            t0 = time.time()
+            fast_count = 0
+            while time.time() - t0 < 0.3:
+                state = con.receive()
+                self.assertEqual(state.recipe_id, fast)
+                fast_count += 1
+            self.assertGreater(fast_count, 100)
+            slow_states = []
+            while not log.empty():
+                slow_states.append(log.get())
+            self.assertGreater(len(slow_states), 10)
+            self.assertLess(len(slow_states), 20)
+            for state in slow_states:
+                self.assertEqual(state.recipe_id, slow)
+                self.assertEqual(state.robot_mode, 7)
+            self.assertGreater(slow_states[-1].timestamp, first.timestamp)
+
+            state = con.receive(recipe_id=slow)
+            self.assertEqual(state.recipe_id, slow)
+            self.assertIsNone(con.receive(recipe_id=100))
+            con.disconnect()
+
+    def test_frequency(self):
+        ''' The packages are streamed at the requested frequency
+        '''
+        with RTDEServer() as server:
+            con = self.connect(server)
+            con.send_output_setup(['timestamp'], frequency=250)
+            con.send_start()
+            first = con.receive_batch(50)['timestamp']
+            period = (first[-1] - first[0]) / 49
+            self.assertAlmostEqual(period, 1.0 / 250, delta=0.5e-3)
+            con.disconnect()
+
+    def test_reconnect(self):
+        ''' The session is restored after the connection is lost
+        '''
+        with RTDEServer(frequency=500) as server:
+            con = rtde.RTDE('127.0.0.1', server.port, reconnect=True)
+            self.assertTrue(con.connect())
+            fast = con.add_output_setup(OUTPUTS)
+            slow = con.add_output_setup(['timestamp'], frequency=50)
+            log = con.subscribe(slow)
+            writer = con.input_writer(con.send_input_setup(INPUTS).recipe_id)
+            self.assertTrue(con.send_start())
+            con.send_frame(writer.pack((7, 3.5)))
+            state = con.receive()
+            while state.output_int_register_0 != 7:
+                state = con.receive()
+
+            server.set_state(input_int_register_0=0, output_int_register_0=0)
+            server.drop_connections()
+            t0 = time.time()
+            while con.stats.reconnects == 0 and time.time() - t0 < 2.0:
+                state = con.receive()
+            self.assertEqual(con.stats.reconnects, 1)
+            self.assertTrue(con.is_connected())
+            self.assertLess(con.last_outage, 0.5)
+            # the recipes keep their ids and the last input is sent again
+            self.assertEqual(state.recipe_id, fast)
+            self.assertEqual(state.output_int_register_0, 7)
+            self.assertEqual(server.get_state('input_int_register_0'), 7)
+            while not log.empty():
+                log.get()
+            t0 = time.time()
+            while log.empty() and time.time() - t0 < 1.0:
+                con.receive()
+            self.assertEqual(log.get_nowait().recipe_id, slow)
+            server.stop()
+            self.assertFalse(con.reconnect(timeout=0.05))
+            self.assertFalse(con.is_connected())
+
+    def test_reconnect_last_sent(self):
+        ''' The input restored is the last one actually sent
+        '''
+        with RTDEServer(frequency=500) as server:
+            con = self.connect(server)
+            con.send_output_setup(OUTPUTS)
+            writer = con.input_writer(con.send_input_setup(INPUTS).recipe_id)
+            self.assertTrue(con.send_start())
+            self.assertTrue(con.send_frame(writer.pack((7, 3.5))))
+            while con.receive().output_int_register_0 != 7:
+                pass
+            con.disconnect()
+            # not connected, neither sent nor kept
+            self.assertFalse(con.send_frame(writer.pack((9, 4.5))))
+            server.set_state(input_int_register_0=0, output_int_register_0=0)
+            self.assertTrue(con.reconnect(timeout=1.0))
+            t0 = time.time()
+            while con.receive().output_int_register_0 != 7 and \
+                    time.time() - t0 < 1.0:
+                pass
+            self.assertEqual(server.get_state('input_int_register_0'), 7)
+            con.disconnect()
+
+    def test_reconnect_silent_server(self):
+        ''' reconnect gives up at the timeout when the server accepts the
+            connection but never answers
+        '''
+        peers = []
+
+        def transport():
+            if not peers:
+                return connect_tcp('127.0.0.1', server.port)
+            # a connection which is never answered
+            ours, theirs = socket.socketpair()
+            peers.append(theirs)
+            return cUrSocketTransport(ours)
+
+        with RTDEServer() as server:
+            con = rtde.RTDE('127.0.0.1', transport=transport)
+            self.assertTrue(con.connect())
+            con.send_output_setup(OUTPUTS)
+            self.assertTrue(con.send_start())
+            con.receive()
+            peers.append(None)
+            t0 = time.time()
+            self.assertFalse(con.reconnect(timeout=0.3))
+            self.assertLess(time.time() - t0, 1.0)
+            self.assertFalse(con.is_connected())
+        for peer in peers[1:]:
+            peer.close()
+
+    def test_reconnect_two_threads(self):
+        ''' A connection lost while sending and receiving in two threads
+            is restored once
+        '''
+        transports = []
+        broken = threading.Event()
+        # both threads see the failure at the same time
+        barrier = threading.Barrier(2, timeout=1.0)
+
+        def transport():
+            transports.append(connect_tcp('127.0.0.1', server.port))
+            if len(transports) == 1:
+                return cBrokenTransport(transports[0], broken, barrier)
+            return transports[-1]
+
+        with RTDEServer(frequency=500) as server:
+            con = rtde.RTDE('127.0.0.1', transport=transport, reconnect=True)
+            self.assertTrue(con.connect())
+            con.send_output_setup(OUTPUTS)
+            writer = con.input_writer(con.send_input_setup(INPUTS).recipe_id)
+            self.assertTrue(con.send_start())
+            running = [True]
+
+            def receive():
+                while running[0]:
+                    con.receive()
+
+            thread = threading.Thread(target=receive)
+            thread.start()
+            t0 = time.time()
+            while time.time() - t0 < 0.5:
+                if time.time() - t0 > 0.1:
+                    broken.set()
+                con.send_frame(writer.pack((1, 0.5)))
+                time.sleep(0.001)
+            running[0] = False
+            thread.join()
+            self.assertEqual(con.stats.reconnects, 1)
+            self.assertTrue(con.is_connected())
+            # a single new connection, the failed one is closed
+            opened = [t for t in transports if t.fileno() != -1]
+            self.assertEqual(opened, transports[1:])
+            self.assertEqual(len(opened), 1)
+            con.disconnect()
+
+
+class cBrokenTransport(object):
+    ''' Transport which fails in every thread once _broken is set.'''
+
+    def __init__(self, _transport, _broken, _barrier):
+        self.transport_ = _transport
+        self.broken_ = _broken
+        self.barrier_ = _barrier
+
+    def fail(self):
+        try:
+            self.barrier_.wait()
+        except threading.BrokenBarrierError:
+            pass
+        raise OSError('connection lost')
+
+    def recv_into(self, _view):
+        if self.broken_.is_set():
+            self.fail()
+        return self.transport_.recv_into(_view)
+
+    def sendall(self, _data):
+        if self.broken_.is_set():
+            self.fail()
+        return self.transport_.sendall(_data)
+
+    def readable(self, _timeout):
+        return self.broken_.is_set() or self.transport_.readable(_timeout)
+
+    def writable(self, _timeout):
+        return self.transport_.writable(_timeout)
+
+    def close(self):
+        self.transport_.close()
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
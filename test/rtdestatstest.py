@@ -0,0 +1,101 @@
+''' Test the instrumentation of the RTDE client.'''
+import numpy as np
+import unittest
+from vsurt.urmsgs.rtde import rtde
+from vsurt.urmsgs.rtde.rtde_stats import Histogram, RTDEStats
+from vsurt.urmsgs.rtde.rtde_server import RTDEServer
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def test_histogram(self):
+        ''' Percentiles within the precision of the buckets
+        '''
+        values = np.random.lognormal(8.0, 2.0, 10000).astype(int)
+        histogram = Histogram(precision=7)
+        for v in values:
+            histogram.record(v)
+        self.assertEqual(histogram.count, len(values))
+        self.assertEqual(histogram.min, values.min())
+        self.assertEqual(histogram.max, values.max())
+        ordered = np.sort(values)
+        for q in (1, 10, 50, 90, 99, 99.9):
+            expected = ordered[int(round(q / 100.0 * len(values))) - 1]
+            self.assertLessEqual(histogram.percentile(q), expected)
+            self.assertGreaterEqual(histogram.percentile(q),
+                                    expected * (1.0 - 2.0**-6))
+        histogram.reset()
+        self.assertIsNone(histogram.percentile(50))
+
+    def test_late(self):
+        ''' Late packages and missed periods
+        '''
+        stats = RTDEStats()
+        stats.set_frequency(500)
+        for t in [0.0, 0.002, 0.004, 0.010, 0.012, 0.0145]:
+            stats.on_receive(t)
+        self.assertEqual(stats.received, 6)
+        self.assertEqual(stats.late, 1)
+        self.assertEqual(stats.missed, 2)
+        self.assertEqual(stats.interarrival.count, 5)
+        self.assertEqual(stats.interarrival.max, 6000)
+
+        stats.on_send(0.015)
+        stats.on_receive(0.0161)
+        self.assertEqual(stats.round_trip.count, 1)
+        self.assertAlmostEqual(stats.round_trip.min, 1100, delta=1)
+
+    def test_burst(self):
+        ''' The packages of one recv fill the periods of the gap before
+        '''
+        stats = RTDEStats()
+        stats.set_frequency(500)
+        # the 3 packages of 0.004, 0.006 and 0.008 are received together
+        for t in [0.0, 0.002, 0.008, 0.008, 0.008, 0.010]:
+            stats.on_receive(t)
+        self.assertEqual(stats.received, 6)
+        self.assertEqual(stats.late, 1)
+        self.assertEqual(stats.missed, 0)
+        self.assertEqual(stats.interarrival.count, 3)
+        self.assertEqual(stats.interarrival.max, 6000)
+
+        # 2 packages after a gap of 4 periods, 2 of them missed
+        for t in [0.018, 0.018]:
+            stats.on_receive(t)
+        self.assertEqual(stats.late, 2)
+        self.assertEqual(stats.missed, 2)
+
+    def test_connection(self):
+        ''' Statistics of a connection with the RTDE server simulator
+        '''
+        with RTDEServer() as server:
+            con = rtde.RTDE('127.0.0.1', server.port)
+            con.connect()
+            con.send_output_setup(['timestamp', 'output_int_register_0'],
+                                  frequency=250)
+            inputs = con.send_input_setup(['input_int_register_0'])
+            con.send_start()
+            for i in range(20):
+                con.receive()
+            inputs.input_int_register_0 = 1
+            con.send(inputs)
+            con.receive_batch(20)
+            stats = con.stats.summary()
+            con.disconnect()
+        self.assertGreaterEqual(stats['received'], 40)
+        self.assertEqual(stats['decoded'], stats['received'] -
+                         stats['skipped'])
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['round_trip_us']['count'], 1)
+        self.assertAlmostEqual(stats['interarrival_us']['p50'], 4000,
+                               delta=1000)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+''' Test the serialization of the RTDE packages.'''
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+import time
+import numpy as np
+import unittest
+from vsurt.urmsgs.rtde import serialize, rtde, rtde_receiver
+from vsurt.urmsgs.urcapture import cUrReplayServer
+from test.builders import RECIPE, data_config, data_payload, rtde_frame
+from test.builders import rtde_capture
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def test_compiled_decoder(self):
+        ''' Compare the compiled decoder with DataObject.unpack
+        '''
+        config = data_config(RECIPE)
+        config.compile()
+        payload = data_payload(config)
+
+        state = config.unpack(payload)
+        ref = serialize.DataObject.unpack(
+            struct.unpack_from(config.fmt, payload), config.names,
+            config.types)
+        self.assertEqual(state.recipe_id, ref.recipe_id)
+        for name in config.names:
+            self.assertEqual(getattr(state, name), getattr(ref, name))
+            self.assertEqual(type(getattr(state, name)),
+                             type(getattr(ref, name)))
+        self.assertEqual(config.pack(state), payload)
+
+    def test_data_class(self):
+        ''' The data objects of a recipe store the registers in slots
+        '''
+        config = data_config(RECIPE)
+        config.compile()
+        payload = data_payload(config)
+        state = config.unpack(payload)
+        self.assertIs(type(state), config.data_class)
+        self.assertIsInstance(state, serialize.DataObject)
+        self.assertEqual(config.data_class.__slots__,
+                         ('recipe_id', ) + tuple(config.names))
+        self.assertIs(serialize.data_class(config.names), config.data_class)
+        self.assertFalse(hasattr(state, '__dict__'))
+        with self.assertRaises(AttributeError):
+            state.not_a_register = 1
+
+        copy = pickle.loads(pickle.dumps(state))
+        self.assertIs(type(copy), config.data_class)
+        self.assertEqual(copy.recipe_id, state.recipe_id)
+        for name in config.names:
+            self.assertEqual(getattr(copy, name), getattr(state, name))
+        empty = pickle.loads(pickle.dumps(
+            serialize.DataObject.create_empty(['timestamp'], 3)))
+        self.assertEqual(empty.recipe_id, 3)
+        self.assertIsNone(empty.timestamp)
+
+        empty = serialize.DataObject.create_empty(config.names, config.id)
+        self.assertIs(type(empty), config.data_class)
+        self.assertEqual(empty.recipe_id, config.id)
+        with self.assertRaises(ValueError):
+            config.pack(empty)
+        for name in config.names:
+            setattr(empty, name, getattr(state, name))
+        self.assertEqual(config.pack(empty), payload)
+
+        config.compile(numpy_vectors=True)
+        state = config.unpack(payload)
+        for name, data_type in RECIPE:
+            if data_type.startswith('VECTOR'):
+                self.assertIsInstance(getattr(state, name), np.ndarray)
+        self.assertEqual(config.pack(state), payload)
+
+        for names in (['actual_q', 'actual_q'], ['pack'], ['class'],
+                      ['recipe_id']):
+            with self.assertRaises(ValueError):
+                serialize.data_class(names)
+
+    def test_receive_batch(self):
+        ''' Receive many data packages in a structured array
+        '''
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'capture.bin')
+        rtde_capture(filename, RECIPE, 300)
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        try:
+            with cUrReplayServer(filename, _speed=None) as server:
+                con = rtde.RTDE('127.0.0.1', server.port_)
+                con.connect()
+                con.send_output_setup(names, types)
+                con.send_start()
+                rows = con.receive_batch(100)
+                self.assertEqual(len(rows), 100)
+                self.assertEqual(rows.dtype.names, tuple(names))
+                self.assertTrue(
+                    np.array_equal(rows['timestamp'], np.arange(100)))
+                self.assertEqual(rows['actual_q'].shape, (100, 6))
+
+                time.sleep(0.2)
+                out = np.empty((1000, ), rows.dtype)
+                rows = con.drain(out)
+                self.assertEqual(len(rows), 200)
+                self.assertTrue(
+                    np.array_equal(rows['timestamp'], np.arange(100, 300)))
+                con.disconnect()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_receive_latest(self):
+        ''' Only the newest data package is decoded
+        '''
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'capture.bin')
+        n = 5000
+        rtde_capture(filename, RECIPE, n)
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        try:
+            with cUrReplayServer(filename, _speed=None) as server:
+                con = rtde.RTDE('127.0.0.1', server.port_)
+                con.connect()
+                con.send_output_setup(names, types)
+                con.send_start()
+                first = con.receive()
+                # the whole capture is sent at once, so the client falls
+                # behind and a backlog builds up in the socket
+                t0 = time.time()
+                while first.timestamp < n - 1 and time.time() - t0 < 5.0:
+                    state = con.receive(latest=True)
+                    self.assertGreater(state.timestamp, first.timestamp)
+                    first = state
+                self.assertEqual(first.timestamp, n - 1)
+                self.assertGreater(con.skipped_packages, 0)
+                con.disconnect()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_receive_batch_backlog(self):
+        ''' The receive buffer grows with the backlog without losing data
+        '''
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'capture.bin')
+        n = 20000
+        rtde_capture(filename, RECIPE, n)
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        try:
+            with cUrReplayServer(filename, _speed=None) as server:
+                con = rtde.RTDE('127.0.0.1', server.port_)
+                con.connect()
+                con.send_output_setup(names, types)
+                con.send_start()
+                time.sleep(0.5)
+                rows = con.receive_batch(n)
+                self.assertTrue(np.array_equal(rows['timestamp'],
+                                               np.arange(n)))
+                con.disconnect()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_background_receiver(self):
+        ''' The newest state is read without blocking
+        '''
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, 'capture.bin')
+        n = 250
+        rtde_capture(filename, RECIPE, n)
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        try:
+            with cUrReplayServer(filename) as server:
+                con = rtde.RTDE('127.0.0.1', server.port_)
+                con.connect()
+                con.send_output_setup(names, types)
+                con.send_start()
+                receiver = rtde_receiver.RTDEReceiver(con)
+                self.assertEqual(receiver.latest_state(), (None, 0, None))
+                with receiver:
+                    self.assertTrue(receiver.wait(1.0))
+                    last_seq = 0
+                    last_t = -1.0
+                    while receiver.is_running():
+                        state, seq, age = receiver.latest_state()
+                        self.assertGreaterEqual(seq, last_seq)
+                        self.assertGreaterEqual(state['timestamp'], last_t)
+                        self.assertGreaterEqual(age, 0.0)
+                        self.assertEqual(state['actual_q'].shape, (6, ))
+                        last_seq, last_t = seq, state['timestamp']
+                        time.sleep(0.01)
+                state, seq, age = receiver.latest_state()
+                self.assertEqual(state['timestamp'], n - 1)
+                self.assertEqual(seq, receiver.sequence())
+                con.disconnect()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_input_writer(self):
+        ''' The writer packs the same frame as DataConfig.pack
+        '''
+        config = data_config(RECIPE, _id=3)
+        config.compile()
+        state = config.unpack(data_payload(config))
+        frame = rtde_frame('U', config.pack(state))
+        values = []
+        for name, data_type in RECIPE:
+            if data_type.startswith('VECTOR'):
+                values.extend(getattr(state, name))
+            else:
+                values.append(getattr(state, name))
+        writer = config.writer()
+        self.assertEqual(writer.size, len(values))
+        self.assertEqual(writer.pack(values), frame)
+        self.assertEqual(writer.pack(tuple(values)), frame)
+        with self.assertRaises(struct.error):
+            writer.pack(values[:-1])
+
+        doubles = data_config([('input_double_register_%d' % i, 'DOUBLE')
+                               for i in range(6)])
+        q = np.random.rand(6)
+        frame = doubles.writer().pack(q)
+        self.assertEqual(struct.unpack('>HBB6d', frame),
+                         (len(frame), ord('U'), 1) + tuple(q))
+
+    def test_input_writer_by_name(self):
+        ''' The registers are found by name whatever the order of the
+            recipe, and a float vector fills the integer registers
+        '''
+        recipe = [('input_int_register_1', 'INT32')] + [
+            ('input_double_register_%d' % i, 'DOUBLE')
+            for i in reversed(range(7))] + [('input_int_register_0', 'INT32')]
+        config = data_config(recipe)
+        writer = config.writer()
+        self.assertEqual(writer.size, 9)
+        self.assertEqual(writer.index('input_int_register_1'), 0)
+        self.assertEqual(writer.index('input_double_register_0'), 7)
+        self.assertRaises(ValueError, writer.index, 'input_int_register_2')
+
+        command = {'input_double_register_%d' % i: 0.1 * i for i in range(7)}
+        command['input_int_register_0'] = 1
+        command['input_int_register_1'] = 2
+        values = np.zeros(writer.size)
+        self.assertEqual(values.dtype, np.float64)
+        for name, value in command.items():
+            values[writer.index(name)] = value
+        frame = writer.pack(values)
+        state = config.unpack(bytes(frame[3:]))
+        for name, value in command.items():
+            self.assertEqual(getattr(state, name), value)
+        self.assertIsInstance(state.input_int_register_1, int)
+        self.assertEqual(writer.pack(values.tolist()), frame)
+
+    def test_invalid_field_name(self):
+        ''' Reject the names which are not identifiers
+        '''
+        config = data_config([('actual_q', 'VECTOR6D')])
+        config.names = ['actual_q; import os']
+        self.assertRaises(ValueError, config.compile)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
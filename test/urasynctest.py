@@ -0,0 +1,87 @@
+''' Test the asyncio clients of the 30001 port.'''
+import asyncio
+import numpy as np
+import unittest
+from vsurt.urmsgs.urasync import cUrFleetMonitor, cUrAsyncStateReader
+from test.builders import joint_state_message
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def test_fleet_monitor(self):
+        ''' Follow a robot which streams states and one which does not
+        answer
+        '''
+        async def stream(_reader, _writer):
+            for i in range(5):
+                _writer.write(joint_state_message(np.full((6, ), i)))
+                await _writer.drain()
+                await asyncio.sleep(0.03)
+            _writer.close()
+
+        async def silent(_reader, _writer):
+            await _reader.read()
+
+        async def run():
+            server1 = await asyncio.start_server(stream, '127.0.0.1', 0)
+            server2 = await asyncio.start_server(silent, '127.0.0.2', 0)
+            port = server1.sockets[0].getsockname()[1]
+            monitor = cUrFleetMonitor(['127.0.0.1'],
+                                      port,
+                                      _timeout=0.05,
+                                      _reconnect_delay=0.01)
+            silent_reader = cUrAsyncStateReader(
+                '127.0.0.2', server2.sockets[0].getsockname()[1], 0.05,
+                _reconnect_delay=0.01)
+            monitor.readers_['127.0.0.2'] = silent_reader
+            result = []
+            async with monitor:
+                async for ip, t, state in monitor:
+                    result.append((ip, state.joint_data_.q_actual_[0]))
+                    if len(result) == 5:
+                        break
+            server1.close()
+            server2.close()
+            self.assertTrue(silent_reader.reconnects_ > 0)
+            return result
+
+        result = asyncio.run(run())
+        self.assertEqual(result, [('127.0.0.1', float(i)) for i in range(5)])
+
+    def test_fleet_monitor_end(self):
+        ''' The iteration ends when all the readers have stopped
+        '''
+        async def stream(_reader, _writer):
+            for i in range(3):
+                _writer.write(joint_state_message(np.full((6, ), i)))
+            await _writer.drain()
+            _writer.close()
+
+        async def follow(_monitor):
+            return [(ip, state.joint_data_.q_actual_[0])
+                    async for ip, t, state in _monitor]
+
+        async def run():
+            server = await asyncio.start_server(stream, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            monitor = cUrFleetMonitor(['127.0.0.1'], port, _timeout=1.0,
+                                      _reconnect=False)
+            async with monitor:
+                result = await asyncio.wait_for(follow(monitor), 5.0)
+                with self.assertRaises(StopAsyncIteration):
+                    await monitor.__anext__()
+            server.close()
+            return result
+
+        result = asyncio.run(run())
+        self.assertEqual(result, [('127.0.0.1', float(i)) for i in range(3)])
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
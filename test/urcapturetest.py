@@ -0,0 +1,87 @@
+''' Test the capture format and the replay server.'''
+import os
+import struct
+import shutil
+import tempfile
+import numpy as np
+import unittest
+from vsurt.urmsgs.urstream import cUrStateStream
+from vsurt.urmsgs.urcapture import cUrCaptureWriter, cUrCaptureReader
+from vsurt.urmsgs.urcapture import cUrReplayServer, PRIMARY, RTDE
+from vsurt.urmsgs.rtde import rtde
+from test.builders import joint_state_message, rtde_frame
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'capture.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_capture_file(self):
+        ''' Write and read back a capture
+        '''
+        frames = [(0.1 * i, joint_state_message(np.full((6, ), i)))
+                  for i in range(10)]
+        with cUrCaptureWriter(self.filename, PRIMARY, 30002) as writer:
+            for t, frame in frames:
+                writer.write(frame, t)
+        capture = cUrCaptureReader(self.filename)
+        self.assertEqual(capture.protocol_, PRIMARY)
+        self.assertEqual(capture.port_, 30002)
+        self.assertEqual(capture.frames(), frames)
+
+    def test_replay_primary(self):
+        ''' Replay a capture of the primary interface
+        '''
+        with cUrCaptureWriter(self.filename, PRIMARY) as writer:
+            for i in range(10):
+                writer.write(joint_state_message(np.full((6, ), i)), 0.1 * i)
+
+        with cUrReplayServer(self.filename, _speed=None) as server:
+            stream = cUrStateStream('127.0.0.1', server.port_,
+                                    _reconnect=False)
+            for i in range(10):
+                jd = stream.next_state()[1]
+                self.assertEqual(jd.q_actual_[0], i)
+            stream.close()
+
+    def test_replay_rtde(self):
+        ''' Replay a capture of RTDE
+        '''
+        with cUrCaptureWriter(self.filename, RTDE, 30004) as writer:
+            writer.write(rtde_frame('V', b'\x01'), 0.0)
+            writer.write(rtde_frame('O', b'\x01VECTOR6D,INT32'), 0.0)
+            writer.write(rtde_frame('S', b'\x01'), 0.0)
+            for i in range(5):
+                payload = struct.pack('>B6di', 1, *(6 * (float(i), )), i)
+                writer.write(rtde_frame('U', payload), 0.002 * i)
+
+        with cUrReplayServer(self.filename, _speed=1.0) as server:
+            con = rtde.RTDE('127.0.0.1', server.port_)
+            self.assertTrue(con.connect())
+            self.assertTrue(
+                con.send_output_setup(['actual_q', 'output_int_register_0'],
+                                      ['VECTOR6D', 'INT32']))
+            self.assertTrue(con.send_start())
+            # stale packages may be skipped, but the last one is received
+            counter = -1
+            while counter < 4:
+                state = con.receive()
+                self.assertTrue(state.output_int_register_0 > counter)
+                counter = state.output_int_register_0
+                self.assertEqual(state.actual_q, 6 * [float(counter)])
+            con.disconnect()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,11 @@
 import os
 import numpy as np
 import unittest
-from vsurt.urmsgs.urmsgs import cUrCartesianInfo, cUrJointData
+from vsurt.urmsgs.urmsgs import cUrRobotState
 
-from vsurt.urdk.urdk import cUrdk
+from vsurt.urdk.urdk import cUrdk, forward_kinematics
+from vsurt.urdk.urdk import forward_kinematics_batch
+from vsurt.urdk.kinematicdata import cUR3, cUR5, cUR10
 import time
 
 
@@ -26,14 +28,15 @@ class cMyTest(unittest.TestCase):
         if res != 0:
             print('Cannot compare with the robot')
             return
-        js = cUrJointData()
-        ci = cUrCartesianInfo()
+        state = cUrRobotState()
 
         urmodel = cUrdk(_ip=ip)
 
         for i in range(1):
-            js.get(ip, port)
-            ci.get(ip, port)
+            # joints and tcp pose from the same control cycle
+            state.get(ip, port)
+            js = state.joint_data_
+            ci = state.cartesian_info_
 
             q = js.q_actual_
 
@@ -53,6 +56,58 @@ class cMyTest(unittest.TestCase):
                   '''.format(
                 *[np.array2string(v) for v in [x_nominal, x_test, einf]]))
 
+    def test_fk_batch(self):
+        ''' Forward kinematics of many configurations at once
+        '''
+        # flange of the UR5 at the zero configuration
+        pose = forward_kinematics_batch(cUR5, np.zeros((1, 6)))
+        self.assertEqual(pose.shape, (1, 4, 4))
+        self.assertTrue(
+            np.allclose(pose[0, :3, 3], [-0.81725, -0.19145, -0.005491]))
+
+        q = np.random.uniform(-np.pi, np.pi, (1000, 6))
+        tcp_offset = np.array([0.01, -0.02, 0.15, 0.0, 0.0, 0.0])
+        for model, kinf in (('ur3', cUR3), ('ur5', cUR5), ('ur10', cUR10)):
+            urmodel = cUrdk(_model=model, _tcp_offset=tcp_offset)
+            poses = urmodel.fk_batch(q)
+            self.assertEqual(poses.shape, (1000, 4, 4))
+            for i in range(0, 1000, 97):
+                self.assertTrue(np.allclose(
+                    poses[i], forward_kinematics(kinf, q[i], tcp_offset[:3])))
+            # the result does not depend on the chunks
+            self.assertTrue(np.array_equal(
+                forward_kinematics_batch(kinf, q, tcp_offset[:3], _chunk=7),
+                poses))
+        with self.assertRaises(ValueError):
+            forward_kinematics_batch(cUR5, np.zeros(6))
+
+    def test_fk_batch_wrt_fk(self):
+        ''' The batch gives the poses of the per-configuration forward
+        kinematics, in less time than a loop
+        '''
+        q = np.random.uniform(-np.pi, np.pi, (1000, 6))
+        tcp_offset = np.array([0.01, -0.02, 0.15])
+        t0 = time.perf_counter()
+        poses = [forward_kinematics(cUR10, qi, tcp_offset) for qi in q]
+        t1 = time.perf_counter()
+        batch = forward_kinematics_batch(cUR10, q, tcp_offset)
+        t2 = time.perf_counter()
+        self.assertTrue(np.allclose(batch, poses))
+        self.assertTrue(np.allclose(forward_kinematics_batch(cUR10, q),
+                                    [forward_kinematics(cUR10, qi)
+                                     for qi in q]))
+        self.assertLess(t2 - t1, t1 - t0)
+
+    def test_fk_batch_wrt_vsdk(self):
+        ''' Compare the batched forward kinematics with cUrdk
+        '''
+        urmodel = cUrdk(_model='ur5', _tcp_offset=np.array(
+            [0.0, 0.0, 0.1, 0.0, 0.0, 0.0]))
+        q = np.random.uniform(-np.pi, np.pi, (100, 6))
+        poses = urmodel.fk_batch(q)
+        for i in range(len(q)):
+            self.assertTrue(np.allclose(poses[i], urmodel(q[i])))
+
     def test_jacobian_computation_time(self):
         ''' Compare compute the time the robot's take to compute and invert the jacobian
         '''
@@ -74,9 +129,9 @@ class cMyTest(unittest.TestCase):
             res = np.linalg.svd(jac)
             t3 = time.time()
 
-            dt_jac = t1 - t0
-            dt_jac_inv = t2 - t1
-            dt_jac_svd = t3 - t2
+            dt_jac += t1 - t0
+            dt_jac_inv += t2 - t1
+            dt_jac_svd += t3 - t2
 
         print('jacobian time computation', dt_jac/N)
         print('jacobian inversion time  ', dt_jac_inv/N)
@@ -3,13 +3,24 @@ import os
 import numpy as np
 import unittest
 from vsurt.urmsgs.urmsgs import cUrCartesianInfo, cUrJointData
-from vsurt.urmsgs.urmsgs import cUrKinematicsInfo
+from vsurt.urmsgs.urmsgs import cUrKinematicsInfo, cUrConfigurationData
+from vsurt.urmsgs.urmsgs import cUrMessage, cUrFrameReader
+from vsurt.urmsgs.urmsgs import getRobotStatePacketArray
+from vsurt.urmsgs.urmsgs import getRobotStatePacketIndex
+from vsurt.urmsgs.urmsgs import cUrRobotModeData, cUrRobotState
+from vsurt.urmsgs.urmsgs import JOINT_DATA, CARTESIAN_INFO, MASTERBOARD_DATA
+from vsurt.urmsgs.urmsgs import KINEMATICS_INFO, ROBOT_MODE_DATA
+from test.builders import unpack_joint_data_reference
 
 from vsdk.vsdk import cVsdk
 import functools
 import traceback
 import sys
 import pdb
+import struct
+import time
+import socket
+import threading
 
 
 def debug_on(*exceptions):
@@ -31,6 +42,30 @@ def debug_on(*exceptions):
     return decorator
 
 
+def random_joint_data():
+    jd = cUrJointData()
+    jd.q_actual_ = np.random.rand(6)
+    jd.q_target_ = np.random.rand(6)
+    jd.qd_actual_ = np.random.rand(6)
+    jd.i_actual_ = np.random.rand(6).astype(np.float32)
+    jd.v_actual_ = np.random.rand(6).astype(np.float32)
+    jd.t_motor_ = np.random.rand(6).astype(np.float32)
+    jd.t_micro_ = np.random.rand(6).astype(np.float32)
+    jd.joint_mode_ = np.full((6, ), 253)
+    return jd
+
+
+def robot_state_message(*_packets):
+    ''' Returns a ROBOT_STATE message containing _packets'''
+    data = b''.join(_packets)
+    data = struct.pack('>iB', len(data) + 5, 16) + data
+    msg = cUrMessage()
+    msg.data_ = data
+    msg.len_ = len(data)
+    msg.type_ = 16
+    return msg
+
+
 def ping(_hostname):
     res = os.system('ping -c 1 ' + _hostname)
     return res == 0
@@ -85,6 +120,165 @@ class cMyTest(unittest.TestCase):
             for v in [cinf.tcp_pose_, cinf.tcp_offset_]
         ]))
 
+    def test_joint_data_unpack(self):
+        ''' Compare the numpy decoder of JOINT_DATA with the per-field one
+        '''
+        data = random_joint_data().pack()
+        jd = cUrJointData(data)
+        self.assertEqual(len(data) - 5, jd.content_size_)
+
+        ref = unpack_joint_data_reference(data)
+        res = [
+            jd.q_actual_, jd.q_target_, jd.qd_actual_, jd.i_actual_,
+            jd.v_actual_, jd.t_motor_, jd.t_micro_, jd.joint_mode_
+        ]
+        for r, v in zip(ref, res):
+            self.assertTrue(np.array_equal(r, v))
+
+    def test_packets_pack_unpack(self):
+        ''' Decode the packets encoded with the pack methods
+        '''
+        kinf = cUrKinematicsInfo()
+        kinf.dh_a_[:] = np.random.rand(6)
+        kinf.dh_alpha_[:] = np.random.rand(6)
+        kinf.checksum_[:] = np.arange(6)
+        kinf.calibration_status_ = 2
+        kinf2 = cUrKinematicsInfo(kinf.pack())
+        self.assertTrue(np.array_equal(kinf.dh_a_, kinf2.dh_a_))
+        self.assertTrue(np.array_equal(kinf.dh_alpha_, kinf2.dh_alpha_))
+        self.assertTrue(np.array_equal(kinf.checksum_, kinf2.checksum_))
+        self.assertEqual(kinf2.calibration_status_, 2)
+
+        conf = cUrConfigurationData()
+        conf.joinMaxSpeed_[:] = np.random.rand(6)
+        conf.eqRadius_ = 0.5
+        conf.robotType = 2
+        conf2 = cUrConfigurationData(conf.pack())
+        self.assertTrue(np.array_equal(conf.joinMaxSpeed_,
+                                       conf2.joinMaxSpeed_))
+        self.assertEqual(conf2.eqRadius_, 0.5)
+        self.assertEqual(conf2.robotType, 2)
+
+        cinf = cUrCartesianInfo()
+        cinf.tcp_pose_ = np.random.rand(6)
+        cinf.tcp_offset_ = np.random.rand(6)
+        cinf2 = cUrCartesianInfo(cinf.pack())
+        self.assertTrue(np.array_equal(cinf.tcp_pose_, cinf2.tcp_pose_))
+        self.assertTrue(np.array_equal(cinf.tcp_offset_, cinf2.tcp_offset_))
+
+    def test_robot_state_packet_array(self):
+        ''' Split a ROBOT_STATE message in views of its packets
+        '''
+        jd = random_joint_data()
+        cinf = cUrCartesianInfo()
+        cinf.tcp_pose_ = np.random.rand(6)
+        cinf.tcp_offset_ = np.random.rand(6)
+        msg = robot_state_message(jd.pack(), cinf.pack())
+
+        packets = getRobotStatePacketArray(msg)
+        self.assertEqual([p.type_ for p in packets],
+                         [JOINT_DATA, CARTESIAN_INFO])
+        self.assertEqual(packets[0].offset_, 5)
+        self.assertEqual(packets[1].offset_, 5 + packets[0].len_)
+        self.assertIsInstance(packets[0].data_, memoryview)
+        self.assertTrue(packets[0].data_.obj is msg.data_)
+
+        jd2 = cUrJointData(packets[0].data_)
+        cinf2 = cUrCartesianInfo(packets[1].data_)
+        self.assertTrue(np.array_equal(jd.q_actual_, jd2.q_actual_))
+        self.assertTrue(np.array_equal(cinf.tcp_pose_, cinf2.tcp_pose_))
+
+    def test_robot_state_malformed_packet(self):
+        ''' Reject the packets with a wrong size instead of looping
+        '''
+        jd = random_joint_data().pack()
+        empty = struct.pack('>iB', 0, MASTERBOARD_DATA) + 15 * b'\x00'
+        overrun = struct.pack('>iB', 100, MASTERBOARD_DATA) + 15 * b'\x00'
+        for packet in (empty, overrun):
+            msg = robot_state_message(jd, packet)
+            with self.assertRaises(ValueError):
+                getRobotStatePacketArray(msg)
+            with self.assertRaises(ValueError):
+                getRobotStatePacketIndex(msg)
+
+    def test_robot_state_snapshot(self):
+        ''' Decode all the packets of a single ROBOT_STATE message
+        '''
+        jd = random_joint_data()
+        mode = cUrRobotModeData()
+        mode.timestamp_ = 123456
+        mode.is_robot_power_on_ = True
+        mode.robot_mode_ = 7
+        mode.speed_scaling_ = 0.5
+        kinf = cUrKinematicsInfo()
+        kinf.dh_d_[:] = np.random.rand(6)
+        msg = robot_state_message(mode.pack(), jd.pack(), kinf.pack())
+
+        state = cUrRobotState(msg)
+        self.assertTrue(
+            np.array_equal(state.joint_data_.q_actual_, jd.q_actual_))
+        self.assertEqual(state.robot_mode_data_.timestamp_, 123456)
+        self.assertTrue(state.robot_mode_data_.is_robot_power_on_)
+        self.assertFalse(state.robot_mode_data_.is_program_running_)
+        self.assertEqual(state.robot_mode_data_.robot_mode_, 7)
+        self.assertEqual(state.robot_mode_data_.speed_scaling_, 0.5)
+        self.assertTrue(
+            np.array_equal(state.kinematics_info_.dh_d_, kinf.dh_d_))
+        self.assertIsNone(state.cartesian_info_)
+        self.assertIsNone(state.configuration_data_)
+
+    def test_robot_state_lazy_decoding(self):
+        ''' Skip the unregistered packets and decode the others on demand
+        '''
+        jd = random_joint_data()
+        kinf = cUrKinematicsInfo()
+        masterboard = struct.pack('>iB', 20, MASTERBOARD_DATA) + 15 * b'\x00'
+        msg = robot_state_message(masterboard, jd.pack(), kinf.pack())
+
+        index = getRobotStatePacketIndex(msg)
+        self.assertEqual(set(index), set([JOINT_DATA, KINEMATICS_INFO]))
+        index = getRobotStatePacketIndex(msg, (MASTERBOARD_DATA, ))
+        self.assertEqual(index[MASTERBOARD_DATA].offset_, 5)
+
+        state = cUrRobotState(msg)
+        self.assertEqual(state.types(), set([JOINT_DATA, KINEMATICS_INFO]))
+        self.assertEqual(state.decoded_, {})
+        self.assertTrue(
+            np.array_equal(state.joint_data_.q_actual_, jd.q_actual_))
+        self.assertEqual(list(state.decoded_), [JOINT_DATA])
+        self.assertIsNone(state.decode(ROBOT_MODE_DATA))
+        state.decode_all()
+        self.assertEqual(set(state.decoded_),
+                         set([JOINT_DATA, KINEMATICS_INFO]))
+
+    def test_message_short_reads(self):
+        ''' Frame messages which arrive in small pieces
+        '''
+        jd = random_joint_data()
+        data = robot_state_message(jd.pack()).data_
+        big = robot_state_message(*(5 * [jd.pack()])).data_
+        stream = data + big + data
+
+        soc, peer = socket.socketpair()
+
+        def send():
+            for i in range(0, len(stream), 7):
+                peer.sendall(stream[i:i + 7])
+                time.sleep(0.0001)
+            peer.close()
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        msg = cUrMessage()
+        msg.reader_ = cUrFrameReader(64)
+        for expected in [data, big, data]:
+            msg.get(soc)
+            self.assertEqual(msg.len_, len(expected))
+            self.assertEqual(bytes(msg.data_), expected)
+        self.assertRaises(ConnectionError, msg.get, soc)
+        thread.join()
+        soc.close()
+
 
 def main():
     unittest.main()
@@ -0,0 +1,57 @@
+''' Test the recorder of joint data.'''
+import numpy as np
+import unittest
+import tempfile
+import shutil
+from vsurt.urmsgs.urmsgs import cUrJointData
+from vsurt.urmsgs.urrecorder import cUrJointRecorder, cUrJointRecording
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_and_read(self):
+        ''' Record several segments and read them back
+        '''
+        N = 25
+        q = np.random.rand(N, 6)
+        qd = np.random.rand(N, 6)
+        jd = cUrJointData()
+        with cUrJointRecorder(self.directory, 10,
+                              ('q_actual_', 'qd_actual_')) as recorder:
+            for i in range(N):
+                jd.q_actual_ = q[i]
+                jd.qd_actual_ = qd[i]
+                recorder.record(jd, float(i))
+
+        recording = cUrJointRecording(self.directory)
+        self.assertEqual(len(recording), N)
+        segments = list(recording.segments())
+        self.assertEqual([len(s['t']) for s in segments], [10, 10, 5])
+        self.assertIsInstance(segments[0]['q_actual_'], np.memmap)
+        self.assertTrue(np.array_equal(recording.get('q_actual_'), q))
+        self.assertTrue(np.array_equal(recording.get('qd_actual_'), qd))
+        self.assertTrue(np.array_equal(recording.get('t'), np.arange(N)))
+
+        # append to the recording
+        with cUrJointRecorder(self.directory, 10,
+                              ('q_actual_', 'qd_actual_')) as recorder:
+            recorder.record(jd, float(N))
+        recording = cUrJointRecording(self.directory)
+        self.assertEqual(len(recording), N + 1)
+        self.assertTrue(np.array_equal(recording.get('t'), np.arange(N + 1)))
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+''' Test the long-lived client of the 30001 port.'''
+import socket
+import struct
+import threading
+import numpy as np
+import unittest
+from vsurt.urmsgs.urmsgs import JOINT_DATA
+from vsurt.urmsgs.urstream import cUrStateStream
+from test.builders import joint_state_message
+
+
+def serve(_sessions):
+    ''' Start a server on a free port which accepts a connection for each
+    list of messages of _sessions, sends them and closes the connection.
+    Returns the port and the thread, which closes the server when done.
+    '''
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    def run():
+        for messages in _sessions:
+            conn, _ = server.accept()
+            for message in messages:
+                conn.sendall(message)
+            conn.close()
+        server.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return server.getsockname()[1], thread
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def test_read(self):
+        ''' Read the robot state messages and skip the other ones
+        '''
+        version = struct.pack('>iB', 10, 20) + 5 * b'\x00'
+        messages = [version] + [
+            joint_state_message(np.full((6, ), i)) for i in range(4)
+        ]
+        port, thread = serve([messages])
+        with cUrStateStream('127.0.0.1', port, _reconnect=False) as stream:
+            self.assertEqual(stream.next_message().type_, 16)
+            pac = stream.next_packet(JOINT_DATA)
+            self.assertEqual(pac.type_, JOINT_DATA)
+            states = stream.states((JOINT_DATA, ))
+            for i in range(2, 4):
+                jd = next(states)[JOINT_DATA]
+                self.assertTrue(np.all(jd.q_actual_ == i))
+            self.assertEqual(stream.reconnects_, 0)
+        thread.join()
+
+    def test_reconnect(self):
+        ''' Reconnect transparently when the connection is closed
+        '''
+        port, thread = serve([
+            [joint_state_message(np.full((6, ), i)) for i in range(3)],
+            [joint_state_message(np.full((6, ), i)) for i in range(3, 6)],
+        ])
+        stream = cUrStateStream('127.0.0.1', port, _reconnect_delay=0.01)
+        for i in range(6):
+            jd = stream.next_state()[JOINT_DATA]
+            self.assertEqual(jd.q_actual_[0], i)
+        self.assertEqual(stream.reconnects_, 1)
+        stream.close()
+        thread.join()
+
+    def test_max_reconnects(self):
+        ''' Give up after _max_reconnects failed reconnections
+        '''
+        port, thread = serve([[joint_state_message(np.zeros(6))]])
+        stream = cUrStateStream('127.0.0.1', port, _reconnect_delay=0.01,
+                                _max_reconnects=2)
+        self.assertIn(JOINT_DATA, stream.next_state())
+        thread.join()
+        # the server is closed, every reconnection is refused
+        with self.assertRaises(OSError):
+            stream.next_state()
+        self.assertEqual(stream.reconnects_, 2)
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
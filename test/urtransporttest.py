@@ -0,0 +1,136 @@
+''' Test the transports of the UR interfaces.'''
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+import unittest
+from vsurt.urmsgs.urmsgs import JOINT_DATA, MASTERBOARD_DATA
+from vsurt.urmsgs.urstream import cUrStateStream
+from vsurt.urmsgs.urtransport import connect_unix
+from vsurt.urmsgs.urcapture import cUrReplayTransport, PRIMARY
+from vsurt.urmsgs.rtde import rtde
+from test.builders import RECIPE, joint_state_message, rtde_capture
+from test.builders import rtde_frame
+
+
+class cMyTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(cMyTest, self).__init__(*args, **kwargs)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'capture.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_replay_rtde(self):
+        ''' Run a RTDE client on a capture replayed in memory
+        '''
+        # 2 seconds of packages at 500 Hz
+        rtde_capture(self.filename, RECIPE, 1000)
+        names = [n for n, _ in RECIPE]
+        types = [t for _, t in RECIPE]
+        transport = cUrReplayTransport.from_capture(self.filename)
+        con = rtde.RTDE('replay', transport=lambda: transport)
+        t0 = time.time()
+        self.assertTrue(con.connect())
+        self.assertTrue(con.send_output_setup(names, types))
+        self.assertTrue(con.send_start())
+        command = rtde_frame('U', struct.pack('>Bd', 2, 0.5))
+        timestamps = []
+        while True:
+            state = con.receive()
+            if state is None:
+                break
+            timestamps.append(state.timestamp)
+            self.assertTrue(con.send_frame(command))
+        self.assertLess(time.time() - t0, 1.0)
+        self.assertFalse(con.is_connected())
+        self.assertEqual(timestamps, [float(i) for i in range(1000)])
+        self.assertEqual(transport.sent_, 1000 * [command])
+
+        # a batch at a time
+        con = rtde.RTDE('replay', transport=lambda:
+                        cUrReplayTransport.from_capture(self.filename))
+        con.connect()
+        con.send_output_setup(names, types)
+        con.send_start()
+        data = con.receive_batch(1000)
+        self.assertTrue(np.all(data['timestamp'] == np.arange(1000)))
+
+    def test_replay_primary(self):
+        ''' Read the primary interface replayed in memory
+        '''
+        frames = [(0.1 * i, joint_state_message(np.full((6, ), i)))
+                  for i in range(10)]
+        stream = cUrStateStream(
+            'replay', _reconnect=False,
+            _transport=lambda: cUrReplayTransport(frames, PRIMARY))
+        for i in range(10):
+            jd = stream.next_state()[1]
+            self.assertEqual(jd.q_actual_[0], i)
+        with self.assertRaises(ConnectionError):
+            stream.next_state()
+
+    def test_snapshot_copy(self):
+        ''' A snapshot is not overwritten by the next message
+        '''
+        frames = [(0.1 * i, joint_state_message(np.full((6, ), i)))
+                  for i in range(2)]
+        stream = cUrStateStream(
+            'replay', _reconnect=False,
+            _transport=lambda: cUrReplayTransport(frames, PRIMARY))
+        first = stream.next_snapshot()
+        second = stream.next_snapshot()
+        self.assertEqual(first.decoded_, {})
+        self.assertTrue(np.all(first.joint_data_.q_actual_ == 0))
+        self.assertTrue(np.all(second.joint_data_.q_actual_ == 1))
+
+    def test_unknown_packet_type(self):
+        ''' Refuse to decode a packet type without decoder
+        '''
+        frames = [(0.0, joint_state_message(np.zeros(6)))]
+        stream = cUrStateStream(
+            'replay', _reconnect=False,
+            _transport=lambda: cUrReplayTransport(frames, PRIMARY))
+        with self.assertRaises(ValueError):
+            stream.next_state((JOINT_DATA, MASTERBOARD_DATA))
+        self.assertIn(JOINT_DATA, stream.next_state((JOINT_DATA, )))
+
+    def test_unix_socket(self):
+        ''' Read the primary interface through a Unix socket
+        '''
+        path = os.path.join(self.directory, 'primary.sock')
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+
+        def serve():
+            conn, _ = server.accept()
+            for i in range(5):
+                conn.sendall(joint_state_message(np.full((6, ), i)))
+            conn.close()
+
+        thread = threading.Thread(target=serve)
+        thread.start()
+        stream = cUrStateStream('unix', _reconnect=False,
+                                _transport=lambda: connect_unix(path, 2.0))
+        for i in range(5):
+            jd = stream.next_state()[1]
+            self.assertEqual(jd.q_actual_[0], i)
+        stream.close()
+        thread.join()
+        server.close()
+
+
+def main():
+    unittest.main()
+
+
+if __name__ == '__main__':
+    main()
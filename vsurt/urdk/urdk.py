@@ -41,3 +41,106 @@ class cUrdk(cVsdk):
             dhalpha = self.kinf_.dh_alpha_[i]
             dhtheta = self.kinf_.dh_theta_[i]
             self.add_link(dha, dhd, dhalpha, dhtheta)
+
+    def fk_batch(self, _q):
+        """Forward kinematics of many joint configurations at once, see
+        forward_kinematics_batch.
+
+        :param _q: (N, 6) array of joint positions
+        :return: (N, 4, 4) array with the pose of the tcp in the base frame
+        """
+        return forward_kinematics_batch(self.kinf_, _q, self.tcp_offset_[:3])
+
+
+def forward_kinematics(_kinf, _q, _tcp_offset=None):
+    """Forward kinematics of a single joint configuration with the standard
+    DH convention, as the product of the transforms of the links. It is the
+    per-configuration counterpart of forward_kinematics_batch and does not
+    need vsdk.
+
+    :param _kinf: DH parameters, cUR3, cUR5, cUR10 or a cUrKinematicsInfo
+    :param _q: the 6 joint positions
+    :param _tcp_offset: position of the tcp in the flange frame. None
+        returns the pose of the flange
+    :return: (4, 4) array with the pose of the tcp in the base frame
+    """
+    pose = np.eye(4)
+    for i in range(6):
+        ct = np.cos(_q[i] + _kinf.dh_theta_[i])
+        st = np.sin(_q[i] + _kinf.dh_theta_[i])
+        ca = np.cos(_kinf.dh_alpha_[i])
+        sa = np.sin(_kinf.dh_alpha_[i])
+        a = _kinf.dh_a_[i]
+        d = _kinf.dh_d_[i]
+        pose = pose.dot(np.array([[ct, -st * ca, st * sa, a * ct],
+                                  [st, ct * ca, -ct * sa, a * st],
+                                  [0.0, sa, ca, d],
+                                  [0.0, 0.0, 0.0, 1.0]]))
+    if _tcp_offset is not None:
+        pose[:3, 3] += pose[:3, :3].dot(np.asarray(_tcp_offset, dtype=float))
+    return pose
+
+
+def forward_kinematics_batch(_kinf, _q, _tcp_offset=None, _chunk=4096):
+    """Forward kinematics of N joint configurations with the standard DH
+    convention, vectorized over the configurations: the trigonometry of all
+    the joints is computed at once and the link transforms are chained with
+    stacked matrix products. The configurations are processed in chunks of
+    _chunk, which bounds the temporary memory.
+
+    :param _kinf: DH parameters, cUR3, cUR5, cUR10 or a cUrKinematicsInfo
+    :param _q: (N, 6) array of joint positions
+    :param _tcp_offset: position of the tcp in the flange frame. None
+        returns the pose of the flange
+    :param _chunk: number of configurations processed at once
+    :return: (N, 4, 4) array with the pose of the tcp in the base frame
+    """
+    q = np.asarray(_q, dtype=float)
+    if q.ndim != 2 or q.shape[1] != 6:
+        raise ValueError('_q must be a (N, 6) array')
+    dha = np.asarray(_kinf.dh_a_, dtype=float)
+    dhd = np.asarray(_kinf.dh_d_, dtype=float)
+    dhtheta = np.asarray(_kinf.dh_theta_, dtype=float)
+    cos_alpha = np.cos(_kinf.dh_alpha_)
+    sin_alpha = np.sin(_kinf.dh_alpha_)
+
+    result = np.empty((len(q), 4, 4))
+    link = np.empty((min(_chunk, len(q)), 4, 4))
+    for start in range(0, len(q), _chunk):
+        stop = min(start + _chunk, len(q))
+        theta = q[start:stop] + dhtheta
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+        pose = result[start:stop]
+        _dh_transform(pose, cos_theta[:, 0], sin_theta[:, 0], dha[0],
+                      dhd[0], cos_alpha[0], sin_alpha[0])
+        for i in range(1, 6):
+            _dh_transform(link[:stop - start], cos_theta[:, i],
+                          sin_theta[:, i], dha[i], dhd[i], cos_alpha[i],
+                          sin_alpha[i])
+            np.matmul(pose, link[:stop - start], out=pose)
+        if _tcp_offset is not None:
+            pose[:, :3, 3] += pose[:, :3, :3] @ np.asarray(_tcp_offset,
+                                                          dtype=float)
+    return result
+
+
+def _dh_transform(_out, _cos_theta, _sin_theta, _a, _d, _cos_alpha,
+                  _sin_alpha):
+    """Write in _out the transforms Rz(theta) Tz(d) Tx(a) Rx(alpha) of a
+    link for a vector of joint angles.
+    """
+    _out[:, 0, 0] = _cos_theta
+    _out[:, 0, 1] = -_sin_theta * _cos_alpha
+    _out[:, 0, 2] = _sin_theta * _sin_alpha
+    _out[:, 0, 3] = _a * _cos_theta
+    _out[:, 1, 0] = _sin_theta
+    _out[:, 1, 1] = _cos_theta * _cos_alpha
+    _out[:, 1, 2] = -_cos_theta * _sin_alpha
+    _out[:, 1, 3] = _a * _sin_theta
+    _out[:, 2, 0] = 0.0
+    _out[:, 2, 1] = _sin_alpha
+    _out[:, 2, 2] = _cos_alpha
+    _out[:, 2, 3] = _d
+    _out[:, 3, :3] = 0.0
+    _out[:, 3, 3] = 1.0
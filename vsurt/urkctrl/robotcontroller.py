@@ -2,14 +2,20 @@
 '''
 import urmsgs.rtde.rtde as rtde
 import urmsgs.rtde.rtde_config as rtde_config
+import urmsgs.rtde.rtde_receiver as rtde_receiver
+import urmsgs.rtde.serialize as serialize
 import numpy as np
 
-from threading import Lock
-
 from copy import deepcopy, copy
 
 import time
 
+# registers of the command recipe written by sendControl: the 6 joint
+# speeds, the acceleration and the 2 flags of the velocity command
+COMMAND_REGISTERS = ['input_double_register_%d' % i for i in range(7)] + [
+    'input_int_register_0', 'input_int_register_1']
+COMMAND_TYPES = ['DOUBLE'] * 7 + ['INT32'] * 2
+
 
 class cRobotController(object):
     """
@@ -17,47 +23,125 @@ class cRobotController(object):
       directly to the RTDE server.
     """
 
-    def __init__(self):
+    def __init__(self, config_filename='rtdeinterface_conf.xml',
+                 state_recipe='state', command_recipe='setvelocity'):
         """
           Initialize this class, initializating common variables
+
+          Parameters:
+          ----------
+            config_filename: RTDE configuration file
+            state_recipe: key of the output recipe read by getFeedback
+            command_recipe: key of the input recipe written by sendControl,
+              it must have the registers of COMMAND_REGISTERS, in any order
+
+          Raises:
+          ------
+            ValueError if the command recipe misses a register of
+            sendControl or has it with another type.
         """
-        config_filename = 'rtdeinterface_conf.xml'  # RTDE configuration file
-        conf = rtde_config.ConfigFile(config_filename)  # load conf file
-        self.state_names, self.state_types = conf.get_recipe('state')
-        self.iregHandler_names, self.iregHandler_types = conf.get_recipe(
-            'setvelocity')
+        self.conf = rtde_config.ConfigFile(config_filename)  # load conf file
+        self.state_names, self.state_types = self.conf.get_recipe(
+            state_recipe)
+        self.iregHandler_names, self.iregHandler_types = self.conf.get_recipe(
+            command_recipe)
+        types = dict(zip(self.iregHandler_names, self.iregHandler_types))
+        for name, data_type in zip(COMMAND_REGISTERS, COMMAND_TYPES):
+            if types.get(name) != data_type:
+                raise ValueError('Recipe %s needs the %s register %s' %
+                                 (command_recipe, data_type, name))
+        # extra output recipes, key -> (frequency, maxsize), see
+        # addOutputRecipe
+        self.output_recipes = {}
+        self.recipe_queues = {}
         #       self.watchdog_names, self.watchdog_types = conf.get_recipe('watchdog')
 
         self.keep_running = True
+        self.receiver = None
+        self.seq = 0  # sequence of the last state read
+        self.age = 0.0  # seconds since the last state read was received
 
-    def connect(self, host='10.10.238.32', port=30004):
+    def connect(self, host='10.10.238.32', port=30004, background=False,
+                reconnect=False):
         """
           This function connects to the correct robot.
             - If we are controlling the real robot, it
               connects to the RTDE server
+            - If background is True, the state is received in a background
+              thread and getFeedback returns the newest state without
+              blocking.
+            - If reconnect is True, a lost connection is restored by
+              rtde.RTDE.reconnect with the same recipes and the last
+              command sent, instead of connecting again.
         """
         # -------------------------------------------------
         # ------------- Connect to the robot RTDE server
         # -------------------------------------------------
-        self.con = rtde.RTDE(host, port)
+        self.con = rtde.RTDE(host, port, reconnect=reconnect)
         handshake_result = self.con.connect()
         if not handshake_result:
             return False
         self.ver = self.con.get_controller_version()
         try:
-            self.con.send_output_setup(self.state_names, self.state_types)
+            self.stateId = self.con.add_output_setup(self.state_names,
+                                                     self.state_types)
+            if self.stateId is None:
+                return False
+            for key, (frequency, maxsize) in self.output_recipes.items():
+                names, types = self.conf.get_recipe(key)
+                recipe_id = self.con.add_output_setup(names, types, frequency)
+                if recipe_id is None:
+                    return False
+                self.recipe_queues[key] = self.con.subscribe(
+                    recipe_id, maxsize)
             self.iregHandler = self.con.send_input_setup(
                 self.iregHandler_names, self.iregHandler_types)
         except ValueError:
             return False
+        # packs the command recipe in a preallocated frame, the registers
+        # of sendControl are found by name, whatever their order
+        self.iregWriter = self.con.input_writer(self.iregHandler.recipe_id)
+        self.iregValues = [0] * self.iregWriter.size
+        try:
+            self.iregIndex = [self.iregWriter.index(name)
+                              for name in COMMAND_REGISTERS]
+        except ValueError:
+            return False
 
         if not self.con.send_start():
             return False
 
         self.setInputZero()
 
+        if background:
+            # the states of the receiver are returned as the DataObject
+            # which con.receive returns in blocking mode
+            self.stateClass = serialize.data_class(self.state_names)
+            self.receiver = rtde_receiver.RTDEReceiver(self.con).start()
+            if not self.receiver.wait(rtde.DEFAULT_TIMEOUT):
+                self.receiver.stop()
+                self.receiver = None
+                return False
+
         return True
 
+    def addOutputRecipe(self, key, frequency=125, maxsize=0):
+        """
+          Stream one more output recipe of the configuration file on the
+          same connection, e.g. a wide recipe at a low frequency for
+          logging. It must be called before connect. Its packages are put
+          in the queue.Queue self.recipe_queues[key] while the state is
+          received.
+
+          Parameters:
+          ----------
+            key: key of the recipe in the configuration file
+            frequency: frequency of the recipe
+            maxsize: maximum number of packages in the queue, 0 means
+              unbounded
+        """
+        self.output_recipes[key] = (frequency, maxsize)
+
     def setInputZero(self):
         self.iregHandler.input_double_register_0 = 0.0
         self.iregHandler.input_double_register_1 = 0.0
@@ -86,9 +170,20 @@ class cRobotController(object):
           -------
             res: tuple
               a tuple of arrays containts the requested information
+
+          In background mode the newest state is read without blocking,
+          self.seq is its sequence number and self.age the seconds since it
+          was received. In both modes self.state is the serialize.DataObject
+          of the state.
         """
         res = ()
-        self.state = self.con.receive()
+        if self.receiver is not None:
+            state, self.seq, self.age = self.receiver.latest_state()
+            values = [v.tolist() if isinstance(v, np.ndarray) else v
+                      for v in state.item()]
+            self.state = self.stateClass(self.stateId, *values)
+        else:
+            self.state = self.con.receive()
         for key in options:
             res = res + (np.array(getattr(self.state, key)), )
         self.timeSeconds = time.time()
@@ -97,22 +192,27 @@ class cRobotController(object):
     def sendControl(self, target_qd, acc):
         """
           Send a velocity command to the robot.
+
+          Parameters:
+          ----------
+            target_qd: tuple or numpy vector with the 6 joint speeds
+            acc: joint acceleration
         """
-        self.iregHandler.input_double_register_0 = target_qd[0]
-        self.iregHandler.input_double_register_1 = target_qd[1]
-        self.iregHandler.input_double_register_2 = target_qd[2]
-        self.iregHandler.input_double_register_3 = target_qd[3]
-        self.iregHandler.input_double_register_4 = target_qd[4]
-        self.iregHandler.input_double_register_5 = target_qd[5]
-        self.iregHandler.input_double_register_6 = acc
-        self.iregHandler.input_int_register_0 = 1
-        self.iregHandler.input_int_register_1 = 1
-        self.con.send(self.iregHandler)
+        values = self.iregValues
+        for i, value in zip(self.iregIndex,
+                            (target_qd[0], target_qd[1], target_qd[2],
+                             target_qd[3], target_qd[4], target_qd[5],
+                             acc, 1, 1)):
+            values[i] = value
+        self.con.send_frame(self.iregWriter.pack(values))
 
     def disconnect(self, signal=None, frame=None):
         """
           Disconet. This only serves if we are contronlling the real robot.
         """
+        if self.receiver is not None:
+            self.receiver.stop()
+            self.receiver = None
         self.con.send_pause()
         self.con.disconnect()
 
@@ -22,54 +22,223 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import csv
+import itertools
+import json
+import logging
+import os
+import struct
 import numpy as np
 
+from . import serialize
+
 
 runtime_state = 'runtime_state'
 runtime_state_running = '2'
 
 class CSVReader(object):
+    """
+      Reads a whole CSV log written by csv_writer.CSVWriter. Each column is
+      stored as a float array in a member variable with its name. For logs
+      which do not fit in memory use CSVColumnReader or the binary format.
+    """
     __samples = None
     __filename = None
     def get_header_data(self,__reader):
-        header = __reader.next()
+        header = next(__reader)
         return header
     
     def __init__(self, csvfile, delimiter = ' ', filter_running_program=False):
         self.__filename = csvfile.name
         
-        csvfile = [csvfile for csvfile in csvfile.readlines() if csvfile.strip()] # remove any empty lines
-        
-        reader = csv.reader(csvfile, delimiter=delimiter)
-        header = self.get_header_data(reader)
+        reader = CSVColumnReader(csvfile, delimiter=delimiter)
+        header = reader.header
+        data = reader.read()
+        self.__samples = len(data[header[0]]) if header else 0
         
-        # read csv file
-        data = [row for row in reader]
-        
-        if len(data)==0:
-            logging.warn('No data read from file: ' + self.__filename)
+        if self.__samples == 0:
+            logging.warning('No data read from file: ' + self.__filename)
         
         # filter data 
         if filter_running_program:
             if runtime_state not in header:
-                logging.warn('Unable to filter data since runtime_state field is missing in data set')
+                logging.warning('Unable to filter data since runtime_state field is missing in data set')
             else:
-                idx = header.index(runtime_state)
-                data = [row for row in data if row[idx] == runtime_state_running]
+                running = data[runtime_state] == float(runtime_state_running)
+                data = {name: column[running] for name, column in data.items()}
+                self.__samples = int(np.count_nonzero(running))
         
-        self.__samples = len(data)
-        
-        if self.__samples == 0:
-            logging.warn('No data left from file: ' + self.__filename + ' after filtering')
-        
-        # transpose data
-        data = zip(*data)
+                if self.__samples == 0:
+                    logging.warning('No data left from file: ' + self.__filename + ' after filtering')
         
         # create dictionary from  header elements (keys) to float arrays
-        self.__dict__.update({header[i]: np.array(map(float, data[:][i])) for i in range(len(header))})
+        self.__dict__.update(data)
         
     def get_samples(self):
         return self.__samples
     
     def get_name(self):
-        return self.__filename
\ No newline at end of file
+        return self.__filename
+
+
+class CSVColumnReader(object):
+    """
+      Reads a CSV log written by csv_writer.CSVWriter in chunks of rows,
+      parsing only the requested columns into numpy arrays, so logs larger
+      than the memory can be processed.
+
+      The columns of a vector register are written as name_0, name_1...
+      Requesting name returns them together in a N x size array.
+
+      Member Variables:
+      ----------------
+        header:  list with the names of the columns of the file
+        columns: list with the names of the arrays returned
+    """
+
+    def __init__(self, csvfile, columns=None, delimiter=' ',
+                 chunk_size=65536):
+        """
+        Parameters:
+        ----------
+          csvfile:    file opened in text mode
+          columns:    names of the registers or columns to read, by default
+                      all the columns of the file
+          delimiter:  delimiter of the columns
+          chunk_size: number of rows parsed at once
+        """
+        self.__file = csvfile
+        self.__delimiter = delimiter
+        self.__chunk_size = chunk_size
+        line = ''
+        while not line.strip():
+            line = csvfile.readline()
+            if line == '':
+                break
+        self.header = next(csv.reader([line], delimiter=delimiter)) \
+            if line.strip() else []
+        index = {name: i for i, name in enumerate(self.header)}
+
+        if columns is None:
+            columns = self.header
+        # name -> indices of its columns in the file
+        self.__selection = []
+        for name in columns:
+            if name in index:
+                self.__selection.append((name, [index[name]]))
+                continue
+            vector = []
+            while name + '_' + str(len(vector)) in index:
+                vector.append(index[name + '_' + str(len(vector))])
+            if not vector:
+                raise ValueError('Column not found: ' + name)
+            self.__selection.append((name, vector))
+        self.columns = [name for name, _ in self.__selection]
+        self.__usecols = sorted(set(
+            i for _, indices in self.__selection for i in indices))
+        position = {col: k for k, col in enumerate(self.__usecols)}
+        self.__positions = [(name, [position[i] for i in indices],
+                             len(indices) > 1 or name not in index)
+                            for name, indices in self.__selection]
+
+    def chunks(self):
+        """
+          Generator yielding a dict per chunk of rows which maps the
+          requested columns to float numpy arrays.
+        """
+        width = len(self.__usecols)
+        while True:
+            lines = [l for l in itertools.islice(self.__file,
+                                                 self.__chunk_size)
+                     if l.strip()]
+            if not lines:
+                return
+            data = np.loadtxt(lines, delimiter=self.__delimiter,
+                              usecols=self.__usecols, ndmin=2)
+            data = data.reshape((-1, width))
+            yield {name: data[:, cols] if vector else data[:, cols[0]]
+                   for name, cols, vector in self.__positions}
+
+    def read(self):
+        """
+          Reads the remaining rows and returns a dict which maps the
+          requested columns to float numpy arrays.
+        """
+        chunks = list(self.chunks())
+        if not chunks:
+            return {name: np.empty((0, len(cols)) if vector else (0, ))
+                    for name, cols, vector in self.__positions}
+        return {name: np.concatenate([c[name] for c in chunks])
+                for name in self.columns}
+
+
+class BinaryReader(object):
+    """
+      Reads a binary log written by csv_writer.BinaryWriter. The rows are
+      mapped in memory, so opening a log of any size is immediate and each
+      register is a view of the file, e.g.
+
+          log = BinaryReader('log.bin')
+          q = log['actual_q']  # N x 6 array
+
+      Member Variables:
+      ----------------
+        names: names of the registers
+        types: types of the registers
+        data:  read-only numpy memmap with a row per data package
+    """
+
+    def __init__(self, filename):
+        self.__filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(BINARY_HEADER.size)
+            if len(header) < BINARY_HEADER.size:
+                raise ValueError(filename + ' is not a RTDE binary log')
+            magic, version, length = BINARY_HEADER.unpack(header)
+            if magic != BINARY_MAGIC or version != BINARY_VERSION:
+                raise ValueError(filename + ' is not a RTDE binary log')
+            recipe = json.loads(f.read(length).decode('utf-8'))
+        self.names = recipe['names']
+        self.types = recipe['types']
+        self.dtype = binary_dtype(self.names, self.types)
+        offset = binary_data_offset(length)
+        samples = (os.path.getsize(filename) - offset) // self.dtype.itemsize
+        if samples > 0:
+            self.data = np.memmap(filename, dtype=self.dtype, mode='r',
+                                  offset=offset, shape=(samples, ))
+        else:
+            self.data = np.empty((0, ), self.dtype)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def get_samples(self):
+        return len(self.data)
+
+    def get_name(self):
+        return self.__filename
+
+
+BINARY_MAGIC = b'RTDELOG\x00'
+BINARY_VERSION = 1
+# magic, version, length of the json recipe which follows
+BINARY_HEADER = struct.Struct('<8sBI')
+
+
+def binary_dtype(names, types):
+    """
+      Returns the dtype of the rows of a binary log, little-endian so a log
+      reads the same on any host.
+    """
+    return serialize.numpy_dtype(names, types, '<')
+
+
+def binary_data_offset(length):
+    """
+      Returns the offset of the first row, the header and the recipe padded
+      to 16 bytes.
+    """
+    size = BINARY_HEADER.size + length
+    return (size + 15) // 16 * 16
@@ -22,14 +22,22 @@
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 import struct
-import socket
-import select
 import sys
 import logging
+import queue
+import threading
+import time
+import numpy as np
 
 from . import serialize
+from . import rtde_stats
+from ..urtransport import connect_tcp
 
 DEFAULT_TIMEOUT = 1.0
+RECV_BUFFER_SIZE = 65536
+# delays of the exponential backoff between reconnection attempts
+RECONNECT_MIN_DELAY = 0.01
+RECONNECT_MAX_DELAY = 1.0
 
 class Command:
     RTDE_REQUEST_PROTOCOL_VERSION = 86        # ascii V
@@ -52,19 +60,72 @@ class ConnectionState:
 
 
 class RTDE(object):
-    def __init__(self, hostname, port=30004):
+    def __init__(self, hostname, port=30004, capture=None, stats=True,
+                 transport=None, reconnect=False, reconnect_timeout=10.0):
+        """
+        Parameters:
+        ----------
+          hostname: address of the robot
+          port:     port of the RTDE interface
+          capture:  optional vsurt.urmsgs.urcapture.cUrCaptureWriter. Every
+                    packet received from the robot is written in it, so
+                    the session can be replayed by cUrReplayServer.
+          stats:    bool
+                    keep the counters and histograms of the data packages
+                    in self.stats, a rtde_stats.RTDEStats. They are logged
+                    at disconnect.
+          transport: optional function called without arguments by
+                    connect, which returns a connected transport of
+                    vsurt.urmsgs.urtransport. By default a TCP connection
+                    with hostname:port. E.g. to run a client on a capture
+                    as fast as possible
+                      RTDE('replay', transport=lambda:
+                           cUrReplayTransport.from_capture(filename))
+          reconnect: bool
+                    when the connection is lost, call self.reconnect
+                    before the failed call returns, so receiving resumes
+                    on the new connection.
+          reconnect_timeout: seconds reconnect keeps trying by default
+        """
         self.hostname = hostname           
         self.port = port
+        self.__capture = capture
         self.__conn_state = ConnectionState.DISCONNECTED
-        self.__sock = None  # BSD socket
+        self.__transport = transport
+        self.__sock = None  # transport of vsurt.urmsgs.urtransport
+        self.auto_reconnect = reconnect
+        self.reconnect_timeout = reconnect_timeout
+        self.last_outage = None # seconds without connection, see reconnect
+# Requests replayed by reconnect: (command, payload, DataConfig) of each
+# recipe set up, and the last input data package sent of each recipe
+        self.__setups = []
+        self.__inputs = {}
+        self.__reconnecting = False
+# Held while the connection is lost and restored, so the receiving thread
+# and a sending thread which both see the failure do not reconnect twice
+        self.__reconnect_lock = threading.RLock()
+        self.__lost_state = ConnectionState.DISCONNECTED
+        self.__lost_time = None
 #
         self.__output_config = None # serialize.DataConfig with 
+        self.__output_configs = {} # every output recipe by id
+        self.__subscribers = {} # recipe id -> queue.Queue, see subscribe
         self.__input_config = {}
+        self.__batch = None # array reused by receive_batch and drain
+# The received bytes are kept in self.__rbuf[self.__rstart:self.__rend],
+# see self.__fill
+        self.__rbuf = bytearray(RECV_BUFFER_SIZE)
+        self.__rstart = 0
+        self.__rend = 0
+        self.skipped_packages = 0 # stale data packages which were not decoded
+        self.stats = rtde_stats.RTDEStats() if stats else None
+        self.__recv_time = None # time.monotonic() of the last recv
         
     def connect(self):
         """
-        1) Creates a BSD socket for connecting with URControl. If connections
-            is successful, set __conn_state = ConnectionState.CONNECTED.
+        1) Opens the transport, a TCP socket by default, for connecting with
+            URControl. If connections is successful, set
+            __conn_state = ConnectionState.CONNECTED.
         2)  Call self.negotiate_protocol_version, this functions performs
             the first handshake. The handshake is done as follows:
             2.1) Send 5 bytes, [5  (uint16 size of all packet, with size included.),
@@ -77,17 +138,9 @@ class RTDE(object):
         if self.__sock:
             return
 
-        self.__buf = b''
-        try:
-            self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.__sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-            self.__sock.settimeout(DEFAULT_TIMEOUT)
-            self.__sock.connect((self.hostname, self.port))
-            self.__conn_state = ConnectionState.CONNECTED
-        except (socket.timeout, socket.error):
-            self.__sock = None
-            raise
+        self.__open()
+        self.__setups = []
+        self.__inputs = {}
         handshake_result= self.negotiate_protocol_version()
         if not handshake_result:
             logging.error('Unable to negotiate protocol version')
@@ -96,7 +149,8 @@ class RTDE(object):
 
     def disconnect(self):
         """
-          Just close the socket. This send a FIN TCP packet to RTDE
+          Just close the socket. This send a FIN TCP packet to RTDE.
+          The session can still be restored by reconnect.
         Parameters:
         ----------
           None
@@ -104,10 +158,132 @@ class RTDE(object):
         --------
           None
         """
+        if self.__sock and self.stats is not None and self.stats.received:
+            logging.info('RTDE statistics:\n' + self.stats.report())
+        if self.is_connected():
+            self.__lose_connection()
+
+    def __open(self):
+        self.__rstart = 0
+        self.__rend = 0
+        if self.__transport is None:
+            self.__sock = connect_tcp(self.hostname, self.port,
+                                      DEFAULT_TIMEOUT)
+        else:
+            self.__sock = self.__transport()
+        self.__conn_state = ConnectionState.CONNECTED
+
+    def __close(self):
         if self.__sock:
             self.__sock.close()
             self.__sock = None
         self.__conn_state = ConnectionState.DISCONNECTED
+
+    def reconnect(self, timeout=None):
+        """
+        Description:
+        -----------
+          Opens a new connection after the previous one was lost and
+          restores its session without any round trip in between: the
+          protocol request, the setup of every recipe, in the same order
+          so they get the same ids, the start of the synchronization if it
+          was started, and the last input data package sent of each input
+          recipe are sent in a single burst, then the replies are checked.
+          The controller version is not asked again.
+          The attempts are repeated with an exponential backoff, from
+          RECONNECT_MIN_DELAY to RECONNECT_MAX_DELAY seconds, e.g. while
+          the robot still holds the input registers of the old connection.
+          The time without connection is stored in self.last_outage and
+          in self.stats.
+        Parameters:
+        ----------
+          timeout: seconds to keep trying, by default
+                   self.reconnect_timeout. The replies of the burst are
+                   waited for within it as well.
+        Returns:
+        -------
+          Bolean, True if the session was restored. False as well if
+          another thread is already reconnecting.
+        """
+        if not self.__reconnect_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.__reconnecting:
+                return False
+            if timeout is None:
+                timeout = self.reconnect_timeout
+            if self.is_connected():
+                self.__lose_connection()
+            if self.__lost_time is None:
+                self.__lost_time = time.monotonic()
+            deadline = time.monotonic() + timeout
+            delay = RECONNECT_MIN_DELAY
+            self.__reconnecting = True
+            try:
+                while not self.__try_reconnect(deadline):
+                    if time.monotonic() + delay > deadline:
+                        logging.error('RTDE reconnection failed')
+                        return False
+                    time.sleep(delay)
+                    delay = min(2 * delay, RECONNECT_MAX_DELAY)
+            finally:
+                self.__reconnecting = False
+        finally:
+            self.__reconnect_lock.release()
+        self.last_outage = time.monotonic() - self.__lost_time
+        if self.stats is not None:
+            self.stats.on_reconnect(self.last_outage)
+        logging.warning('RTDE reconnected after %.3f s' % self.last_outage)
+        return True
+
+    def __try_reconnect(self, deadline):
+        try:
+            self.__open()
+            if self.__restore_session(deadline):
+                return True
+        except (OSError, ValueError) as exc:
+            logging.info('RTDE reconnection attempt failed: ' + repr(exc))
+        self.__close()
+        return False
+
+    def __restore_session(self, deadline):
+        started = self.__lost_state == ConnectionState.STARTED
+        requests = [(Command.RTDE_REQUEST_PROTOCOL_VERSION,
+                     struct.pack('>H', RTDE_PROTOCOL_VERSION))]
+        requests.extend((command, payload)
+                        for command, payload, _ in self.__setups)
+        if started:
+            requests.append((Command.RTDE_CONTROL_PACKAGE_START, b''))
+        burst = [struct.pack('>HB', 3 + len(payload), command) + payload
+                 for command, payload in requests]
+        if started:
+            burst.extend(self.__inputs.values())
+        self.__sock.sendall(b''.join(burst))
+
+        if not self.__recv(Command.RTDE_REQUEST_PROTOCOL_VERSION,
+                           deadline=deadline):
+            return False
+        for command, _, config in self.__setups:
+            result = self.__recv(command, deadline=deadline)
+            if result is None or result.id != config.id or \
+                    list(result.types) != list(config.types):
+                logging.error('RTDE reconnection: the recipe ' +
+                              ','.join(config.names) + ' changed')
+                return False
+        if started:
+            if not self.__recv(Command.RTDE_CONTROL_PACKAGE_START,
+                               deadline=deadline):
+                return False
+            self.__conn_state = ConnectionState.STARTED
+        else:
+            self.__conn_state = self.__lost_state
+        return True
+
+    def __lose_connection(self):
+        if not self.__reconnecting:
+            self.__lost_state = self.__conn_state
+            self.__lost_time = time.monotonic()
+        self.__close()
         
     def is_connected(self):
         """
@@ -197,10 +373,13 @@ class RTDE(object):
             return None
         # If the data was consistent, 
         result.names = variables
+        result.compile()
         self.__input_config[result.id] = result
+        self.__setups.append((cmd, payload, result))
         return serialize.DataObject.create_empty(variables, result.id)
         
-    def send_output_setup(self, variables, types=[], frequency=125):
+    def send_output_setup(self, variables, types=[], frequency=125,
+                          numpy_vectors=False):
         """
           This command is used during the setup procdure of the RTDE
           functionality.  It configures the RTDE server to generate output
@@ -223,23 +402,92 @@ class RTDE(object):
                       a list with the types of the registers to be readed
             frequency: unsigned int 
                       frequency of the output from RTDE server.
+            numpy_vectors: bool
+                      receive the vector registers as numpy arrays
+                      instead of lists.
           Returns:
           -------
             Bolean, depending on the success or not for configuring
             the RTDE server to send messages with this receipe
         """
+        result = self.__setup_outputs(variables, types, frequency,
+                                      numpy_vectors)
+        if result is None:
+            return False
+        self.__set_primary_output(result, frequency)
+        return True
+
+    def add_output_setup(self, variables, types=[], frequency=125,
+                         numpy_vectors=False):
+        """
+          Sets up one more output recipe. RTDE tags each data package with
+          the id of its recipe, so several recipes can be streamed on the
+          same connection at different frequencies, e.g. a slim one for a
+          control loop and a wide, slower one for logging.
+          The first recipe set up is the one returned by receive,
+          receive_batch... The packages of the other ones are received with
+          receive(recipe_id=...) or delivered to the queue returned by
+          subscribe.
+          Parameters:
+          ----------
+            the same as send_output_setup
+          Returns:
+          -------
+            the id of the recipe or None on error.
+        """
+        result = self.__setup_outputs(variables, types, frequency,
+                                      numpy_vectors)
+        if result is None:
+            return None
+        if self.__output_config is None:
+            self.__set_primary_output(result, frequency)
+        return result.id
+
+    def subscribe(self, recipe_id, maxsize=0):
+        """
+          Delivers the data packages of an output recipe to a queue. The
+          packages are decoded and put in the queue while the connection is
+          read, by any receive call or by a rtde_receiver.RTDEReceiver, so
+          a logging thread can consume them with queue.get.
+          Parameters:
+          ----------
+            recipe_id: id returned by add_output_setup
+            maxsize:   maximum number of packages in the queue, 0 means
+                       unbounded. When the queue is full the oldest
+                       package is dropped.
+          Returns:
+          -------
+            a queue.Queue of serialize.DataObject
+        """
+        if recipe_id not in self.__output_configs:
+            raise ValueError('Output configuration id not found: ' +
+                             str(recipe_id))
+        subscriber = queue.Queue(maxsize)
+        self.__subscribers[recipe_id] = subscriber
+        return subscriber
+
+    def __setup_outputs(self, variables, types, frequency, numpy_vectors):
         cmd = Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS
         payload = struct.pack('>d', frequency)
         payload = payload + bytes(','.join(variables), 'utf-8')
         result = self.__sendAndReceive(cmd, payload)
+        if result is None:
+            return None
         if len(types)!=0 and not self.__list_equals(result.types, types):
             logging.error('Data type inconsistency for output setup: ' +
                      str(types) + ' - ' +
                      str(result.types))
-            return False
+            return None
         result.names = variables
-        self.__output_config = result
-        return True
+        result.compile(numpy_vectors)
+        self.__output_configs[result.id] = result
+        self.__setups.append((cmd, payload, result))
+        return result
+
+    def __set_primary_output(self, config, frequency):
+        self.__output_config = config
+        if self.stats is not None:
+            self.stats.set_frequency(frequency)
         
     def send_start(self):
         cmd = Command.RTDE_CONTROL_PACKAGE_START
@@ -269,9 +517,71 @@ class RTDE(object):
             logging.error('Input configuration id not found: ' + str(input_data.recipe_id))
             return
         config = self.__input_config[input_data.recipe_id]
-        return self.__sendall(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+        payload = config.pack(input_data)
+        frame = struct.pack('>HB', 3 + len(payload),
+                            Command.RTDE_DATA_PACKAGE) + payload
+        sent = self.__write(frame)
+        if sent:
+            # the newest values of the recipe, sent again by reconnect
+            self.__inputs[input_data.recipe_id] = frame
+            if self.stats is not None:
+                self.stats.on_send(time.monotonic())
+        return sent
+
+    def input_writer(self, recipe_id):
+        """
+        Description:
+        -----------
+            Returns a serialize.InputWriter of an input recipe. The frames
+            it packs are sent with send_frame, e.g.
+
+                writer = con.input_writer(inputs.recipe_id)
+                con.send_frame(writer.pack(values))
+        Parameters:
+        ----------
+            recipe_id: id of a recipe returned by send_input_setup
+        Returns:
+        --------
+            a serialize.InputWriter or None if the recipe is not set up.
+        """
+        if recipe_id not in self.__input_config:
+            logging.error('Input configuration id not found: ' + str(recipe_id))
+            return None
+        return self.__input_config[recipe_id].writer()
 
-    def receive(self):
+    def send_frame(self, frame):
+        """
+        Description:
+        -----------
+            Sends a whole frame, header included, with a single sendall.
+            Unlike send, it does not wait for the socket to be writable
+            first, so sending a sample is a single system call.
+        Parameters:
+        ----------
+            frame: bytes-like object, e.g. serialize.InputWriter.frame
+        Returns:
+        --------
+            Bolean indicating if the frame was sent.
+        """
+        # read once, the receiving thread may close the connection and
+        # reconnect meanwhile
+        sock = self.__sock
+        if sock is None or self.__conn_state != ConnectionState.STARTED:
+            logging.error('Cannot send when RTDE synchronization is inactive')
+            return False
+        try:
+            sock.sendall(frame)
+        except OSError:
+            self.__trigger_disconnected(sock)
+            return False
+        # the newest values of the recipe, sent again by reconnect. The
+        # frame of an InputWriter is reused, so it is copied.
+        self.__inputs[frame[3]] = bytes(frame)
+        if self.stats is not None:
+            self.stats.on_send(time.monotonic())
+        return True
+
+    def receive(self, latest=False, recipe_id=None):
         """
         Description:
         -----------
@@ -279,9 +589,19 @@ class RTDE(object):
             calls and returns  self.__recv(Command.RTDE_DATA_PACKAGE)
             This returns a serialize.DataConfig.unpack that returns
             serialize.DataObject.unpack 
+            When several data packages are already received only the
+            newest one is decoded, the older ones are counted in
+            self.skipped_packages.
         Parameters:
         ----------
-            None
+            latest: bool
+                 low latency mode. Before looking for a package all the
+                 data waiting in the socket is read, so the package
+                 returned is the newest one sent by the robot, even if the
+                 caller is slower than the robot.
+            recipe_id: int
+                 id of the output recipe to receive, by default the first
+                 one set up.
         Returns:
         --------
           Returns the same that self.__unpack_data_package() under
@@ -295,7 +615,272 @@ class RTDE(object):
         if self.__conn_state != ConnectionState.STARTED:
             logging.error('Cannot receive when RTDE synchronization is inactive')
             return None
-        return self.__recv(Command.RTDE_DATA_PACKAGE)
+        if recipe_id is None:
+            recipe_id = self.__output_config.id
+        elif recipe_id not in self.__output_configs:
+            logging.error('Output configuration id not found: ' + str(recipe_id))
+            return None
+        return self.__recv(Command.RTDE_DATA_PACKAGE, latest,
+                           recipe_id=recipe_id)
+
+    def receive_into(self, out, latest=True):
+        """
+        Description:
+        -----------
+            As receive, but the data package is decoded in the first row of
+            a preallocated numpy structured array, so no object is created
+            per package.
+        Parameters:
+        ----------
+            out:    numpy array whose dtype is self.__output_config.dtype,
+                    see output_dtype
+            latest: bool
+                    low latency mode, see receive
+        Returns:
+        --------
+            out or None on error.
+        """
+        if not self.__can_receive():
+            return None
+        return self.__recv(Command.RTDE_DATA_PACKAGE, latest, out,
+                           self.__output_config.id)
+
+    def output_dtype(self):
+        """
+          Returns the numpy dtype of the output recipe, or None if it is
+          not set up.
+        """
+        if self.__output_config is None:
+            return None
+        return self.__output_config.dtype
+
+    def receive_batch(self, n, out=None):
+        """
+        Description:
+        -----------
+            Blocks until n data packages are received and decodes them
+            into the rows of a numpy structured array whose dtype is
+            self.__output_config.dtype, one field per register of the
+            output recipe. Unlike receive, no package is skipped.
+        Parameters:
+        ----------
+            n:   int
+                 number of data packages to receive
+            out: optional numpy array with the recipe dtype and at least
+                 n rows. By default an array owned by this instance is
+                 reused, so the result is overwritten by the next call to
+                 receive_batch or drain.
+        Returns:
+        --------
+            out[:k], the k <= n rows filled. k < n only if the
+            connection was lost. None on error.
+        """
+        if not self.__can_receive():
+            return None
+        out = self.__batch_array(n, out)
+        count = self.__unpack_batch(out, 0, n)
+        while count < n and self.is_connected():
+            if self.__fill(DEFAULT_TIMEOUT):
+                count = self.__unpack_batch(out, count, n)
+        return out[:count]
+
+    def drain(self, out=None):
+        """
+        Description:
+        -----------
+            Decodes, without blocking, every complete data package already
+            received into the rows of a numpy structured array, as
+            receive_batch.
+        Parameters:
+        ----------
+            out: optional numpy array with the recipe dtype. If it is too
+                 small for the packages available the remaining ones are
+                 kept for the next call.
+        Returns:
+        --------
+            the filled rows of out. None on error.
+        """
+        if not self.__can_receive():
+            return None
+        self.__fill_available()
+        if out is None:
+            frame = self.__output_config.package_dtype.itemsize
+            out = self.__batch_array((self.__rend - self.__rstart) // frame,
+                                     None)
+        count = self.__unpack_batch(out, 0, len(out))
+        return out[:count]
+
+    def __can_receive(self):
+        if self.__output_config is None:
+            logging.error('Output configuration not initialized')
+            return False
+        if self.__conn_state != ConnectionState.STARTED:
+            logging.error('Cannot receive when RTDE synchronization is inactive')
+            return False
+        return True
+
+    def __batch_array(self, n, out):
+        if out is not None:
+            return out
+        dtype = self.__output_config.dtype
+        if self.__batch is None or self.__batch.dtype != dtype or \
+                len(self.__batch) < n:
+            self.__batch = np.empty((n, ), dtype)
+        return self.__batch
+
+    def __fill(self, timeout):
+        """
+          Waits at most timeout seconds for data in the socket and receives
+          it at the end of self.__rbuf. Returns False if the connection was
+          closed.
+          The data is received in place with recv_into. The unread bytes
+          are moved to the start of the buffer only when there is no room
+          left after them, and the buffer is replaced by a larger one only
+          when the unread bytes fill it, so each byte is copied a bounded
+          number of times however large the backlog is.
+        """
+        sock = self.__sock
+        if sock is None:
+            return False
+        try:
+            if not sock.readable(timeout):
+                return True
+        except (OSError, ValueError):
+            # closed by another thread
+            self.__trigger_disconnected(sock)
+            return self.is_connected()
+        if self.__rstart == self.__rend:
+            self.__rstart = self.__rend = 0
+        elif len(self.__rbuf) - self.__rend < RECV_BUFFER_SIZE // 4:
+            unread = self.__rend - self.__rstart
+            if unread > len(self.__rbuf) // 2:
+                rbuf = bytearray(2 * len(self.__rbuf))
+            else:
+                rbuf = self.__rbuf
+            rbuf[:unread] = self.__rbuf[self.__rstart:self.__rend]
+            self.__rbuf = rbuf
+            self.__rstart, self.__rend = 0, unread
+        view = memoryview(self.__rbuf)[self.__rend:]
+        try:
+            n = sock.recv_into(view)
+        except OSError:
+            n = 0
+        finally:
+            view.release()
+        if n == 0:
+            self.__trigger_disconnected(sock)
+            # the buffer is empty if the connection was restored
+            return self.is_connected()
+        self.__rend += n
+        self.__recv_time = time.monotonic()
+        return True
+
+    def __fill_available(self):
+        """
+          Receives, without blocking, all the data waiting in the socket.
+        """
+        while self.is_connected() and self.has_data():
+            if not self.__fill(0):
+                return False
+        return self.is_connected()
+
+    def __next_packet(self):
+        """
+          Extracts the next complete packet of self.__rbuf.
+          Returns (command, start, size), where the packet, header
+          included, is self.__rbuf[start:start + size], or None if the
+          buffer does not contain a complete packet.
+        """
+        start = self.__rstart
+        if self.__rend - start < 3:
+            return None
+        size, command = struct.unpack_from('>HB', self.__rbuf, start)
+        if size < 3:
+            logging.error('Wrong RTDE package size: ' + str(size))
+            self.__trigger_disconnected()
+            return None
+        if self.__rend - start < size:
+            return None
+        self.__rstart = start + size
+        if self.__capture is not None:
+            self.__capture.write(self.__rbuf[start:start + size])
+        if command == Command.RTDE_DATA_PACKAGE and self.stats is not None \
+                and self.__is_primary(start):
+            self.stats.on_receive(self.__recv_time)
+        return command, start, size
+
+    def __unpack_batch(self, out, count, n):
+        """
+          Decodes the complete packages of self.__rbuf into out[count:n].
+          Consecutive data packages of the output recipe have the same
+          layout, so each run of them is decoded with a single
+          np.frombuffer and a single assignment. The data packages of the
+          other recipes are dispatched and the other packages are handled
+          by __on_packet.
+          Returns the number of rows of out filled.
+        """
+        frame = self.__output_config.package_dtype.itemsize
+        run = self.__rstart # start of the current run of data packages
+        while count + (self.__rstart - run) // frame < n:
+            packet = self.__next_packet()
+            if packet is None:
+                break
+            command, start, size = packet
+            if command == Command.RTDE_DATA_PACKAGE and size == frame and \
+                    self.__is_primary(start):
+                continue
+            count = self.__store_run(out, count, run, start)
+            if command == Command.RTDE_DATA_PACKAGE:
+                self.__dispatch(start, size)
+            else:
+                self.__on_packet(command, bytes(self.__rbuf[start + 3:start + size]))
+            run = self.__rstart
+        return self.__store_run(out, count, run, self.__rstart)
+
+    def __is_primary(self, start):
+        """
+          Returns if the data package at start belongs to the first output
+          recipe.
+        """
+        return self.__output_config is not None and \
+            self.__rbuf[start + 3] == self.__output_config.id
+
+    def __dispatch(self, start, size):
+        """
+          Handles a data package which was not requested: it is decoded
+          and put in the queue of its recipe if it has a subscriber,
+          otherwise it is counted as skipped without decoding it.
+        """
+        subscriber = self.__subscribers.get(self.__rbuf[start + 3])
+        if subscriber is None:
+            self.skipped_packages += 1
+            if self.stats is not None:
+                self.stats.on_skip()
+            return
+        data = self.__on_packet(Command.RTDE_DATA_PACKAGE,
+                                bytes(self.__rbuf[start + 3:start + size]))
+        while True:
+            try:
+                subscriber.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def __store_run(self, out, count, start, stop):
+        k = (stop - start) // self.__output_config.package_dtype.itemsize
+        if k > 0:
+            t0 = time.perf_counter()
+            packages = np.frombuffer(self.__rbuf,
+                                     self.__output_config.package_dtype, k,
+                                     start)
+            # structured arrays are assigned field by field in order
+            out[count:count + k] = packages[self.__output_config.names]
+            if self.stats is not None:
+                self.stats.on_decode(time.perf_counter() - t0, k)
+        return count + k
 
     def send_message(self, message, source = "Python Client", type = serialize.Message.INFO_MESSAGE):
         cmd = Command.RTDE_TEXT_MESSAGE
@@ -323,11 +908,11 @@ class RTDE(object):
 
         """
         if cmd == Command.RTDE_REQUEST_PROTOCOL_VERSION:
-            print("sending command RTDE_REQUEST_PROTOCOL_VERSION:")
+            logging.debug('received RTDE_REQUEST_PROTOCOL_VERSION')
             # returns a bolean
             return self.__unpack_protocol_version_package(payload)
         elif cmd == Command.RTDE_GET_URCONTROL_VERSION:
-            print("sending command RTDE_GET_URCONTROL_VERSION:")
+            logging.debug('received RTDE_GET_URCONTROL_VERSION')
             # returns an instance of serialize.ControlVersion class
             return self.__unpack_urcontrol_version_package(payload)
         elif cmd == Command.RTDE_TEXT_MESSAGE:
@@ -343,7 +928,8 @@ class RTDE(object):
         elif cmd == Command.RTDE_CONTROL_PACKAGE_PAUSE:
             return self.__unpack_pause_package(payload)
         elif cmd == Command.RTDE_DATA_PACKAGE:
-            return self.__unpack_data_package(payload, self.__output_config)
+            return self.__unpack_data_package(
+                payload, self.__output_configs.get(payload[0]))
         else:
             logging.error('Unknown package command: ' + str(cmd))
             
@@ -395,22 +981,26 @@ class RTDE(object):
         fmt = '>HB'
         size = struct.calcsize(fmt) + len(payload)
         buf = struct.pack(fmt, size, command) + payload
-        
-        if self.__sock is None:
+        return self.__write(buf)
+
+    def __write(self, buf):
+        sock = self.__sock
+        if sock is None:
             logging.error('Unable to send: not connected to Robot')
             return False
         
-        _, writable, _ = select.select([], [self.__sock], [], DEFAULT_TIMEOUT)
-        if len(writable):
+        try:
+            if sock.writable(DEFAULT_TIMEOUT):
 # Unlike Socket.send, Socket.sendall will continue to send data until eithr all
 # data has been sent or an error occurs. It returns None on success. On error
 # an exception is raised, there is no way to determine how much data, if any,
 # was sent.
-            self.__sock.sendall(buf)
-            return True
-        else:
-            self.__trigger_disconnected()
-            return False
+                sock.sendall(buf)
+                return True
+        except (OSError, ValueError):
+            pass
+        self.__trigger_disconnected(sock)
+        return False
         
     def has_data(self):
         """
@@ -426,53 +1016,52 @@ class RTDE(object):
         -------
             Bolean.
         """
-        timeout = 0
-        readable, _, _ = select.select([self.__sock], [], [], timeout)
-        return len(readable)!=0
+        return self.__sock.readable(0)
         
-    def __recv(self, command):
+    def __recv(self, command, latest=False, out=None, recipe_id=None,
+               deadline=None):
         """
         Description:
         -----------
           If we are connected to URControl, this functions do the following
-          1) waits for the readability of the socket self.__sock,
-          2) when self.sock is readable, call __sock.recv and store the data
-             available in the socket's buffer in the local varaible "more".
-          3) If there is no data available in the socket's buffer, then, or it
-             received a FIN or RST  TCP packet, or timeout. So disconnect by
-             calling self.__trigger_disconnected(), and return None.
-          4) If the socket receives something, its buffer has that something,
-             which is stored in $more and appended to self.__buf.
-              ATTENTION) for one reason, self.__buf is not initialized here,
-                         it could has something inside. It is initialled in
-                         connect.
-          5) The self.__buf buffer will be filled up with pieces of data
-             received from the socket until its size becomes greater than 3
-             bytes.
-          6) When we have $more that 3 bytes, we look at the first 3 bytes of
-             self.__buf. The first two bytes contain a uint16_t which is stored
-             in packet_header.size, the third byte has a uint8_t which is
-             stored in packet_header.command.
-          7) For several reasons, the socket's internal buffer may contain more
-             that a single packet. If that happens, the following proposition
-             is True len(self.__buf) >= packet_header.size. If that is
-             verified, necessary there was in the buffer a first packet and a
-             piece of a second packet or more. The variable packet will refer
-             to the content of the packet (without the 3 first bytes).  The
-             variable self.__buf will refer to the rest. 
-          8) The content of packet is deserialized in
-             self.__on_packet(command,packet). This function is a sort of
-             switch-case, that calls a specific deserializing algorithm
-             depending on the parameter command. This functions waits of an
-             specific number of bytes, if not returns None, which is returned
-             by this function.
-          9) If len(self.__buf[packet_header.size:]) == 0, return that that was
-             returned by __on_packet.
+          1) extracts the complete packets already received in
+             self.__rbuf. Each packet starts with 3 bytes, a uint16_t with
+             the size of the packet (header included) and a uint8_t with
+             its command.
+          2) The content of each packet which is not a data package is
+             deserialized in self.__on_packet(command,packet). This
+             function is a sort of switch-case, that calls a specific
+             deserializing algorithm depending on the parameter command.
+             If the packet is the one requested by command, what
+             __on_packet returns is returned by this function.
+          3) Data packages are not deserialized while reading the buffer,
+             only the position of the newest one of recipe_id is kept. The
+             older ones are stale and are counted in
+             self.skipped_packages. When no complete packet is left, the
+             newest data package is deserialized and returned if command
+             is Command.RTDE_DATA_PACKAGE. The data packages of the other
+             recipes are handled by self.__dispatch.
+          4) If the buffer does not contain the requested packet, waits
+             for the readability of the socket self.__sock and receives
+             what is available in self.__rbuf (see self.__fill). If the
+             socket received a FIN or RST TCP packet, disconnect by calling
+             self.__trigger_disconnected(), and return None.
         Parameters:
         ----------
           command:  uint8_t
                   a character representing the packet type that we want to
                   retrieve from the connection with URControl.
+          latest:   bool
+                  read all the data waiting in the socket before looking for
+                  the packet, so a data package is the newest one available.
+          out:      optional numpy array with the dtype of the output
+                  recipe. If given a data package is decoded in out[0]
+                  instead of in a new serialize.DataObject, and out is
+                  returned.
+          recipe_id: id of the output recipe of the data package
+          deadline: time.monotonic() after which None is returned if the
+                  packet did not arrive. By default the socket is waited
+                  for until the connection is closed.
         Returns:
         --------
           A class containing the last message received which correspint thwith
@@ -480,41 +1069,63 @@ class RTDE(object):
           was not correctly received.
         """
         while self.is_connected():
-            readable, _, _ = select.select([self.__sock], [], [], DEFAULT_TIMEOUT)
-            if len(readable):
-                more = self.__sock.recv(4096)
-                if len(more) == 0:
-                    self.__trigger_disconnected()
-                    return None
-
-                self.__buf = self.__buf + more
-                
-            # unpack_from requires a buffer of at least 3 bytes
-            while len(self.__buf) >= 3:
-                # Attempts to extract a packet
-                # returns a ControlHeader instance with attributes command and size.
-                packet_header = serialize.ControlHeader.unpack(self.__buf)
-                # here we have packet_header.size == 3 + packet length
-
-                # does buffer contain more than specified in the header?
-                if len(self.__buf) >= packet_header.size:
-                  # then, necessarily, the buffer contains a new packet
-                  # starting at the packet_header.size-th byte.
-                    packet, self.__buf = self.__buf[3:packet_header.size], self.__buf[packet_header.size:]
-                  # the actual packet is referenced by packet.
-                  # The new packet is referenced by self.__buf
-                    data = self.__on_packet(packet_header.command, packet)
-                    if packet_header.command == command and len(self.__buf) == 0:
-                        return data
-                    if packet_header.command == command and len(self.__buf) != 0:
-                        logging.info('skipping package')
-                else:
+            if latest:
+                # the packets received before a disconnection are still used
+                self.__fill_available()
+            newest = None # (start, size) of the newest data package
+            while True:
+                packet = self.__next_packet()
+                if packet is None:
                     break
+                cmd, start, size = packet
+                if cmd == Command.RTDE_DATA_PACKAGE:
+                    if command != Command.RTDE_DATA_PACKAGE or \
+                            self.__rbuf[start + 3] != recipe_id:
+                        self.__dispatch(start, size)
+                        continue
+                    if newest is not None:
+                        self.__dispatch(*newest)
+                    newest = (start, size)
+                    continue
+                data = self.__on_packet(cmd, bytes(self.__rbuf[start + 3:start + size]))
+                if cmd == command:
+                    return data
+            if newest is not None:
+                start, size = newest
+                if out is not None and \
+                        recipe_id == self.__output_config.id and \
+                        size == self.__output_config.package_dtype.itemsize:
+                    self.__store_run(out, 0, start, start + size)
+                    return out
+                t0 = time.perf_counter()
+                data = self.__on_packet(Command.RTDE_DATA_PACKAGE,
+                                        bytes(self.__rbuf[start + 3:start + size]))
+                if self.stats is not None:
+                    self.stats.on_decode(time.perf_counter() - t0)
+                return data
+            timeout = DEFAULT_TIMEOUT
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    return None
+            if not self.is_connected() or not self.__fill(timeout):
+                return None
+            # else the connection may have been restored by reconnect
         return None
     
-    def __trigger_disconnected(self):
-        logging.info("RTDE disconnected")
-        self.disconnect() #clean-up the socket
+    def __trigger_disconnected(self, sock=None):
+        """
+          The connection failed, sock is the transport which failed. Waits
+          if another thread is restoring the connection, and does nothing
+          if sock was already replaced by a new connection.
+        """
+        with self.__reconnect_lock:
+            if sock is not None and sock is not self.__sock:
+                return
+            logging.info("RTDE disconnected")
+            self.__lose_connection() #clean-up the socket
+            if self.auto_reconnect and not self.__reconnecting:
+                self.reconnect()
     
     def __unpack_protocol_version_package(self, payload):
         """
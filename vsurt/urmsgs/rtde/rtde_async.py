@@ -0,0 +1,365 @@
+'''
+    asyncio client for the RTDE interface, to follow the RTDE connections of
+    many robots, together with any other I/O, in a single event loop.
+
+    It has the same handshake, recipe setup, start/pause and send/receive
+    semantics as rtde.RTDE, but every call which waits for the robot is a
+    coroutine, and failures raise RTDEError instead of exiting the program.
+'''
+import asyncio
+import collections
+import logging
+import struct
+
+from . import serialize
+from .rtde import Command, ConnectionState, RTDE_PROTOCOL_VERSION
+from .rtde import DEFAULT_TIMEOUT
+
+_HEADER = struct.Struct('>HB')
+
+
+class RTDEError(Exception):
+    """
+      Raised when the RTDE server rejects a request or answers with an
+      unexpected package.
+    """
+    pass
+
+
+class _RTDEProtocol(asyncio.Protocol):
+    """
+      Splits the byte stream of the connection in packages and hands them
+      to the AsyncRTDE which owns it.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.buf = bytearray()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buf += data
+        buf = self.buf
+        pos = 0
+        while len(buf) - pos >= _HEADER.size:
+            size, command = _HEADER.unpack_from(buf, pos)
+            if size < _HEADER.size:
+                self.transport.close()
+                break
+            if len(buf) - pos < size:
+                break
+            self.client._on_package(command, bytes(buf[pos + 3:pos + size]))
+            pos += size
+        del buf[:pos]
+
+    def connection_lost(self, exc):
+        self.client._on_connection_lost(exc)
+
+
+class AsyncRTDE(object):
+    """
+      asyncio version of rtde.RTDE. Usage
+
+          con = AsyncRTDE(hostname)
+          await con.connect()
+          await con.send_output_setup(names, types)
+          await con.send_start()
+          async for state in con:
+              ...
+
+      The data packages are queued as they arrive and decoded only when
+      they are received, so the stale ones skipped by receive(latest=True)
+      are never decoded. Each package is decoded with the output recipe of
+      its id, so several output recipes can be set up on a connection.
+    """
+
+    def __init__(self, hostname, port=30004, timeout=DEFAULT_TIMEOUT,
+                 queue_size=1000):
+        """
+        Parameters:
+        ----------
+          hostname:   address of the robot
+          port:       port of the RTDE interface
+          timeout:    seconds to wait for the connection and for each reply
+          queue_size: maximum number of data packages waiting to be
+                      received. When the queue is full the oldest package
+                      is dropped and counted in self.skipped_packages.
+        """
+        self.hostname = hostname
+        self.port = port
+        self.timeout = timeout
+        self.skipped_packages = 0
+        self.__conn_state = ConnectionState.DISCONNECTED
+        self.__transport = None
+        self.__output_configs = {}
+        self.__input_config = {}
+        self.__waiters = {}  # command -> future of its reply
+        self.__data = collections.deque(maxlen=queue_size)
+        self.__data_event = asyncio.Event()
+
+    async def connect(self):
+        """
+          Opens the connection and negotiates the protocol version.
+        Returns:
+        --------
+          True. Raises RTDEError if the protocol version is rejected.
+        """
+        if self.__transport is not None:
+            return True
+        loop = asyncio.get_running_loop()
+        self.__transport, _ = await asyncio.wait_for(
+            loop.create_connection(lambda: _RTDEProtocol(self),
+                                   self.hostname, self.port), self.timeout)
+        self.__conn_state = ConnectionState.CONNECTED
+        if not await self.negotiate_protocol_version():
+            await self.disconnect()
+            raise RTDEError('Unable to negotiate protocol version')
+        return True
+
+    async def disconnect(self):
+        if self.__transport is not None:
+            self.__transport.close()
+            self.__transport = None
+        self.__conn_state = ConnectionState.DISCONNECTED
+        self.__data_event.set()
+
+    def is_connected(self):
+        return self.__conn_state is not ConnectionState.DISCONNECTED
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.disconnect()
+
+    async def get_controller_version(self):
+        """
+          Returns a 4-tuple with the version of the controller. Raises
+          RTDEError if the controller is too old for RTDE.
+        """
+        version = await self.__send_and_receive(
+            Command.RTDE_GET_URCONTROL_VERSION)
+        logging.info('Controller version: ' + str(version.major) + '.' +
+                     str(version.minor) + '.' + str(version.bugfix) + '.' +
+                     str(version.build))
+        if version.major == 3 and version.minor <= 2 and \
+                version.bugfix < 19171:
+            raise RTDEError(
+                'Please upgrade your controller to minimally version 3.2.19171')
+        return version.major, version.minor, version.bugfix, version.build
+
+    async def negotiate_protocol_version(self):
+        payload = struct.pack('>H', RTDE_PROTOCOL_VERSION)
+        return await self.__send_and_receive(
+            Command.RTDE_REQUEST_PROTOCOL_VERSION, payload)
+
+    async def send_input_setup(self, variables, types=[]):
+        """
+          As rtde.RTDE.send_input_setup. Raises RTDEError if types does
+          not match the types of the registers.
+        Returns:
+        --------
+          a serialize.DataObject with a member variable for each register
+        """
+        payload = bytes(','.join(variables), 'utf-8')
+        result = await self.__send_and_receive(
+            Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS, payload)
+        if len(types) != 0 and list(result.types) != list(types):
+            raise RTDEError('Data type inconsistency for input setup: ' +
+                            str(types) + ' - ' + str(result.types))
+        result.names = variables
+        result.compile()
+        self.__input_config[result.id] = result
+        return serialize.DataObject.create_empty(variables, result.id)
+
+    async def send_output_setup(self, variables, types=[], frequency=125):
+        """
+          As rtde.RTDE.send_output_setup. Raises RTDEError if types does
+          not match the types of the registers.
+        """
+        payload = struct.pack('>d', frequency)
+        payload = payload + bytes(','.join(variables), 'utf-8')
+        result = await self.__send_and_receive(
+            Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS, payload)
+        if len(types) != 0 and list(result.types) != list(types):
+            raise RTDEError('Data type inconsistency for output setup: ' +
+                            str(types) + ' - ' + str(result.types))
+        result.names = variables
+        result.compile()
+        self.__output_configs[result.id] = result
+        return True
+
+    async def send_start(self):
+        success = await self.__send_and_receive(
+            Command.RTDE_CONTROL_PACKAGE_START)
+        if success:
+            logging.info('RTDE synchronization started')
+            self.__conn_state = ConnectionState.STARTED
+        else:
+            logging.error('RTDE synchronization failed to start')
+        return success
+
+    async def send_pause(self):
+        success = await self.__send_and_receive(
+            Command.RTDE_CONTROL_PACKAGE_PAUSE)
+        if success:
+            logging.info('RTDE synchronization paused')
+            self.__conn_state = ConnectionState.PAUSED
+        else:
+            logging.error('RTDE synchronization failed to pause')
+        return success
+
+    async def send(self, input_data):
+        """
+          Sends the values of the input registers in input_data, a
+          serialize.DataObject returned by send_input_setup.
+        """
+        if self.__conn_state != ConnectionState.STARTED:
+            raise RTDEError(
+                'Cannot send when RTDE synchronization is inactive')
+        if input_data.recipe_id not in self.__input_config:
+            raise RTDEError('Input configuration id not found: ' +
+                            str(input_data.recipe_id))
+        config = self.__input_config[input_data.recipe_id]
+        self.__write(Command.RTDE_DATA_PACKAGE, config.pack(input_data))
+
+    async def receive(self, latest=False):
+        """
+          Waits for the next data package.
+        Parameters:
+        ----------
+          latest: bool
+                  return the newest package received and drop the older
+                  ones without decoding them.
+        Returns:
+        --------
+          a serialize.DataObject of the output recipe of the package, see
+          its recipe_id, or None if the connection was closed and all the
+          packages received were read.
+        """
+        if not self.__output_configs:
+            raise RTDEError('Output configuration not initialized')
+        # the packages received before a disconnection can still be read
+        if self.__conn_state in (ConnectionState.CONNECTED,
+                                 ConnectionState.PAUSED):
+            raise RTDEError(
+                'Cannot receive when RTDE synchronization is inactive')
+        while not self.__data:
+            if not self.is_connected():
+                return None
+            self.__data_event.clear()
+            await self.__data_event.wait()
+        if latest:
+            self.skipped_packages += len(self.__data) - 1
+            payload = self.__data.pop()
+            self.__data.clear()
+        else:
+            payload = self.__data.popleft()
+        config = self.__output_configs.get(payload[0])
+        if config is None:
+            raise RTDEError('Output configuration id not found: ' +
+                            str(payload[0]))
+        return config.unpack(payload)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        state = await self.receive()
+        if state is None:
+            raise StopAsyncIteration
+        return state
+
+    def __write(self, command, payload=b''):
+        if self.__transport is None:
+            raise RTDEError('Unable to send: not connected to Robot')
+        self.__transport.write(
+            _HEADER.pack(_HEADER.size + len(payload), command) + payload)
+
+    async def __send_and_receive(self, command, payload=b''):
+        future = asyncio.get_running_loop().create_future()
+        self.__waiters[command] = future
+        try:
+            self.__write(command, payload)
+            result = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.__waiters.pop(command, None)
+        if result is None:
+            raise RTDEError('Wrong reply to the command ' + chr(command))
+        return result
+
+    def _on_package(self, command, payload):
+        if command == Command.RTDE_DATA_PACKAGE:
+            if len(self.__data) == self.__data.maxlen:
+                self.skipped_packages += 1
+            self.__data.append(payload)
+            self.__data_event.set()
+            return
+        if command == Command.RTDE_TEXT_MESSAGE:
+            _log_text_message(payload)
+            return
+        future = self.__waiters.get(command)
+        if future is None or future.done():
+            logging.warning('Unexpected RTDE package: ' + str(command))
+            return
+        # a rejected setup, e.g. NOT_FOUND or IN_USE, fails the request but
+        # keeps the connection, as in rtde.RTDE
+        try:
+            future.set_result(_unpack_reply(command, payload))
+        except ValueError as exc:
+            future.set_exception(RTDEError(str(exc)))
+
+    def _on_connection_lost(self, exc):
+        logging.info('RTDE disconnected')
+        self.__transport = None
+        self.__conn_state = ConnectionState.DISCONNECTED
+        self.__data_event.set()
+        for future in self.__waiters.values():
+            if not future.done():
+                future.set_exception(
+                    ConnectionError('RTDE disconnected') if exc is None
+                    else exc)
+
+
+def _unpack_reply(command, payload):
+    """
+      Deserializes the reply to a control command as rtde.RTDE does.
+      Returns None if the payload has the wrong size. Raises ValueError if
+      a recipe setup is rejected.
+    """
+    if command in (Command.RTDE_REQUEST_PROTOCOL_VERSION,
+                   Command.RTDE_CONTROL_PACKAGE_START,
+                   Command.RTDE_CONTROL_PACKAGE_PAUSE):
+        if len(payload) != 1:
+            return None
+        return serialize.ReturnValue.unpack(payload).success
+    if command == Command.RTDE_GET_URCONTROL_VERSION:
+        if len(payload) != 16:
+            return None
+        return serialize.ControlVersion.unpack(payload)
+    if command in (Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS,
+                   Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS):
+        if len(payload) < 1:
+            return None
+        return serialize.DataConfig.unpack_recipe(payload)
+    logging.error('Unknown package command: ' + str(command))
+    return None
+
+
+def _log_text_message(payload):
+    if len(payload) < 1:
+        logging.error('RTDE_TEXT_MESSAGE: No payload')
+        return
+    msg = serialize.Message.unpack(payload)
+    text = str(msg.source) + ': ' + str(msg.message)
+    if msg.level in (serialize.Message.EXCEPTION_MESSAGE,
+                     serialize.Message.ERROR_MESSAGE):
+        logging.error(text)
+    elif msg.level == serialize.Message.WARNING_MESSAGE:
+        logging.warning(text)
+    else:
+        logging.info(text)
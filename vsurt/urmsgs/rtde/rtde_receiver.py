@@ -0,0 +1,135 @@
+'''
+    Background receiver for the RTDE interface. A thread owns the receiving
+    side of the connection and keeps the newest data package decoded, so a
+    control loop reads the state of the robot without waiting for the
+    network.
+'''
+import logging
+import threading
+import time
+import numpy as np
+
+
+class RTDEReceiver(object):
+    """
+      Receives the data packages of a started rtde.RTDE connection in a
+      background thread.
+
+      Each package is decoded in one of two preallocated numpy structured
+      arrays, the one which is not published. When it is complete, the
+      receiver publishes it by replacing a single tuple (buffer, sequence,
+      reception time), which is atomic for the other threads. A reader
+      copies the published buffer and checks that the receiver did not
+      start writing in it meanwhile, as in a seqlock, so neither side ever
+      takes a lock.
+
+      Only the receiving side of the socket is used by the thread, so
+      rtde.RTDE.send can still be called from other threads. Control
+      requests which wait for a reply (send_pause, send_output_setup...)
+      must not be sent until the receiver is stopped.
+    """
+
+    def __init__(self, con, latest=True):
+        """
+        Parameters:
+        ----------
+          con:    rtde.RTDE with the output recipe set up and the
+                  synchronization started
+          latest: bool
+                  skip the stale packages, see rtde.RTDE.receive
+        """
+        dtype = con.output_dtype()
+        if dtype is None:
+            raise ValueError('Output configuration not initialized')
+        self.con = con
+        self.latest = latest
+        self.__buffers = (np.zeros((1, ), dtype), np.zeros((1, ), dtype))
+        # (index of the buffer, sequence, time.monotonic() of reception)
+        self.__published = (0, 0, None)
+        self.__first = threading.Event()
+        self.__running = False
+        self.__thread = None
+
+    def start(self):
+        """
+          Starts the receiver thread.
+        """
+        if self.__thread is not None:
+            return self
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+          Stops the receiver thread. It may take up to rtde.DEFAULT_TIMEOUT
+          seconds, the time the thread waits for a package.
+        """
+        self.__running = False
+        if self.__thread is not None:
+            if self.__thread is not threading.current_thread():
+                self.__thread.join()
+            self.__thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def is_running(self):
+        return self.__thread is not None and self.__thread.is_alive()
+
+    def __run(self):
+        sequence = 0
+        while self.__running and self.con.is_connected():
+            index = 1 - self.__published[0]
+            if self.con.receive_into(self.__buffers[index],
+                                     self.latest) is None:
+                if not self.con.is_connected():
+                    logging.error('RTDE receiver: connection lost')
+                    break
+                continue
+            sequence += 1
+            self.__published = (index, sequence, time.monotonic())
+            self.__first.set()
+        self.__running = False
+
+    def wait(self, timeout=None):
+        """
+          Waits until the first package is published.
+        Returns:
+        --------
+          Bolean, False if the timeout expired.
+        """
+        return self.__first.wait(timeout)
+
+    def sequence(self):
+        """
+          Returns the number of packages published so far.
+        """
+        return self.__published[1]
+
+    def latest_state(self):
+        """
+          Returns the newest package without blocking.
+        Returns:
+        --------
+          (state, sequence, age) where state is a copy of the package as a
+          numpy structured scalar, e.g. state['actual_q'], sequence counts
+          the packages published since the start, so a reader detects the
+          packages it missed, and age are the seconds since the package was
+          received. (None, 0, None) if no package was received yet.
+        """
+        while True:
+            index, sequence, t = self.__published
+            if sequence == 0:
+                return None, 0, None
+            state = self.__buffers[index][0].copy()
+            # The receiver starts writing in this buffer as soon as it
+            # publishes the next package, so the copy is valid only if the
+            # sequence did not change meanwhile.
+            if self.__published[1] == sequence:
+                return state, sequence, time.monotonic() - t
@@ -0,0 +1,315 @@
+'''
+    Recorder of RTDE data packages which keeps the receive loop free of any
+    formatting or disk access.
+
+    The receive loop only copies the raw packages of a recipe into a bounded
+    queue. A writer thread appends them to segment files, rotated by size or
+    time, and updates an index. The closed segments are compressed with gzip
+    by another thread. RTDERecording converts the segments to numpy arrays
+    or to CSV later.
+
+    A segment is a sequence of fixed size records
+
+        |- t (little-endian double) -|- recipe id (uint8) -|- registers -|
+
+    where t is the time.time() at which the package was received and the
+    registers are stored as sent by the robot, big-endian.
+'''
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+import numpy as np
+
+from . import serialize
+from .csv_writer import CSVWriter
+
+_INDEX_FILE = 'index.json'
+_DATA_PACKAGE = 85  # ascii U, rtde.Command.RTDE_DATA_PACKAGE
+
+
+def record_dtype(names, types):
+    """
+      Returns the dtype of the records of a segment.
+    """
+    fields = [('t', '<f8'), ('recipe_id', 'u1')]
+    return np.dtype(fields + serialize.numpy_dtype(names, types, '>').descr)
+
+
+def _segment_file(segment):
+    return '{:06d}.rtde'.format(segment)
+
+
+class RTDERecorder(object):
+    """
+      Records the data packages of an output recipe. It is passed to
+      rtde.RTDE as capture, so every package received is handed to write,
+      whatever receive call reads the connection:
+
+          recorder = RTDERecorder('log', names, types).start()
+          con = rtde.RTDE(hostname, capture=recorder)
+          con.connect()
+          recorder.recipe_id = con.add_output_setup(names, types, 125)
+          ...
+          recorder.close()
+
+      Member Variables:
+      ----------------
+        recipe_id: id of the recorded recipe, 1 by default, the id of the
+                   first recipe set up on a connection
+        count:     number of packages written
+        dropped:   number of packages lost because the queue was full
+    """
+
+    def __init__(self, directory, names, types, recipe_id=1,
+                 segment_bytes=64 * 1024 * 1024, segment_seconds=600.0,
+                 queue_size=10000, compress=True):
+        """
+        Parameters:
+        ----------
+          directory:       directory of the segments. It must not contain a
+                           recording.
+          names:           names of the registers of the recipe
+          types:           types of the registers of the recipe
+          recipe_id:       see the member variables
+          segment_bytes:   a segment is closed when it reaches this size
+          segment_seconds: a segment is closed when it spans this time
+          queue_size:      maximum number of packages waiting to be written
+          compress:        compress the closed segments with gzip
+        """
+        if len(names) != len(types):
+            raise ValueError('List sizes are not identical.')
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, _INDEX_FILE)):
+            raise ValueError(directory + ' already contains a recording')
+        self.directory = directory
+        self.recipe_id = recipe_id
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compress = compress
+        self.count = 0
+        self.dropped = 0
+
+        self.__dtype = record_dtype(names, types)
+        self.__index = {'names': list(names), 'types': list(types),
+                        'segments': []}
+        self.__index_lock = threading.Lock()
+        self.__queue = queue.Queue(queue_size)
+        self.__compress_queue = queue.Queue()
+        self.__file = None
+        self.__segment = None
+        self.__writer = None
+        self.__compressor = None
+
+    def start(self):
+        """
+          Starts the writer and compressor threads.
+        """
+        if self.__writer is not None:
+            return self
+        self.__writer = threading.Thread(target=self.__write_loop)
+        self.__writer.daemon = True
+        self.__writer.start()
+        self.__compressor = threading.Thread(target=self.__compress_loop)
+        self.__compressor.daemon = True
+        self.__compressor.start()
+        self.__write_index()
+        return self
+
+    def close(self):
+        """
+          Writes the packages in the queue, closes the last segment and
+          waits for the compression of the segments.
+        """
+        if self.__writer is None:
+            return
+        self.__queue.put(None)
+        self.__writer.join()
+        self.__compress_queue.put(None)
+        self.__compressor.join()
+        self.__writer = None
+        self.__compressor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, frame, t=None):
+        """
+          Queues a package received by rtde.RTDE. Only the data packages of
+          self.recipe_id are kept. It never blocks: when the queue is full
+          the package is counted in self.dropped.
+        Parameters:
+        ----------
+          frame: the whole package, header included
+          t:     reception time, by default time.time()
+        """
+        if frame[2] != _DATA_PACKAGE or frame[3] != self.recipe_id:
+            return
+        try:
+            self.__queue.put_nowait((time.time() if t is None else t, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def __write_loop(self):
+        record = np.zeros((1, ), self.__dtype)
+        raw = record.view(np.uint8)
+        size = self.__dtype.itemsize - 8
+        flushed = time.time()
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            t, frame = item
+            if len(frame) - 3 != size:
+                logging.error('RTDE recorder: wrong package size ' +
+                              str(len(frame)))
+                continue
+            if self.__file is None or self.__must_rotate(t):
+                self.__rotate(t)
+            record['t'] = t
+            raw[8:] = np.frombuffer(frame, np.uint8, size, 3)
+            self.__file.write(raw.tobytes())
+            segment = self.__segment
+            segment['count'] += 1
+            segment['t1'] = t
+            self.count += 1
+            # the index is updated about once per second while recording
+            if self.__queue.empty() and time.time() - flushed >= 1.0:
+                self.__file.flush()
+                self.__write_index()
+                flushed = time.time()
+        self.__close_segment()
+        self.__write_index()
+
+    def __must_rotate(self, t):
+        segment = self.__segment
+        return (segment['count'] + 1) * self.__dtype.itemsize > \
+            self.segment_bytes or t - segment['t0'] >= self.segment_seconds
+
+    def __rotate(self, t):
+        self.__close_segment()
+        segments = self.__index['segments']
+        number = segments[-1]['segment'] + 1 if segments else 0
+        self.__segment = {'segment': number, 'file': _segment_file(number),
+                          'count': 0, 't0': t, 't1': t}
+        with self.__index_lock:
+            segments.append(self.__segment)
+        self.__file = open(
+            os.path.join(self.directory, self.__segment['file']), 'wb')
+        self.__write_index()
+
+    def __close_segment(self):
+        if self.__file is None:
+            return
+        self.__file.close()
+        self.__file = None
+        if self.compress:
+            self.__compress_queue.put(self.__segment)
+        self.__segment = None
+
+    def __compress_loop(self):
+        while True:
+            segment = self.__compress_queue.get()
+            if segment is None:
+                break
+            path = os.path.join(self.directory, segment['file'])
+            with open(path, 'rb') as src, \
+                    gzip.open(path + '.gz.tmp', 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(path + '.gz.tmp', path + '.gz')
+            with self.__index_lock:
+                segment['file'] = segment['file'] + '.gz'
+            self.__write_index()
+            os.remove(path)
+
+    def __write_index(self):
+        with self.__index_lock:
+            _write_index(self.directory, self.__index)
+
+
+class RTDERecording(object):
+    """
+      Read access to the segments written by RTDERecorder.
+
+      Member Variables:
+      ----------------
+        names: names of the registers of the recipe
+        types: types of the registers of the recipe
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        index = _read_index(directory)
+        if index is None:
+            raise ValueError('No recording found in ' + directory)
+        self.names = index['names']
+        self.types = index['types']
+        self.__segments = index['segments']
+        self.__dtype = record_dtype(self.names, self.types)
+
+    def __len__(self):
+        return sum(s['count'] for s in self.__segments)
+
+    def segments(self):
+        """
+          Generator yielding the records of each segment in a numpy
+          structured array with the field 't' and a field per register,
+          in native byte order.
+        """
+        dtype = serialize.numpy_dtype(['t'] + self.names,
+                                      ['DOUBLE'] + self.types)
+        for s in self.__segments:
+            path = os.path.join(self.directory, s['file'])
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rb') as f:
+                data = f.read(s['count'] * self.__dtype.itemsize)
+            records = np.frombuffer(data, self.__dtype,
+                                    len(data) // self.__dtype.itemsize)
+            result = np.empty(records.shape, dtype)
+            for name in dtype.names:
+                result[name] = records[name]
+            yield result
+
+    def to_arrays(self, names=None):
+        """
+          Returns a dict which maps 't' and the registers in names, by
+          default all, to arrays with all the records.
+        """
+        if names is None:
+            names = ['t'] + self.names
+        segments = list(self.segments())
+        return {name: np.concatenate([s[name] for s in segments])
+                if segments else np.empty((0, )) for name in names}
+
+    def to_csv(self, csvfile, delimiter=' '):
+        """
+          Writes the recording in a CSV file, as csv_writer.CSVWriter, with
+          a timestamp column 't' first.
+        """
+        writer = CSVWriter(csvfile, ['t'] + self.names,
+                           ['DOUBLE'] + self.types, delimiter)
+        writer.writeheader()
+        for segment in self.segments():
+            writer.writerows(segment)
+
+
+def _read_index(directory):
+    path = os.path.join(directory, _INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(directory, index):
+    path = os.path.join(directory, _INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(path + '.tmp', path)
@@ -0,0 +1,426 @@
+'''
+    Local stand-in for the RTDE server of the UR controller, to exercise
+    rtde.RTDE, the recipes and the control loops without a robot, and to
+    measure their latency and throughput.
+
+    It implements the protocol negotiation, the controller version query,
+    the output and input setup against a table of known variables, start,
+    pause and the streaming of the output recipes. The values written in
+    the input registers are echoed in the output registers with the same
+    number, e.g. input_int_register_3 is read back as output_int_register_3.
+'''
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+
+from . import serialize
+from .rtde import Command
+
+_HEADER = struct.Struct('>HB')
+
+# Output variables of the controller and their types
+OUTPUT_VARIABLES = {
+    'timestamp': 'DOUBLE',
+    'target_q': 'VECTOR6D',
+    'target_qd': 'VECTOR6D',
+    'target_qdd': 'VECTOR6D',
+    'target_current': 'VECTOR6D',
+    'target_moment': 'VECTOR6D',
+    'actual_q': 'VECTOR6D',
+    'actual_qd': 'VECTOR6D',
+    'actual_current': 'VECTOR6D',
+    'joint_control_output': 'VECTOR6D',
+    'actual_TCP_pose': 'VECTOR6D',
+    'actual_TCP_speed': 'VECTOR6D',
+    'actual_TCP_force': 'VECTOR6D',
+    'target_TCP_pose': 'VECTOR6D',
+    'target_TCP_speed': 'VECTOR6D',
+    'actual_digital_input_bits': 'UINT64',
+    'joint_temperatures': 'VECTOR6D',
+    'actual_execution_time': 'DOUBLE',
+    'robot_mode': 'INT32',
+    'joint_mode': 'VECTOR6INT32',
+    'safety_mode': 'INT32',
+    'actual_tool_accelerometer': 'VECTOR3D',
+    'speed_scaling': 'DOUBLE',
+    'target_speed_fraction': 'DOUBLE',
+    'actual_momentum': 'DOUBLE',
+    'actual_main_voltage': 'DOUBLE',
+    'actual_robot_voltage': 'DOUBLE',
+    'actual_robot_current': 'DOUBLE',
+    'actual_joint_voltage': 'VECTOR6D',
+    'actual_digital_output_bits': 'UINT64',
+    'runtime_state': 'UINT32',
+    'output_bit_registers0_to_31': 'UINT32',
+    'output_bit_registers32_to_63': 'UINT32',
+}
+# Input variables of the controller and their types
+INPUT_VARIABLES = {
+    'speed_slider_mask': 'UINT32',
+    'speed_slider_fraction': 'DOUBLE',
+    'standard_digital_output_mask': 'UINT8',
+    'standard_digital_output': 'UINT8',
+    'input_bit_registers0_to_31': 'UINT32',
+    'input_bit_registers32_to_63': 'UINT32',
+}
+for _i in range(48):
+    OUTPUT_VARIABLES['output_int_register_%d' % _i] = 'INT32'
+    OUTPUT_VARIABLES['output_double_register_%d' % _i] = 'DOUBLE'
+    INPUT_VARIABLES['input_int_register_%d' % _i] = 'INT32'
+    INPUT_VARIABLES['input_double_register_%d' % _i] = 'DOUBLE'
+
+# Values of the variables which are not zero when the server starts
+_INITIAL_STATE = {
+    'robot_mode': 7,  # ROBOT_MODE_RUNNING
+    'safety_mode': 1,  # SAFETY_MODE_NORMAL
+    'runtime_state': 2,  # playing
+    'joint_mode': [253] * 6,  # JOINT_RUNNING_MODE
+    'speed_scaling': 1.0,
+    'target_speed_fraction': 1.0,
+}
+
+
+def _zero(data_type):
+    if data_type.startswith('VECTOR'):
+        value = 0.0 if data_type.endswith('D') else 0
+        return [value] * serialize.get_item_size(data_type)
+    return 0.0 if data_type == 'DOUBLE' else 0
+
+
+def _echo_name(name):
+    """
+      Returns the output variable where the input variable name is echoed,
+      or None.
+    """
+    if name.startswith('input_') and 'register' in name:
+        return 'output_' + name[len('input_'):]
+    return None
+
+
+class _Recipe(object):
+    """
+      A recipe set up by a client.
+    """
+
+    def __init__(self, recipe_id, names, types):
+        self.id = recipe_id
+        self.period = None  # seconds between output packages
+        self.next_t = None  # time of the next output package
+        self.names = names
+        self.types = types
+        config = serialize.DataConfig.unpack_recipe(
+            bytes([recipe_id]) + ','.join(types).encode('utf-8'))
+        self.fmt_struct = config.fmt_struct
+        self.package = struct.Struct('>HB' + config.fmt[1:])
+
+    def pack(self, state):
+        values = [self.package.size, Command.RTDE_DATA_PACKAGE, self.id]
+        for name, data_type in zip(self.names, self.types):
+            if data_type.startswith('VECTOR'):
+                values.extend(state[name])
+            else:
+                values.append(state[name])
+        return self.package.pack(*values)
+
+    def unpack(self, payload):
+        values = self.fmt_struct.unpack(payload)
+        result = {}
+        offset = 1
+        for name, data_type in zip(self.names, self.types):
+            size = serialize.get_item_size(data_type)
+            if data_type.startswith('VECTOR'):
+                result[name] = list(values[offset:offset + size])
+            else:
+                result[name] = values[offset]
+            offset += size
+        return result
+
+
+class RTDEServer(object):
+    """
+      RTDE server simulator. Each client is served in its own thread.
+
+        with RTDEServer(frequency=500) as server:
+            con = rtde.RTDE('127.0.0.1', server.port)
+            ...
+
+      Member Variables:
+      ----------------
+        port:      port where the server listens
+        frequency: frequency of the output packages. None uses the
+                   frequency requested by the client in the output setup,
+                   0 streams as fast as the client reads.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, frequency=None,
+                 controller_version=(5, 11, 0, 0)):
+        """
+        Parameters:
+        ----------
+          host:               address where the server listens
+          port:               port where the server listens, 0 picks a
+                              free one
+          frequency:          see the member variables
+          controller_version: 4-tuple returned to the version query
+        """
+        self.frequency = frequency
+        self.controller_version = controller_version
+        self.__state = {name: _zero(t) for name, t in OUTPUT_VARIABLES.items()}
+        self.__state.update({
+            name: _zero(t) for name, t in INPUT_VARIABLES.items()
+        })
+        self.__state.update(_INITIAL_STATE)
+        self.__lock = threading.Lock()
+        self.__inputs_in_use = set()
+        self.__conns = set()
+        self.__t0 = time.time()
+
+        self.__sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.__sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.__sock.bind((host, port))
+        self.__sock.listen(5)
+        self.host, self.port = self.__sock.getsockname()[:2]
+        self.__thread = None
+        self.__running = False
+
+    def start(self):
+        """
+          Starts accepting clients in a background thread.
+        """
+        self.__running = True
+        self.__thread = threading.Thread(target=self.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        """
+          Stops accepting clients and closes the connections.
+        """
+        self.__running = False
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__sock.close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        self.drop_connections()
+
+    def drop_connections(self):
+        """
+          Closes the connections with the clients but keeps accepting new
+          ones, as after a network failure.
+        """
+        with self.__lock:
+            conns = list(self.__conns)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def serve_forever(self):
+        while self.__running:
+            try:
+                conn, _ = self.__sock.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            thread = threading.Thread(target=self.__serve, args=(conn, ))
+            thread.daemon = True
+            thread.start()
+
+    def get_state(self, name):
+        """
+          Returns the current value of a variable.
+        """
+        with self.__lock:
+            return self.__state[name]
+
+    def set_state(self, **values):
+        """
+          Sets the value of output variables, e.g.
+          server.set_state(actual_q=[0.0] * 6, robot_mode=7)
+        """
+        for name in values:
+            if name not in OUTPUT_VARIABLES and name not in INPUT_VARIABLES:
+                raise ValueError('Unknown variable: ' + name)
+        with self.__lock:
+            self.__state.update(values)
+
+    def __serve(self, conn):
+        session = _Session(self, conn)
+        with self.__lock:
+            self.__conns.add(conn)
+        try:
+            session.run()
+        except (OSError, struct.error, ValueError) as exc:
+            logging.info('RTDE server: client closed: ' + repr(exc))
+        finally:
+            with self.__lock:
+                self.__inputs_in_use -= session.inputs
+                self.__conns.discard(conn)
+            conn.close()
+
+    def _setup_outputs(self, names):
+        types = [OUTPUT_VARIABLES.get(name, 'NOT_FOUND') for name in names]
+        return types, 'NOT_FOUND' not in types
+
+    def _setup_inputs(self, names):
+        types = [INPUT_VARIABLES.get(name, 'NOT_FOUND') for name in names]
+        with self.__lock:
+            for i, name in enumerate(names):
+                if types[i] != 'NOT_FOUND' and name in self.__inputs_in_use:
+                    types[i] = 'IN_USE'
+            valid = 'NOT_FOUND' not in types and 'IN_USE' not in types
+            if valid:
+                self.__inputs_in_use.update(names)
+        return types, valid
+
+    def _write_inputs(self, values):
+        with self.__lock:
+            for name, value in values.items():
+                self.__state[name] = value
+                echo = _echo_name(name)
+                if echo is not None:
+                    self.__state[echo] = value
+
+    def _output_packages(self, recipes):
+        with self.__lock:
+            self.__state['timestamp'] = time.time() - self.__t0
+            return b''.join(recipe.pack(self.__state) for recipe in recipes)
+
+
+class _Session(object):
+    """
+      The connection with a client of RTDEServer.
+    """
+
+    def __init__(self, server, conn):
+        self.server = server
+        self.conn = conn
+        self.buf = bytearray()
+        self.outputs = {}  # recipe id -> _Recipe
+        self.inputs_config = {}  # recipe id -> _Recipe
+        self.inputs = set()  # input variables used by this client
+        self.started = False
+        self.next_recipe_id = 1
+
+    def run(self):
+        while True:
+            timeout = None
+            if self.started and self.outputs:
+                next_t = min(r.next_t for r in self.outputs.values())
+                timeout = max(0.0, next_t - time.time())
+            readable, _, _ = select.select([self.conn], [], [], timeout)
+            if readable:
+                more = self.conn.recv(4096)
+                if len(more) == 0:
+                    return
+                self.buf += more
+                self.__handle_packages()
+            if self.started:
+                self.__send_outputs()
+
+    def __send_outputs(self):
+        """
+          Sends a package of each output recipe whose period elapsed.
+        """
+        now = time.time()
+        due = [r for r in self.outputs.values() if now >= r.next_t]
+        if not due:
+            return
+        self.conn.sendall(self.server._output_packages(due))
+        for recipe in due:
+            if recipe.period:
+                recipe.next_t += recipe.period
+                # do not try to catch up after a long stall
+                recipe.next_t = max(recipe.next_t, now - recipe.period)
+            else:
+                recipe.next_t = now
+
+    def __handle_packages(self):
+        pos = 0
+        while len(self.buf) - pos >= _HEADER.size:
+            size, command = _HEADER.unpack_from(self.buf, pos)
+            if size < _HEADER.size:
+                raise ValueError('Wrong RTDE package size: ' + str(size))
+            if len(self.buf) - pos < size:
+                break
+            self.__on_package(command, bytes(self.buf[pos + 3:pos + size]))
+            pos += size
+        del self.buf[:pos]
+
+    def __reply(self, command, payload):
+        self.conn.sendall(
+            _HEADER.pack(_HEADER.size + len(payload), command) + payload)
+
+    def __on_package(self, command, payload):
+        if command == Command.RTDE_REQUEST_PROTOCOL_VERSION:
+            version = struct.unpack('>H', payload)[0]
+            self.__reply(command, struct.pack('>B', version in (1, 2)))
+        elif command == Command.RTDE_GET_URCONTROL_VERSION:
+            self.__reply(command,
+                         struct.pack('>IIII', *self.server.controller_version))
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_OUTPUTS:
+            frequency = struct.unpack_from('>d', payload)[0]
+            names = payload[8:].decode('utf-8').split(',')
+            types, valid = self.server._setup_outputs(names)
+            recipe_id = 0
+            if valid:
+                recipe_id = self.__new_recipe_id()
+                recipe = _Recipe(recipe_id, names, types)
+                if self.server.frequency is not None:
+                    frequency = self.server.frequency
+                recipe.period = 1.0 / frequency if frequency > 0 else 0.0
+                recipe.next_t = time.time()
+                self.outputs[recipe_id] = recipe
+            self.__reply(command,
+                         bytes([recipe_id]) + ','.join(types).encode('utf-8'))
+        elif command == Command.RTDE_CONTROL_PACKAGE_SETUP_INPUTS:
+            names = payload.decode('utf-8').split(',')
+            types, valid = self.server._setup_inputs(names)
+            recipe_id = 0
+            if valid:
+                recipe_id = self.__new_recipe_id()
+                self.inputs_config[recipe_id] = _Recipe(recipe_id, names,
+                                                        types)
+                self.inputs.update(names)
+            self.__reply(command,
+                         bytes([recipe_id]) + ','.join(types).encode('utf-8'))
+        elif command == Command.RTDE_CONTROL_PACKAGE_START:
+            self.started = True
+            for recipe in self.outputs.values():
+                recipe.next_t = time.time()
+            self.__reply(command, b'\x01')
+        elif command == Command.RTDE_CONTROL_PACKAGE_PAUSE:
+            self.started = False
+            self.__reply(command, b'\x01')
+        elif command == Command.RTDE_DATA_PACKAGE:
+            recipe = self.inputs_config.get(payload[0])
+            if recipe is None:
+                logging.error('RTDE server: unknown input recipe ' +
+                              str(payload[0]))
+                return
+            self.server._write_inputs(recipe.unpack(payload))
+        elif command == Command.RTDE_TEXT_MESSAGE:
+            pass
+        else:
+            logging.error('RTDE server: unknown package command ' +
+                          str(command))
+
+    def __new_recipe_id(self):
+        recipe_id = self.next_recipe_id
+        self.next_recipe_id += 1
+        return recipe_id
@@ -0,0 +1,282 @@
+'''
+    Latency and jitter instrumentation of the RTDE client: counters of the
+    received, skipped and late data packages, and histograms of their
+    inter-arrival time, of the decode time and of the round trip between a
+    send and the next data package.
+'''
+import time
+
+
+class Histogram(object):
+    """
+      Histogram of non negative integer values, e.g. microseconds, with
+      log-linear buckets as in HdrHistogram. Values below 2**precision are
+      counted exactly, larger ones in buckets whose width is a fixed fraction
+      of their value, so the relative error of the percentiles is below
+      2**(1 - precision) for any magnitude. Recording a value is a couple of
+      integer operations and a list increment.
+
+      Member Variables:
+      ----------------
+        count: number of values recorded
+        total: sum of the values recorded
+        min:   smallest value recorded, None if empty
+        max:   largest value recorded, None if empty
+    """
+
+    def __init__(self, precision=7):
+        """
+        Parameters:
+        ----------
+          precision: number of significant bits of each bucket
+        """
+        self.precision = precision
+        self.__sub = 1 << precision
+        self.__half = self.__sub >> 1
+        self.__counts = [0] * self.__sub
+        self.reset()
+
+    def reset(self):
+        self.__counts = [0] * len(self.__counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def __index(self, value):
+        if value < self.__sub:
+            return value
+        shift = value.bit_length() - self.precision
+        return shift * self.__half + (value >> shift)
+
+    def __lowest(self, index):
+        """
+          Smallest value counted in the bucket index.
+        """
+        if index < self.__sub:
+            return index
+        shift = index // self.__half - 1
+        return (index - shift * self.__half) << shift
+
+    def record(self, value):
+        """
+          Records a value. Negative values are recorded as 0.
+        """
+        value = int(value) if value > 0 else 0
+        index = self.__index(value)
+        if index >= len(self.__counts):
+            self.__counts.extend([0] * (index + 1 - len(self.__counts)))
+        self.__counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    def percentile(self, q):
+        """
+          Returns the value below which q percent of the values fall, or
+          None if the histogram is empty.
+        """
+        if self.count == 0:
+            return None
+        rank = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for index, n in enumerate(self.__counts):
+            seen += n
+            if seen >= rank:
+                return min(self.__lowest(index), self.max)
+        return self.max
+
+    def summary(self):
+        """
+          Returns a dict with the count, min, mean, max and the 50, 90, 99
+          and 99.9 percentiles.
+        """
+        return {
+            'count': self.count,
+            'min': self.min,
+            'mean': self.mean(),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p99.9': self.percentile(99.9),
+            'max': self.max,
+        }
+
+
+class RTDEStats(object):
+    """
+      Counters and histograms of a RTDE connection, updated by rtde.RTDE.
+      The times are taken with time.monotonic on the host and the histograms
+      are in microseconds.
+
+      Member Variables:
+      ----------------
+        received:     data packages received
+        decoded:      data packages decoded
+        skipped:      stale data packages dropped without decoding
+        late:         data packages which arrived more than late_factor
+                      periods after the previous one
+        missed:       periods without a data package, estimated from the
+                      inter-arrival times and the packages which arrived
+                      together
+        sent:         data packages sent
+        reconnects:   connections restored by rtde.RTDE.reconnect
+        last_receive: host time of the last data package
+        interarrival: Histogram of the time between the receptions of
+                      data packages
+        decode:       Histogram of the time to decode a data package
+        round_trip:   Histogram of the time between a send and the next
+                      data package
+        outage:       Histogram of the time without connection before each
+                      reconnection
+    """
+
+    def __init__(self, late_factor=1.5):
+        """
+        Parameters:
+        ----------
+          late_factor: a package is late if it arrives more than
+                       late_factor periods of the recipe after the previous
+                       one
+        """
+        self.late_factor = late_factor
+        self.period = None
+        self.interarrival = Histogram()
+        self.decode = Histogram()
+        self.round_trip = Histogram()
+        self.outage = Histogram()
+        self.reset()
+
+    def reset(self):
+        self.received = 0
+        self.decoded = 0
+        self.skipped = 0
+        self.late = 0
+        self.missed = 0
+        self.sent = 0
+        self.reconnects = 0
+        self.last_receive = None
+        self.__last_send = None
+        self.__burst_missed = 0
+        self.interarrival.reset()
+        self.decode.reset()
+        self.round_trip.reset()
+        self.outage.reset()
+
+    def set_frequency(self, frequency):
+        """
+          Sets the frequency of the output recipe, used to detect the late
+          packages.
+        """
+        self.period = 1.0 / frequency if frequency > 0 else None
+
+    def on_receive(self, t):
+        """
+          A data package arrived at the host time t. The packages of the
+          same recv have the same t: after a gap the first one is late, the
+          others fill the periods it counted as missed.
+        """
+        self.received += 1
+        last = self.last_receive
+        self.last_receive = t
+        if self.__last_send is not None:
+            self.round_trip.record((t - self.__last_send) * 1.0e6)
+            self.__last_send = None
+        if last is None:
+            return
+        dt = t - last
+        if dt == 0.0:
+            if self.__burst_missed > 0:
+                self.__burst_missed -= 1
+                self.missed -= 1
+            return
+        self.interarrival.record(dt * 1.0e6)
+        self.__burst_missed = 0
+        period = self.period
+        if period is not None and dt > self.late_factor * period:
+            self.late += 1
+            self.__burst_missed = int(round(dt / period)) - 1
+            self.missed += self.__burst_missed
+
+    def on_decode(self, dt, n=1):
+        """
+          n data packages were decoded in dt seconds.
+        """
+        self.decoded += n
+        self.decode.record(dt * 1.0e6 / n)
+
+    def on_skip(self, n=1):
+        self.skipped += n
+
+    def on_send(self, t):
+        """
+          A data package was sent at the host time t.
+        """
+        self.sent += 1
+        self.__last_send = t
+
+    def on_reconnect(self, outage):
+        """
+          The connection was restored after outage seconds.
+        """
+        self.reconnects += 1
+        self.outage.record(outage * 1.0e6)
+
+    def age(self):
+        """
+          Returns the seconds since the last data package arrived, or None.
+        """
+        if self.last_receive is None:
+            return None
+        return time.monotonic() - self.last_receive
+
+    def summary(self):
+        """
+          Returns a dict with the counters and the summary of each
+          histogram.
+        """
+        return {
+            'received': self.received,
+            'decoded': self.decoded,
+            'skipped': self.skipped,
+            'late': self.late,
+            'missed': self.missed,
+            'sent': self.sent,
+            'reconnects': self.reconnects,
+            'interarrival_us': self.interarrival.summary(),
+            'decode_us': self.decode.summary(),
+            'round_trip_us': self.round_trip.summary(),
+            'outage_us': self.outage.summary(),
+        }
+
+    def report(self):
+        """
+          Returns the summary as a human readable string.
+        """
+        lines = [
+            'received %d, decoded %d, skipped %d, late %d, missed %d, '
+            'sent %d, reconnects %d' %
+            (self.received, self.decoded, self.skipped, self.late,
+             self.missed, self.sent, self.reconnects)
+        ]
+        for name, histogram in (('interarrival', self.interarrival),
+                                ('decode', self.decode),
+                                ('round trip', self.round_trip),
+                                ('outage', self.outage)):
+            if histogram.count == 0:
+                continue
+            s = histogram.summary()
+            lines.append(
+                '%s [us]: n %d, min %d, mean %.1f, p50 %d, p90 %d, p99 %d, '
+                'p99.9 %d, max %d' %
+                (name, s['count'], s['min'], s['mean'], s['p50'], s['p90'],
+                 s['p99'], s['p99.9'], s['max']))
+        return '\n'.join(lines)
@@ -21,7 +21,9 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import keyword
 import struct
+import numpy as np
 
 
 class ControlHeader(object):
@@ -91,6 +93,38 @@ class Message(object):
         return rmd
 
 
+# numpy base type and shape of each RTDE data type
+NUMPY_TYPES = {
+    'DOUBLE': ('f8', ()),
+    'VECTOR3D': ('f8', (3, )),
+    'VECTOR6D': ('f8', (6, )),
+    'INT32': ('i4', ()),
+    'UINT32': ('u4', ()),
+    'VECTOR6INT32': ('i4', (6, )),
+    'VECTOR6UINT32': ('u4', (6, )),
+    'UINT64': ('u8', ()),
+    'UINT8': ('u1', ()),
+}
+
+
+def numpy_dtype(names, types, byteorder='='):
+    """
+      Returns a packed numpy structured dtype with a field for each
+      register of a recipe.
+      Parameters:
+      ----------
+        names: list of strings. Name of the registers.
+        types: list of strings. Type of the registers.
+        byteorder: '=' for native byte order, '>' for the big-endian
+                   byte order of the RTDE packages.
+    """
+    fields = []
+    for name, data_type in zip(names, types):
+        base, shape = NUMPY_TYPES[data_type]
+        fields.append((name, byteorder + base, shape))
+    return np.dtype(fields)
+
+
 def get_item_size(data_type):
     if data_type.startswith('VECTOR6'):
         return 6
@@ -119,41 +153,101 @@ def unpack_field(data, offset, data_type):
 
 
 class DataObject(object):
-    recipe_id = None
+    """
+      Values of the registers of a recipe, a member variable per register.
+      The instances created by the RTDE client belong to the subclass
+      generated by data_class for the recipe, which stores the recipe id
+      and the registers in __slots__: the instances have no __dict__, so
+      they hold no other attribute.
+    """
+    __slots__ = ()
+
     def pack(self, names, types):
         if len(names) != len(types):
             raise ValueError('List sizes are not identical.')
         l = []
-        if(self.recipe_id is not None):
-            l.append(self.recipe_id)
+        recipe_id = getattr(self, 'recipe_id', None)
+        if(recipe_id is not None):
+            l.append(recipe_id)
         for i in range(len(names)):
-            if self.__dict__[names[i]] is None:
+            value = getattr(self, names[i], None)
+            if value is None:
                 raise ValueError('Uninitialized parameter: ' + names[i])
             if types[i].startswith('VECTOR'):
-                l.extend(self.__dict__[names[i]])
+                l.extend(value)
             else:
-                l.append(self.__dict__[names[i]])
+                l.append(value)
         return l
     
     @staticmethod
     def unpack(data, names, types):
         if len(names) != len(types):
             raise ValueError('List sizes are not identical.')
-        obj = DataObject()
+        obj = data_class(names)(data[0])
         offset = 0
-        obj.recipe_id = data[0]
         for i in range(len(names)):
-            obj.__dict__[names[i]] = unpack_field(data[1:], offset, types[i])
+            setattr(obj, names[i], unpack_field(data[1:], offset, types[i]))
             offset += get_item_size(types[i])
         return obj
 
     @staticmethod
     def create_empty(names, recipe_id):
-        obj = DataObject()
-        for i in range(len(names)):
-            obj.__dict__[names[i]] = None
-        obj.recipe_id = recipe_id
-        return obj
+        return data_class(names)(recipe_id)
+
+
+_DATA_CLASSES = {}  # tuple of register names -> class
+
+
+def data_class(names):
+    """
+      Returns the subclass of DataObject with a slot for each register in
+      names. It is generated once for each list of names, e.g. for
+      actual_q,robot_mode
+
+        class DataObject(DataObject):
+            __slots__ = ('recipe_id', 'actual_q', 'robot_mode')
+
+            def __init__(self, recipe_id=None, actual_q=None,
+                         robot_mode=None):
+                self.recipe_id = recipe_id
+                self.actual_q = actual_q
+                self.robot_mode = robot_mode
+
+      The instances are pickled by the list of names, so they are
+      unpickled in another process with the class generated there.
+    """
+    key = tuple(names)
+    cls = _DATA_CLASSES.get(key)
+    if cls is not None:
+        return cls
+    if len(set(key)) != len(key):
+        raise ValueError('Duplicated field name: ' + ','.join(key))
+    for name in key:
+        if not name.isidentifier() or keyword.iskeyword(name) or \
+                name in ('self', 'recipe_id') or hasattr(DataObject, name):
+            raise ValueError('Invalid field name: ' + name)
+    lines = ['def __init__(self, recipe_id=None%s):' %
+             ''.join(', %s=None' % name for name in key),
+             '    self.recipe_id = recipe_id']
+    lines.extend('    self.%s = %s' % (name, name) for name in key)
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    cls = type('DataObject', (DataObject, ),
+               {'__slots__': ('recipe_id', ) + key,
+                '__init__': namespace['__init__'],
+                '__reduce__': _reduce_data_object})
+    _DATA_CLASSES[key] = cls
+    return cls
+
+
+def _reduce_data_object(obj):
+    slots = type(obj).__slots__
+    values = tuple(getattr(obj, name, None) for name in slots)
+    return (_create_data_object, (slots[1:], values))
+
+
+def _create_data_object(names, values):
+    return data_class(names)(*values)
 
 
 class DataConfig(object):
@@ -176,8 +270,24 @@ class DataConfig(object):
       fmt: string
           contains the deserialization format to be
           used in struct.unpack function.
+      fmt_struct: struct.Struct
+          fmt compiled once when the recipe is set up.
+      data_class: type
+          subclass of DataObject with a slot per register,
+          see data_class.
+      decoder: function
+          decodes a data package of this recipe into an
+          instance of data_class. It is generated by compile.
+      dtype: numpy.dtype
+          native structured dtype with a field per register,
+          used to store many data packages in an array.
+      package_dtype: numpy.dtype
+          big-endian structured dtype of a whole data package
+          of this recipe, header included, used to decode many
+          consecutive packages with np.frombuffer.
     """
-    __slots__ = ['id', 'names', 'types', 'fmt']
+    __slots__ = ['id', 'names', 'types', 'fmt', 'fmt_struct', 'data_class',
+                 'decoder', 'dtype', 'package_dtype']
     @staticmethod
     def unpack_recipe(buf):
         """
@@ -219,13 +329,159 @@ class DataConfig(object):
                 raise ValueError('An input parameter is already in use.')
             else:
                 raise ValueError('Unknown data type: ' + i)
+        rmd.fmt_struct = struct.Struct(rmd.fmt)
+        rmd.data_class = None
+        rmd.decoder = None
+        rmd.dtype = None
+        rmd.package_dtype = None
         return rmd
-        
+
+    def compile(self, numpy_vectors=False):
+        """
+          Description:
+          -----------
+            Generates the data class, the decoder and the numpy
+            dtypes of the data packages of this recipe.
+            The decoder unpacks the whole package with a single call
+            to fmt_struct.unpack_from and passes each field, a
+            precomputed slice, to the constructor of the data class,
+            e.g. for the recipe actual_q,robot_mode
+
+              def decode(data):
+                  v = unpack_from(data)
+                  return DataClass(v[0], list(v[1:7]), v[7])
+
+            It must be called again if names changes.
+          Parameters:
+          ----------
+            numpy_vectors: bool
+                decode the vector registers in numpy arrays
+                instead of lists.
+        """
+        if len(self.names) != len(self.types):
+            raise ValueError('List sizes are not identical.')
+        self.data_class = data_class(self.names)
+        vector = 'array(v[%d:%d])' if numpy_vectors else 'list(v[%d:%d])'
+        fields = ['v[0]']
+        offset = 1
+        for data_type in self.types:
+            size = get_item_size(data_type)
+            if data_type.startswith('VECTOR'):
+                fields.append(vector % (offset, offset + size))
+            else:
+                fields.append('v[%d]' % offset)
+            offset += size
+        lines = ['def decode(data):',
+                 '    v = unpack_from(data)',
+                 '    return DataClass(%s)' % ', '.join(fields)]
+        namespace = {'unpack_from': self.fmt_struct.unpack_from,
+                     'DataClass': self.data_class, 'array': np.array}
+        exec('\n'.join(lines), namespace)
+        self.decoder = namespace['decode']
+
+        self.dtype = numpy_dtype(self.names, self.types)
+        header = [('size', '>u2'), ('command', 'u1'), ('recipe_id', 'u1')]
+        self.package_dtype = np.dtype(
+            header + numpy_dtype(self.names, self.types, '>').descr)
+
     def pack(self, state):
         l = state.pack(self.names, self.types)
-        return struct.pack(self.fmt, *l)
+        return self.fmt_struct.pack(*l)
+
+    def writer(self):
+        """
+          Returns an InputWriter of this recipe.
+        """
+        return InputWriter(self)
 
     def unpack(self, data):
-        li =  struct.unpack_from(self.fmt, data)
-        return DataObject.unpack(li, self.names, self.types)
+        if self.decoder is None:
+            self.compile()
+        return self.decoder(data)
     
+
+
+DATA_PACKAGE_COMMAND = 85 # ascii U, rtde.Command.RTDE_DATA_PACKAGE
+
+
+class InputWriter(object):
+    """
+    Description:
+    -----------
+       Packs the values of an input recipe into a whole
+       RTDE_DATA_PACKAGE frame, header included, kept in a
+       preallocated buffer. The header is written once, each
+       call to pack only writes the values with
+       struct.pack_into, so sending a sample neither builds
+       lists nor allocates bytes.
+
+    Member Variables:
+    ----------------
+      frame: bytearray
+          the frame of the last values packed.
+      size: int
+          number of scalar values of the recipe, the vectors
+          count as many values as their length.
+    """
+    __slots__ = ['frame', 'size', '__values', '__ints', '__index',
+                 '__buffer']
+
+    def __init__(self, config):
+        """
+          Parameters:
+          ----------
+            config: DataConfig of an input recipe.
+        """
+        fmt = config.fmt[2:]
+        self.__values = struct.Struct('>' + fmt)
+        self.size = len(fmt)
+        # positions of the integer registers, cast before packing
+        self.__ints = [i for i, c in enumerate(fmt) if c in 'iIQB']
+        # the values are cast in this list, reused by every pack
+        self.__buffer = [0] * self.size
+        self.__index = {}
+        offset = 0
+        for name, data_type in zip(config.names or [], config.types):
+            self.__index[name] = offset
+            offset += get_item_size(data_type)
+        self.frame = bytearray(4 + self.__values.size)
+        struct.pack_into('>HBB', self.frame, 0, len(self.frame),
+                         DATA_PACKAGE_COMMAND, config.id)
+
+    def index(self, name):
+        """
+          Parameters:
+          ----------
+            name: name of a register of the recipe.
+          Returns:
+          -------
+            position of the (first) value of the register in the
+            values given to pack.
+          Raises:
+          ------
+            ValueError if the register is not in the recipe.
+        """
+        if name not in self.__index:
+            raise ValueError('Register not in the recipe: ' + str(name))
+        return self.__index[name]
+
+    def pack(self, values):
+        """
+          Parameters:
+          ----------
+            values: tuple, list or numpy vector with the values of
+                    the registers in the order of the recipe, see
+                    index. The values of the integer registers are
+                    cast with int, so a float vector can be given.
+          Returns:
+          -------
+            self.frame
+        """
+        if self.__ints and len(values) == self.size:
+            buffer = self.__buffer
+            buffer[:] = values
+            for i in self.__ints:
+                buffer[i] = int(buffer[i])
+            values = buffer
+        self.__values.pack_into(self.frame, 4, *values)
+        return self.frame
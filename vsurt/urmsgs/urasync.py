@@ -0,0 +1,242 @@
+'''
+    This module contains asyncio clients for the robot state messages of the
+    30001-30002 ports, to follow one or many robots in a single event loop.
+'''
+import asyncio
+import logging
+import struct
+import time
+
+from .urmsgs import cUrMessage, cUrRobotState, getRobotStatePacketIndex
+from .urmsgs import ROBOT_STATE, RS_DECODERS
+
+_MESSAGE_SIZE = struct.Struct('>i')
+_logger = logging.getLogger(__name__)
+
+
+class cUrAsyncStateReader(object):
+    '''
+        asyncio version of cUrStateStream. Keeps a connection open with the
+        primary (or secondary) interface of a UR, reconnecting when it drops
+        or when no message arrives within the timeout.
+        Iterating over it with async for yields (t, cUrRobotState) tuples,
+        where t is the time.time() when the message was received.
+        self.ip_ (str) address of the robot
+        self.port_ (int) port of the interface
+        self.reconnects_ (int) number of times the reader has reconnected
+    '''
+
+    def __init__(self,
+                 _ip,
+                 _port=30001,
+                 _timeout=2.0,
+                 _reconnect=True,
+                 _reconnect_delay=0.5,
+                 _max_reconnects=None):
+        """__init__
+
+        :param _ip: address of the robot
+        :param _port: port of the interface
+        :param _timeout: seconds to wait for the connection and for each
+            message
+        :param _reconnect: reconnect if the connection is lost
+        :param _reconnect_delay: seconds to wait before reconnecting
+        :param _max_reconnects: consecutive failed reconnections before
+            giving up. None means forever.
+        """
+        self.ip_ = _ip
+        self.port_ = _port
+        self.timeout_ = _timeout
+        self.reconnect_ = _reconnect
+        self.reconnect_delay_ = _reconnect_delay
+        self.max_reconnects_ = _max_reconnects
+
+        self.reconnects_ = 0
+        self.reader_ = None
+        self.writer_ = None
+
+    async def connect(self):
+        ''' Open the connection with the robot if it is not open yet.'''
+        if self.reader_ is not None:
+            return
+        self.reader_, self.writer_ = await asyncio.wait_for(
+            asyncio.open_connection(self.ip_, self.port_), self.timeout_)
+
+    async def close(self):
+        ''' Close the connection with the robot.'''
+        if self.writer_ is not None:
+            writer = self.writer_
+            self.reader_ = None
+            self.writer_ = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_args):
+        await self.close()
+
+    async def _read_message(self):
+        header = await self.reader_.readexactly(4)
+        size = _MESSAGE_SIZE.unpack(header)[0]
+        if size < 5:
+            raise ValueError('Wrong UR message size: ' + str(size))
+        return header + await self.reader_.readexactly(size - 4)
+
+    async def next_message(self):
+        """Wait for the next ROBOT_STATE message.
+
+        :return: (t, cUrMessage) where t is the reception time
+        """
+        failures = 0
+        while True:
+            try:
+                await self.connect()
+                data = await asyncio.wait_for(self._read_message(),
+                                              self.timeout_)
+            except (OSError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError, ValueError):
+                await self.close()
+                if not self.reconnect_:
+                    raise
+                if self.max_reconnects_ is not None and \
+                        failures >= self.max_reconnects_:
+                    raise
+                failures += 1
+                self.reconnects_ += 1
+                _logger.info('Reconnecting with the UR at ' + self.ip_)
+                await asyncio.sleep(self.reconnect_delay_)
+                continue
+            t = time.time()
+            msg = cUrMessage().unpack(data)
+            if msg.type_ == ROBOT_STATE:
+                return t, msg
+
+    async def next_state(self, _types=None):
+        """Wait for the next ROBOT_STATE message and decode its packets.
+
+        :param _types: container with the packet types to decode. By
+            default all the types registered in RS_DECODERS. ValueError
+            is raised for a type without decoder, see register_rs_decoder.
+        :return: (t, dict) where t is the reception time and the dict maps
+            the packet type to the decoded instance.
+        """
+        if _types is None:
+            _types = RS_DECODERS
+        unknown = [t for t in _types if t not in RS_DECODERS]
+        if unknown:
+            raise ValueError('No decoder registered for the packet types ' +
+                             str(unknown))
+        t, msg = await self.next_message()
+        packets = getRobotStatePacketIndex(msg, _types)
+        return t, {p: RS_DECODERS[p](pac.data_) for p, pac in packets.items()}
+
+    async def next_snapshot(self):
+        """Wait for the next ROBOT_STATE message.
+
+        :return: (t, cUrRobotState) where t is the reception time
+        """
+        t, msg = await self.next_message()
+        return t, cUrRobotState(msg)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.next_snapshot()
+
+
+class cUrFleetMonitor(object):
+    '''
+        Follows the robot state of many UR in the same event loop.
+        Iterating over it with async for yields (ip, t, cUrRobotState) tuples
+        as the messages of the robots arrive. Each robot has its own reader,
+        so a robot which stops answering only delays itself. The iteration
+        ends when the readers of all the robots have stopped.
+        self.readers_ (dict) cUrAsyncStateReader of each robot by address
+    '''
+
+    def __init__(self, _ips, _port=30001, _queue_size=0, **kwargs):
+        """__init__
+
+        :param _ips: iterable with the addresses of the robots
+        :param _port: port of the interface
+        :param _queue_size: maximum number of states waiting to be
+            consumed. 0 means unbounded.
+        :param kwargs: passed to each cUrAsyncStateReader (_timeout,
+            _reconnect_delay, ...)
+        """
+        self.readers_ = {
+            ip: cUrAsyncStateReader(ip, _port, **kwargs)
+            for ip in _ips
+        }
+        self.queue_size_ = _queue_size
+        self.queue_ = None
+        self.tasks_ = []
+        self.running_ = False
+        self.live_ = 0  # readers which have not stopped yet
+
+    async def start(self):
+        ''' Start following the robots.'''
+        if self.queue_ is not None:
+            return
+        self.queue_ = asyncio.Queue(self.queue_size_)
+        self.running_ = True
+        self.live_ = len(self.readers_)
+        self.tasks_ = [
+            asyncio.ensure_future(self._follow(reader))
+            for reader in self.readers_.values()
+        ]
+
+    async def stop(self):
+        ''' Stop following the robots and close the connections.'''
+        # asyncio.wait_for may swallow a cancellation which arrives with a
+        # message or a timeout, so the readers are cancelled until they stop.
+        self.running_ = False
+        pending = set(self.tasks_)
+        while pending:
+            for task in pending:
+                task.cancel()
+            _, pending = await asyncio.wait(pending, timeout=0.1)
+        for reader in self.readers_.values():
+            await reader.close()
+        self.tasks_ = []
+        self.queue_ = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_args):
+        await self.stop()
+
+    async def _follow(self, _reader):
+        try:
+            while self.running_:
+                t, state = await _reader.next_snapshot()
+                await self.queue_.put((_reader.ip_, t, state))
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                ValueError) as exc:
+            _logger.error('Stopped following the UR at ' + _reader.ip_ +
+                          ': ' + repr(exc))
+        # the last reader ends the iteration
+        self.live_ -= 1
+        if self.live_ == 0:
+            await self.queue_.put(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.start()
+        item = await self.queue_.get()
+        if item is None:
+            # left for the next call, which stops as well
+            self.queue_.put_nowait(None)
+            raise StopAsyncIteration
+        return item
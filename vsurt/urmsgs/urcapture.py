@@ -0,0 +1,452 @@
+'''
+    This module contains a binary format to capture the raw frames sent by
+    the 30001-30002 (primary) and 30004 (RTDE) ports of the UR, a server
+    which replays a capture over TCP, and a transport (see urtransport)
+    which replays it in memory, as fast as the client reads it.
+
+    A capture is a file header followed by one record per frame
+
+        |- magic (8 bytes) -|- version (uint8) -|- protocol (uint8) -|- port (uint16) -|
+        |- t (double) -|- length (uint32) -|- frame -| ...
+
+    where t is the time.time() at which the frame was received and frame
+    contains the whole message, header included.
+'''
+import bisect
+import socket
+import struct
+import threading
+import time
+import collections
+
+from .urmsgs import cUrFrameReader
+
+PRIMARY = 0
+RTDE = 1
+
+_MAGIC = b'VSURTCAP'
+_VERSION = 1
+_FILE_HEADER = struct.Struct('>8sBBH')
+_RECORD_HEADER = struct.Struct('>dI')
+_RTDE_HEADER = struct.Struct('>HB')
+
+_RTDE_DATA_PACKAGE = 85  # ascii U
+_RTDE_CONTROL_PACKAGE_START = 83  # ascii S
+_RTDE_CONTROL_PACKAGE_PAUSE = 80  # ascii P
+
+
+class cUrCaptureWriter(object):
+    '''
+        Writes frames in a capture file.
+        self.protocol_ (int) PRIMARY or RTDE
+        self.port_     (int) port where the frames were captured
+        self.count_    (int) number of frames written
+    '''
+
+    def __init__(self, _filename, _protocol=PRIMARY, _port=30001):
+        """__init__
+
+        :param _filename: path of the capture file
+        :param _protocol: PRIMARY or RTDE
+        :param _port: port where the frames are captured
+        """
+        self.protocol_ = _protocol
+        self.port_ = _port
+        self.count_ = 0
+        self.file_ = open(_filename, 'wb')
+        self.file_.write(
+            _FILE_HEADER.pack(_MAGIC, _VERSION, _protocol, _port))
+
+    def write(self, _frame, _t=None):
+        """Append a frame to the capture.
+
+        :param _frame: bytes-like object with the whole message
+        :param _t: reception time of the frame. By default time.time()
+        """
+        if _t is None:
+            _t = time.time()
+        self.file_.write(_RECORD_HEADER.pack(_t, len(_frame)))
+        self.file_.write(_frame)
+        self.count_ += 1
+
+    def close(self):
+        if not self.file_.closed:
+            self.file_.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+
+class cUrCaptureReader(object):
+    '''
+        Reads a capture file. Iterating over it yields (t, frame) tuples.
+        self.protocol_ (int) PRIMARY or RTDE
+        self.port_     (int) port where the frames were captured
+    '''
+
+    def __init__(self, _filename):
+        self.filename_ = _filename
+        with open(_filename, 'rb') as f:
+            header = f.read(_FILE_HEADER.size)
+        if len(header) < _FILE_HEADER.size:
+            raise ValueError(_filename + ' is not a capture file')
+        magic, version, self.protocol_, self.port_ = \
+            _FILE_HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(_filename + ' is not a capture file')
+
+    def __iter__(self):
+        with open(self.filename_, 'rb') as f:
+            f.seek(_FILE_HEADER.size)
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                t, length = _RECORD_HEADER.unpack(header)
+                frame = f.read(length)
+                if len(frame) < length:
+                    return
+                yield t, frame
+
+    def frames(self):
+        """Return the list of (t, frame) tuples of the capture."""
+        return list(self)
+
+
+def capture_primary(_ip, _filename, _port=30001, _duration=None,
+                    _count=None):
+    """Capture the messages sent by the primary (or secondary) interface.
+
+    :param _ip: address of the robot
+    :param _filename: path of the capture file
+    :param _port: port of the interface
+    :param _duration: seconds to capture. None means until _count frames
+    :param _count: number of frames to capture. None means until _duration
+    :return: number of frames captured
+    """
+    if _duration is None and _count is None:
+        raise ValueError('Either _duration or _count must be given')
+    soc = socket.create_connection((_ip, _port))
+    reader = cUrFrameReader()
+    t0 = time.time()
+    try:
+        with cUrCaptureWriter(_filename, PRIMARY, _port) as writer:
+            while True:
+                frame = reader.read(soc)
+                t = time.time()
+                writer.write(frame, t)
+                if _count is not None and writer.count_ >= _count:
+                    break
+                if _duration is not None and t - t0 >= _duration:
+                    break
+            return writer.count_
+    finally:
+        soc.close()
+
+
+class cUrReplayServer(object):
+    '''
+        Serves a capture over TCP, so the clients of the primary interface
+        and of RTDE can be tested without a robot.
+        For a PRIMARY capture the frames are streamed as soon as a client
+        connects. For a RTDE capture the server answers each request of the
+        client with the next captured reply to the same command, and streams
+        the captured data packages after the client starts the
+        synchronization.
+        When the capture is exhausted the connection is closed.
+        self.port_ (int) port where the server listens
+    '''
+
+    def __init__(self, _filename, _host='127.0.0.1', _port=0, _speed=1.0):
+        """__init__
+
+        :param _filename: path of the capture file
+        :param _host: address where the server listens
+        :param _port: port where the server listens, 0 picks a free one
+        :param _speed: replay speed relative to the capture, e.g. 2.0 plays
+            twice as fast. None or 0 plays as fast as possible.
+        """
+        capture = cUrCaptureReader(_filename)
+        self.protocol_ = capture.protocol_
+        self.frames_ = capture.frames()
+        self.speed_ = _speed
+
+        self.soc_ = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.soc_.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.soc_.bind((_host, _port))
+        self.soc_.listen(5)
+        self.host_, self.port_ = self.soc_.getsockname()[:2]
+        self.thread_ = None
+        self.running_ = False
+
+    def start(self):
+        ''' Start accepting clients in a background thread.'''
+        self.running_ = True
+        self.thread_ = threading.Thread(target=self.serve_forever)
+        self.thread_.daemon = True
+        self.thread_.start()
+        return self
+
+    def stop(self):
+        ''' Stop accepting clients.'''
+        self.running_ = False
+        try:
+            self.soc_.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.soc_.close()
+        if self.thread_ is not None:
+            self.thread_.join()
+            self.thread_ = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_args):
+        self.stop()
+
+    def serve_forever(self):
+        while self.running_:
+            try:
+                conn, _ = self.soc_.accept()
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if self.protocol_ == RTDE:
+                target = self._serve_rtde
+            else:
+                target = self._serve_primary
+            thread = threading.Thread(target=target, args=(conn, ))
+            thread.daemon = True
+            thread.start()
+
+    def _stream(self, _conn, _frames, _lock=None, _stop=None):
+        """Send _frames keeping their original timing scaled by the speed.
+        """
+        if len(_frames) == 0:
+            return
+        t0 = _frames[0][0]
+        start = time.time()
+        for t, frame in _frames:
+            if _stop is not None and _stop.is_set():
+                return
+            if self.speed_:
+                delay = start + (t - t0) / self.speed_ - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            if _lock is None:
+                _conn.sendall(frame)
+            else:
+                with _lock:
+                    _conn.sendall(frame)
+
+    def _serve_primary(self, _conn):
+        try:
+            self._stream(_conn, self.frames_)
+        except OSError:
+            pass
+        finally:
+            _conn.close()
+
+    def _serve_rtde(self, _conn):
+        replies, data = _split_rtde(self.frames_)
+        lock = threading.Lock()
+        stop = threading.Event()
+        streamer = None
+        try:
+            while True:
+                header = _recv_exactly(_conn, _RTDE_HEADER.size)
+                if header is None:
+                    break
+                size, command = _RTDE_HEADER.unpack(header)
+                if _recv_exactly(_conn, size - _RTDE_HEADER.size) is None:
+                    break
+                reply = _rtde_reply(replies, command)
+                if reply is None:
+                    continue
+                with lock:
+                    _conn.sendall(reply)
+                if command == _RTDE_CONTROL_PACKAGE_START and \
+                        streamer is None:
+                    streamer = threading.Thread(target=self._stream_rtde,
+                                                args=(_conn, data, lock,
+                                                      stop))
+                    streamer.daemon = True
+                    streamer.start()
+                elif command == _RTDE_CONTROL_PACKAGE_PAUSE:
+                    stop.set()
+        except OSError:
+            pass
+        finally:
+            stop.set()
+            if streamer is not None and \
+                    streamer is not threading.current_thread():
+                streamer.join()
+            _conn.close()
+
+    def _stream_rtde(self, _conn, _frames, _lock, _stop):
+        try:
+            self._stream(_conn, _frames, _lock, _stop)
+            if not _stop.is_set():
+                _conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class cUrReplayTransport(object):
+    '''
+        Replays a capture in memory as a transport of urtransport, so
+        rtde.RTDE, cUrFrameReader or cUrStateStream read it without any
+        socket, as fast as they can.
+        For a PRIMARY capture all the frames are readable at once. For a RTDE
+        capture each request sent is answered with the next captured reply
+        to the same command, as cUrReplayServer does, and the data packages
+        are readable while the synchronization is started. Each recv_into
+        returns at most one frame, so a client sees every package, in
+        order, however fast it reads. When the capture is exhausted
+        recv_into returns 0, as a closed socket.
+        self.protocol_ (int) PRIMARY or RTDE
+        self.sent_     (list) data packages sent by the client, header
+                       included, e.g. the commands of a controller under test
+    '''
+
+    def __init__(self, _frames, _protocol=PRIMARY):
+        """__init__
+
+        :param _frames: list of (t, frame) tuples, see cUrCaptureReader
+        :param _protocol: PRIMARY or RTDE
+        """
+        self.protocol_ = _protocol
+        self.sent_ = []
+        if _protocol == RTDE:
+            self.replies_, frames = _split_rtde(_frames)
+        else:
+            self.replies_, frames = None, _frames
+        self.stream_ = b''.join(frame for _, frame in frames)
+        # end of each frame in self.stream_
+        self.ends_ = []
+        end = 0
+        for _, frame in frames:
+            end += len(frame)
+            self.ends_.append(end)
+        self.pos_ = 0
+        self.started_ = _protocol != RTDE
+        self.pending_ = bytearray()  # replies not read yet
+        self.requests_ = bytearray()  # bytes sent not parsed yet
+        self.closed_ = False
+        self.lock_ = threading.Lock()
+
+    @staticmethod
+    def from_capture(_filename):
+        """Return a cUrReplayTransport of the capture file _filename."""
+        capture = cUrCaptureReader(_filename)
+        return cUrReplayTransport(capture.frames(), capture.protocol_)
+
+    def recv_into(self, _view):
+        with self.lock_:
+            if self.closed_:
+                return 0
+            if self.pending_:
+                n = min(len(_view), len(self.pending_))
+                _view[:n] = self.pending_[:n]
+                del self.pending_[:n]
+                return n
+            if not self.started_ and self._at_frame_end():
+                raise BlockingIOError('RTDE synchronization is not started')
+            # at most the rest of the current frame, as the robot sends one
+            # frame per period, so a client which receives the newest
+            # package still sees all of them in order
+            index = bisect.bisect_right(self.ends_, self.pos_)
+            end = self.ends_[index] if index < len(self.ends_) else self.pos_
+            end = min(end, self.pos_ + len(_view))
+            n = end - self.pos_
+            _view[:n] = self.stream_[self.pos_:end]
+            self.pos_ = end
+            return n
+
+    def sendall(self, _data):
+        with self.lock_:
+            if self.closed_:
+                raise BrokenPipeError('The replay transport is closed')
+            if self.protocol_ != RTDE:
+                return
+            self.requests_ += _data
+            requests = self.requests_
+            start = 0
+            while len(requests) - start >= _RTDE_HEADER.size:
+                size, command = _RTDE_HEADER.unpack_from(requests, start)
+                if len(requests) - start < size:
+                    break
+                if command == _RTDE_DATA_PACKAGE:
+                    self.sent_.append(bytes(requests[start:start + size]))
+                else:
+                    reply = _rtde_reply(self.replies_, command)
+                    if reply is not None:
+                        self.pending_ += reply
+                    if command == _RTDE_CONTROL_PACKAGE_START:
+                        self.started_ = True
+                    elif command == _RTDE_CONTROL_PACKAGE_PAUSE:
+                        self.started_ = False
+                start += size
+            del requests[:start]
+
+    def readable(self, _timeout):
+        """Nothing arrives while waiting in memory, so it never waits."""
+        return self.closed_ or bool(self.pending_) or self.started_ or \
+            not self._at_frame_end()
+
+    def _at_frame_end(self):
+        index = bisect.bisect_left(self.ends_, self.pos_)
+        return self.pos_ == 0 or (index < len(self.ends_) and
+                                  self.ends_[index] == self.pos_)
+
+    def writable(self, _timeout):
+        return not self.closed_
+
+    def close(self):
+        self.closed_ = True
+
+
+def _split_rtde(_frames):
+    """Split the frames of a RTDE capture in the data packages and a dict
+    which maps each command to the deque of its captured replies.
+    """
+    replies = collections.defaultdict(collections.deque)
+    data = []
+    for t, frame in _frames:
+        command = frame[2]
+        if command == _RTDE_DATA_PACKAGE:
+            data.append((t, frame))
+        else:
+            replies[command].append(frame)
+    return replies, data
+
+
+def _rtde_reply(_replies, _command):
+    """Return the next captured reply to a request of _command, a success
+    for start and pause when none was captured, or None.
+    """
+    if _command == _RTDE_DATA_PACKAGE:
+        return None
+    if _replies[_command]:
+        return _replies[_command].popleft()
+    if _command in (_RTDE_CONTROL_PACKAGE_START,
+                    _RTDE_CONTROL_PACKAGE_PAUSE):
+        return _RTDE_HEADER.pack(4, _command) + b'\x01'
+    return None
+
+
+def _recv_exactly(_soc, _size):
+    """Receive exactly _size bytes, or None if the connection is closed."""
+    buf = bytearray(_size)
+    view = memoryview(buf)
+    read = 0
+    while read < _size:
+        n = _soc.recv_into(view[read:])
+        if n == 0:
+            return None
+        read += n
+    return bytes(buf)
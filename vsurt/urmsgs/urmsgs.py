@@ -5,22 +5,176 @@
 import numpy as np
 import socket
 import struct
-import copy
 
 ROBOT_STATE = 16
 
 JOINT_DATA = 1
 ROBOT_MODE_DATA = 0
+TOOL_DATA = 2
+MASTERBOARD_DATA = 3
 CARTESIAN_INFO = 4
 CONFIGURATION_DATA = 6
 KINEMATICS_INFO = 5
+FORCE_MODE_DATA = 7
+ADDITIONAL_INFO = 8
+CALIBRATION_DATA = 9
+SAFETY_DATA = 10
+TOOL_COMMUNICATION_INFO = 11
+TOOL_MODE_INFO = 12
+SINGULARITY_INFO = 13
+
+# Map from the robot state packet types to the classes which decode them.
+# Filled with register_rs_decoder.
+RS_DECODERS = {}
+
+# Layout of the robot state packets. They are built once at import time and
+# used to decode a whole packet with a single np.frombuffer.
+_JOINT_DATA_DTYPE = np.dtype([
+    ('q_actual', '>f8'),
+    ('q_target', '>f8'),
+    ('qd_actual', '>f8'),
+    ('i_actual', '>f4'),
+    ('v_actual', '>f4'),
+    ('t_motor', '>f4'),
+    ('t_micro', '>f4'),
+    ('joint_mode', 'u1'),
+])
+
+_CARTESIAN_INFO_DTYPE = np.dtype([
+    ('tcp_pose', '>f8', (6, )),
+    ('tcp_offset', '>f8', (6, )),
+])
+
+_CONFIGURATION_DATA_DTYPE = np.dtype([
+    ('joint_min_limit', '>f8', (6, )),
+    ('joint_max_limit', '>f8', (6, )),
+    ('joint_max_speed', '>f8', (6, )),
+    ('joint_max_acceleration', '>f8', (6, )),
+    ('v_joint_default', '>f8'),
+    ('a_joint_default', '>f8'),
+    ('v_tool_default', '>f8'),
+    ('a_tool_default', '>f8'),
+    ('eq_radius', '>f8'),
+    ('dh_a', '>f8', (6, )),
+    ('dh_d', '>f8', (6, )),
+    ('dh_alpha', '>f8', (6, )),
+    ('dh_theta', '>f8', (6, )),
+    ('masterboard_version', '>i4'),
+    ('controller_box_type', '>i4'),
+    ('robot_type', '>i4'),
+    ('robot_sub_type', '>i4'),
+])
+
+_KINEMATICS_INFO_DTYPE = np.dtype([
+    ('checksum', '>u4', (6, )),
+    ('dh_theta', '>f8', (6, )),
+    ('dh_a', '>f8', (6, )),
+    ('dh_d', '>f8', (6, )),
+    ('dh_alpha', '>f8', (6, )),
+    ('calibration_status', '>u4'),
+])
+
+_ROBOT_MODE_DATA_DTYPE = np.dtype([
+    ('timestamp', '>u8'),
+    ('is_real_robot_connected', 'u1'),
+    ('is_real_robot_enabled', 'u1'),
+    ('is_robot_power_on', 'u1'),
+    ('is_emergency_stopped', 'u1'),
+    ('is_protective_stopped', 'u1'),
+    ('is_program_running', 'u1'),
+    ('is_program_paused', 'u1'),
+    ('robot_mode', 'u1'),
+    ('control_mode', 'u1'),
+    ('target_speed_fraction', '>f8'),
+    ('speed_scaling', '>f8'),
+    ('target_speed_fraction_limit', '>f8'),
+])
+
+_PACKET_HEADER = struct.Struct('>iB')
+_MESSAGE_SIZE = struct.Struct('>i')
+
+
+def _pack_rs_packet(_type, _content):
+    """Prepend the size and type header to the content of a robot state
+    packet.
+
+    :param _type: type of the robot state packet
+    :param _content: numpy array with the content of the packet
+    """
+    return _PACKET_HEADER.pack(_PACKET_HEADER.size + _content.nbytes,
+                               _type) + _content.tobytes()
+
+
+def register_rs_decoder(_type, _decoder):
+    """Register the decoder of the robot state packets of type _type.
+
+    :param _type: type of the robot state packet
+    :param _decoder: class whose constructor takes the packet data and
+        decodes it, e.g. cUrJointData
+    """
+    RS_DECODERS[_type] = _decoder
+    return _decoder
+
+
+class cUrFrameReader(object):
+    '''
+        Reads the length-prefixed messages of the UR into a reusable buffer.
+        The buffer grows when a message does not fit, so after the first
+        messages no memory is allocated per message.
+        self.buf_   (bytearray) buffer where the messages are read
+        self.frame_ (memoryview) last message read
+    '''
+
+    def __init__(self, _size=4096):
+        """__init__
+
+        :param _size: initial size of the buffer in bytes
+        """
+        self.buf_ = bytearray(_size)
+        self.view_ = memoryview(self.buf_)
+        self.frame_ = self.view_[:0]
+
+    def read(self, _soc):
+        """Read a whole message from _soc. The returned memoryview is
+        overwritten by the next call.
+
+        :param _soc: socket connected to the UR, or a transport of
+            urtransport
+        :return: memoryview with the message, header included
+        """
+        self._recv_into(_soc, 0, 4)
+        size = _MESSAGE_SIZE.unpack_from(self.buf_)[0]
+        if size < 5:
+            raise ValueError('Wrong UR message size: ' + str(size))
+        if size > len(self.buf_):
+            self._grow(size)
+        self._recv_into(_soc, 4, size)
+        if len(self.frame_) != size:
+            self.frame_ = self.view_[:size]
+        return self.frame_
+
+    def _recv_into(self, _soc, _start, _stop):
+        while _start < _stop:
+            n = _soc.recv_into(self.view_[_start:_stop])
+            if n == 0:
+                raise ConnectionError('The UR closed the connection')
+            _start += n
+
+    def _grow(self, _size):
+        # The views handed out keep the old buffer alive, so a new one is
+        # allocated instead of resizing it.
+        buf = bytearray(max(_size, 2 * len(self.buf_)))
+        buf[:4] = self.view_[:4]
+        self.buf_ = buf
+        self.view_ = memoryview(buf)
 
 
 class cUrMessage(object):
     '''
         The output of the UR is composed by several messages.
         This class represent a binary message.
-        self.data_ (binary) binary data associated with the message
+        self.data_ (memoryview) binary data associated with the message. It
+                   is overwritten by the next call to get.
         self.len_  (int) length of the message in bytes
         self.type_ (int) type of the message
     '''
@@ -32,8 +186,8 @@ class cUrMessage(object):
         """
         self.data_ = None
         self.len_ = None
-        self.data_ = None
         self.type_ = None
+        self.reader_ = cUrFrameReader()
         if _soc is not None:
             self.get(_soc)
 
@@ -42,47 +196,104 @@ class cUrMessage(object):
 
         :param _soc:
         """
-        self.data_ = copy.copy(_soc.recv(4))
-        self.len_ = struct.unpack('>i', self.data_)[0]
-        self.data_ += copy.copy(_soc.recv(self.len_ - 4))
-        self.type_ = struct.unpack('>b', self.data_[4:5])[0]
+        return self.unpack(self.reader_.read(_soc))
+
+    def unpack(self, _data):
+        """set the message from the buffer _data, which contains a whole
+        message, header included.
+
+        :param _data: bytes, bytearray or memoryview
+        """
+        self.data_ = _data
+        self.len_ = len(_data)
+        self.type_ = _data[4]
 
         return self
 
 
 class cUrRobotStatePacket(object):
     """cUrRobotStatePacket
-        Represents a UR robot state packate
+        Represents a UR robot state packate as a view over the buffer of the
+        message which contains it. Nothing is copied, so the packet is valid
+        as long as the buffer of the message is not overwritten.
+        self.data_   (memoryview) bytes of the packet, header included
+        self.len_    (int) length of the packet in bytes
+        self.type_   (int) type of the packet
+        self.offset_ (int) position of the packet inside the message
     """
+    __slots__ = ['len_', 'data_', 'type_', 'offset_']
 
-    def __init__(self, _data=None):
+    def __init__(self, _data=None, _offset=0):
         self.len_ = None
         self.data_ = None
         self.type_ = None
+        self.offset_ = None
 
         if _data is not None:
-            self.get(_data)
+            self.get(_data, _offset)
+
+    def get(self, _data, _offset=0):
+        """get the packet which starts at _offset in _data.
 
-    def get(self, _data):
-        self.len_, self.type_ = struct.unpack('>ib', _data[:4 + 1])
-        self.data_ = copy.copy(_data[:self.len_])
+        :param _data: buffer (bytes, bytearray or memoryview)
+        :param _offset: position of the packet in _data
+        """
+        self.len_, self.type_ = _PACKET_HEADER.unpack_from(_data, _offset)
+        self.offset_ = _offset
+        self.data_ = memoryview(_data)[_offset:_offset + self.len_]
 
 
 def getRobotStatePacketArray(_msg):
+    """Split a ROBOT_STATE message in its packets.
 
+    :param _msg: cUrMessage
+    :return: list of cUrRobotStatePacket viewing the buffer of _msg
+    """
     result = []
-    if _msg.type_ != 16:
+    if _msg.type_ != ROBOT_STATE:
         return result
 
+    data = memoryview(_msg.data_)
     readData = 5
     while (readData < _msg.len_):
-        pack = cUrRobotStatePacket(_msg.data_[readData:])
+        pack = cUrRobotStatePacket(data, readData)
+        if pack.len_ < 5 or readData + pack.len_ > _msg.len_:
+            raise ValueError('Wrong robot state packet size: ' +
+                             str(pack.len_))
         result.append(pack)
         readData += pack.len_
 
     return result
 
 
+def getRobotStatePacketIndex(_msg, _types=None):
+    """Locate the packets of a ROBOT_STATE message without decoding them.
+    Only the headers are read, the packets of other types are skipped.
+
+    :param _msg: cUrMessage
+    :param _types: container with the packet types to locate. By default
+        the types registered in RS_DECODERS
+    :return: dict mapping the packet type to a cUrRobotStatePacket
+    """
+    result = {}
+    if _msg.type_ != ROBOT_STATE:
+        return result
+    if _types is None:
+        _types = RS_DECODERS
+
+    data = memoryview(_msg.data_)
+    readData = 5
+    while (readData < _msg.len_):
+        length, ptype = _PACKET_HEADER.unpack_from(data, readData)
+        if length < 5 or readData + length > _msg.len_:
+            raise ValueError('Wrong robot state packet size: ' + str(length))
+        if ptype in _types:
+            result[ptype] = cUrRobotStatePacket(data, readData)
+        readData += length
+
+    return result
+
+
 class cUrCartesianInfo(object):
     def __init__(self, _data=None):
         self.tcp_pose_ = None
@@ -92,10 +303,15 @@ class cUrCartesianInfo(object):
             self.unpack(_data)
 
     def unpack(self, _data):
-        tcp_pose_ = struct.unpack('>6d', _data[5:5 + 8 * 6])
-        tcp_offset_ = struct.unpack('>6d', _data[5 + 8 * 6:5 + 8 * 6 + 8 * 6])
-        self.tcp_pose_ = np.array(tcp_pose_)
-        self.tcp_offset_ = np.array(tcp_offset_)
+        d = np.frombuffer(_data, _CARTESIAN_INFO_DTYPE, 1, 5)[0]
+        self.tcp_pose_ = d['tcp_pose'].astype(np.float64)
+        self.tcp_offset_ = d['tcp_offset'].astype(np.float64)
+
+    def pack(self):
+        d = np.zeros((1, ), _CARTESIAN_INFO_DTYPE)
+        d['tcp_pose'] = self.tcp_pose_
+        d['tcp_offset'] = self.tcp_offset_
+        return _pack_rs_packet(CARTESIAN_INFO, d)
 
     def get(self, _ip, _port):
         pac = get_rs_packet(CARTESIAN_INFO, _ip, _port)
@@ -113,34 +329,35 @@ class cUrJointData(object):
         self.t_motor_ = None
         self.t_micro_ = None
         self.joint_mode_ = None
-        fmtsz = 6 * (3 * (('>d', 8), ) + (('>f', 4), ) + (('>f', 4), ) +
-                     (('>f', 4), ) + (('>f', 4), ) + (('>B', 1), ))
-        content_size = 0
-        for (_, size) in fmtsz:
-            content_size += size
-
-        self.content_size_ = content_size
-
-        self.fmtsz_ = fmtsz  # format and sizes
+        self.content_size_ = 6 * _JOINT_DATA_DTYPE.itemsize
 
         if _data is not None:
             self.unpack(_data)
 
     def unpack(self, _data):
-        rd = 5  # jump the size and the package type
-        d = []
-        for i, (fmt, sz) in enumerate(self.fmtsz_):
-            d.append(struct.unpack(fmt, _data[rd:rd + sz])[0])
-            rd += sz
-
-        self.q_actual_ = np.array(d[0::8])
-        self.q_target_ = np.array(d[1::8])
-        self.qd_actual_ = np.array(d[2::8])
-        self.i_actual_ = np.array(d[3::8])
-        self.v_actual_ = np.array(d[4::8])
-        self.t_motor_ = np.array(d[5::8])
-        self.t_micro_ = np.array(d[6::8])
-        self.joint_mode_ = np.array(d[7::8])
+        # jump the size and the package type
+        d = np.frombuffer(_data, _JOINT_DATA_DTYPE, 6, 5)
+
+        self.q_actual_ = d['q_actual'].astype(np.float64)
+        self.q_target_ = d['q_target'].astype(np.float64)
+        self.qd_actual_ = d['qd_actual'].astype(np.float64)
+        self.i_actual_ = d['i_actual'].astype(np.float64)
+        self.v_actual_ = d['v_actual'].astype(np.float64)
+        self.t_motor_ = d['t_motor'].astype(np.float64)
+        self.t_micro_ = d['t_micro'].astype(np.float64)
+        self.joint_mode_ = d['joint_mode'].astype(int)
+
+    def pack(self):
+        d = np.zeros((6, ), _JOINT_DATA_DTYPE)
+        d['q_actual'] = self.q_actual_
+        d['q_target'] = self.q_target_
+        d['qd_actual'] = self.qd_actual_
+        d['i_actual'] = self.i_actual_
+        d['v_actual'] = self.v_actual_
+        d['t_motor'] = self.t_motor_
+        d['t_micro'] = self.t_micro_
+        d['joint_mode'] = self.joint_mode_
+        return _pack_rs_packet(JOINT_DATA, d)
 
     def get(self, _ip, _port):
         pac = get_rs_packet(JOINT_DATA, _ip, _port)
@@ -157,9 +374,7 @@ def get_rs_packet(_type, _ip, _port):
         ----------
 
     '''
-    socket.setdefaulttimeout(None)
-    soc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    soc.connect((_ip, _port))
+    soc = socket.create_connection((_ip, _port))
     msg = cUrMessage()
     while (1):
         msg.get(soc)
@@ -171,6 +386,28 @@ def get_rs_packet(_type, _ip, _port):
     return mypackets[0]
 
 
+def get_rs_message(_ip, _port):
+    '''
+       get the first robot state message sent by the robot.
+
+        Parameters:
+        ----------
+          _ip: address of the robot
+          _port: port of the interface (30001 or 30002)
+        Returns:
+        --------
+          cUrMessage of type ROBOT_STATE
+    '''
+    soc = socket.create_connection((_ip, _port))
+    msg = cUrMessage()
+    try:
+        while msg.get(soc).type_ != ROBOT_STATE:
+            pass
+    finally:
+        soc.close()
+    return msg
+
+
 class cUrConfigurationData(object):
     def __init__(self, _data=None):
 
@@ -201,50 +438,55 @@ class cUrConfigurationData(object):
 
         self.roboSubType = 0
 
+        if _data is not None:
+            self.unpack(_data)
+
     def unpack(self, _data):
-        rd = 5  # read data
-
-        self.joinMinLimit_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.joinMaxLimit_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-
-        self.joinMaxSpeed_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.joinMaxAcceleration_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-
-        self.vJointDefault_ = struct.unpack('>d', _data[rd:rd + 8])[0]
-        rd += 8
-        self.aJointDefault_ = struct.unpack('>d', _data[rd:rd + 8])[0]
-        rd += 8
-        self.vToolDefatul_ = struct.unpack('>d', _data[rd:rd + 8])[0]
-        rd += 8
-        self.aToolDefatul_ = struct.unpack('>d', _data[rd:rd + 8])[0]
-        rd += 8
-        self.eqRadius_ = struct.unpack('>d', _data[rd:rd + 8])[0]
-        rd += 8
-
-        self.dh_a_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_d_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_alpha_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_theta_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-
-        self.masterboardVersion = struct.unpack('>i', _data[rd:rd + 4])[0]
-        rd += 4
-
-        self.controllerBoxType = struct.unpack('>i', _data[rd:rd + 4])[0]
-        rd += 4
-
-        self.robotType = struct.unpack('>i', _data[rd:rd + 4])[0]
-        rd += 4
-
-        self.roboSubType = struct.unpack('>i', _data[rd:rd + 4])[0]
-        rd += 4
+        # jump the size and the package type
+        d = np.frombuffer(_data, _CONFIGURATION_DATA_DTYPE, 1, 5)[0]
+
+        self.joinMinLimit_[:] = d['joint_min_limit']
+        self.joinMaxLimit_[:] = d['joint_max_limit']
+
+        self.joinMaxSpeed_[:] = d['joint_max_speed']
+        self.joinMaxAcceleration_[:] = d['joint_max_acceleration']
+
+        self.vJointDefault_ = float(d['v_joint_default'])
+        self.aJointDefault_ = float(d['a_joint_default'])
+        self.vToolDefatul_ = float(d['v_tool_default'])
+        self.aToolDefatul_ = float(d['a_tool_default'])
+        self.eqRadius_ = float(d['eq_radius'])
+
+        self.dh_a_[:] = d['dh_a']
+        self.dh_d_[:] = d['dh_d']
+        self.dh_alpha_[:] = d['dh_alpha']
+        self.dh_theta_[:] = d['dh_theta']
+
+        self.masterboardVersion = int(d['masterboard_version'])
+        self.controllerBoxType = int(d['controller_box_type'])
+        self.robotType = int(d['robot_type'])
+        self.roboSubType = int(d['robot_sub_type'])
+
+    def pack(self):
+        d = np.zeros((1, ), _CONFIGURATION_DATA_DTYPE)
+        d['joint_min_limit'] = self.joinMinLimit_
+        d['joint_max_limit'] = self.joinMaxLimit_
+        d['joint_max_speed'] = self.joinMaxSpeed_
+        d['joint_max_acceleration'] = self.joinMaxAcceleration_
+        d['v_joint_default'] = self.vJointDefault_
+        d['a_joint_default'] = self.aJointDefault_
+        d['v_tool_default'] = self.vToolDefatul_
+        d['a_tool_default'] = self.aToolDefatul_
+        d['eq_radius'] = self.eqRadius_
+        d['dh_a'] = self.dh_a_
+        d['dh_d'] = self.dh_d_
+        d['dh_alpha'] = self.dh_alpha_
+        d['dh_theta'] = self.dh_theta_
+        d['masterboard_version'] = self.masterboardVersion
+        d['controller_box_type'] = self.controllerBoxType
+        d['robot_type'] = self.robotType
+        d['robot_sub_type'] = self.roboSubType
+        return _pack_rs_packet(CONFIGURATION_DATA, d)
 
     def get(self, _ip, _port):
         pac = get_rs_packet(CONFIGURATION_DATA, _ip, _port)
@@ -261,28 +503,178 @@ class cUrKinematicsInfo(object):
         self.dh_alpha_ = np.zeros((6, ))
         self.dh_theta_ = np.zeros((6, ))
 
-
         self.calibration_status_ = 0
 
+        if _data is not None:
+            self.unpack(_data)
+
     def unpack(self, _data):
-        rd = 5  # size and packet type int+char
+        # jump the size and packet type int+char
+        d = np.frombuffer(_data, _KINEMATICS_INFO_DTYPE, 1, 5)[0]
+
+        self.checksum_[:] = d['checksum']
 
-        self.checksum_[:] = struct.unpack('>6I', _data[rd:rd + 24])
-        rd += 24
+        self.dh_theta_[:] = d['dh_theta']
+        self.dh_a_[:] = d['dh_a']
+        self.dh_d_[:] = d['dh_d']
+        self.dh_alpha_[:] = d['dh_alpha']
 
-        self.dh_theta_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_a_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_d_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
-        self.dh_alpha_[:] = struct.unpack('>6d', _data[rd:rd + 48])
-        rd += 48
+        self.calibration_status_ = int(d['calibration_status'])
 
-        self.calibration_status_ = struct.unpack('>I', _data[rd:rd + 4])[0]
-        rd += 4
+    def pack(self):
+        d = np.zeros((1, ), _KINEMATICS_INFO_DTYPE)
+        d['checksum'] = self.checksum_
+        d['dh_theta'] = self.dh_theta_
+        d['dh_a'] = self.dh_a_
+        d['dh_d'] = self.dh_d_
+        d['dh_alpha'] = self.dh_alpha_
+        d['calibration_status'] = self.calibration_status_
+        return _pack_rs_packet(KINEMATICS_INFO, d)
 
     def get(self, _ip, _port):
         pac = get_rs_packet(KINEMATICS_INFO, _ip, _port)
         self.unpack(pac.data_)
 
+
+
+class cUrRobotModeData(object):
+    def __init__(self, _data=None):
+
+        self.timestamp_ = 0
+
+        self.is_real_robot_connected_ = False
+        self.is_real_robot_enabled_ = False
+        self.is_robot_power_on_ = False
+        self.is_emergency_stopped_ = False
+        self.is_protective_stopped_ = False
+        self.is_program_running_ = False
+        self.is_program_paused_ = False
+
+        self.robot_mode_ = 0
+        self.control_mode_ = 0
+
+        self.target_speed_fraction_ = 0.0
+        self.speed_scaling_ = 0.0
+        self.target_speed_fraction_limit_ = 0.0
+
+        if _data is not None:
+            self.unpack(_data)
+
+    def unpack(self, _data):
+        # jump the size and packet type int+char
+        d = np.frombuffer(_data, _ROBOT_MODE_DATA_DTYPE, 1, 5)[0]
+
+        self.timestamp_ = int(d['timestamp'])
+
+        self.is_real_robot_connected_ = bool(d['is_real_robot_connected'])
+        self.is_real_robot_enabled_ = bool(d['is_real_robot_enabled'])
+        self.is_robot_power_on_ = bool(d['is_robot_power_on'])
+        self.is_emergency_stopped_ = bool(d['is_emergency_stopped'])
+        self.is_protective_stopped_ = bool(d['is_protective_stopped'])
+        self.is_program_running_ = bool(d['is_program_running'])
+        self.is_program_paused_ = bool(d['is_program_paused'])
+
+        self.robot_mode_ = int(d['robot_mode'])
+        self.control_mode_ = int(d['control_mode'])
+
+        self.target_speed_fraction_ = float(d['target_speed_fraction'])
+        self.speed_scaling_ = float(d['speed_scaling'])
+        self.target_speed_fraction_limit_ = float(
+            d['target_speed_fraction_limit'])
+
+    def pack(self):
+        d = np.zeros((1, ), _ROBOT_MODE_DATA_DTYPE)
+        d['timestamp'] = self.timestamp_
+        d['is_real_robot_connected'] = self.is_real_robot_connected_
+        d['is_real_robot_enabled'] = self.is_real_robot_enabled_
+        d['is_robot_power_on'] = self.is_robot_power_on_
+        d['is_emergency_stopped'] = self.is_emergency_stopped_
+        d['is_protective_stopped'] = self.is_protective_stopped_
+        d['is_program_running'] = self.is_program_running_
+        d['is_program_paused'] = self.is_program_paused_
+        d['robot_mode'] = self.robot_mode_
+        d['control_mode'] = self.control_mode_
+        d['target_speed_fraction'] = self.target_speed_fraction_
+        d['speed_scaling'] = self.speed_scaling_
+        d['target_speed_fraction_limit'] = self.target_speed_fraction_limit_
+        return _pack_rs_packet(ROBOT_MODE_DATA, d)
+
+    def get(self, _ip, _port):
+        pac = get_rs_packet(ROBOT_MODE_DATA, _ip, _port)
+        self.unpack(pac.data_)
+
+
+class cUrRobotState(object):
+    '''
+        Snapshot of the robot taken from a single ROBOT_STATE message, so
+        all its packets describe the same control cycle.
+        The packets are decoded the first time they are accessed, using the
+        decoders registered in RS_DECODERS. Until then the snapshot views the
+        buffer of the message, call decode_all before reading the next message
+        with the same cUrMessage to keep it.
+        self.joint_data_         (cUrJointData)
+        self.cartesian_info_     (cUrCartesianInfo)
+        self.robot_mode_data_    (cUrRobotModeData)
+        self.kinematics_info_    (cUrKinematicsInfo)
+        self.configuration_data_ (cUrConfigurationData)
+        The packets which are not in the message are None.
+    '''
+
+    def __init__(self, _msg=None):
+        """__init__
+
+        :param _msg: cUrMessage of type ROBOT_STATE
+        """
+        self.packets_ = {}
+        self.decoded_ = {}
+
+        if _msg is not None:
+            self.unpack(_msg)
+
+    def unpack(self, _msg):
+        self.packets_ = getRobotStatePacketIndex(_msg)
+        self.decoded_ = {}
+
+    def decode(self, _type):
+        """Return the packet of type _type decoded, or None if it is not
+        in the message.
+
+        :param _type: type of the robot state packet
+        """
+        result = self.decoded_.get(_type)
+        if result is None:
+            pac = self.packets_.get(_type)
+            if pac is None:
+                return None
+            result = RS_DECODERS[_type](pac.data_)
+            self.decoded_[_type] = result
+        return result
+
+    def decode_all(self):
+        """Decode all the packets of the snapshot, so it no longer depends on
+        the buffer of the message."""
+        for ptype in self.packets_:
+            self.decode(ptype)
+        self.packets_ = {}
+        return self
+
+    def types(self):
+        """Types of the registered packets present in the snapshot."""
+        return set(self.packets_) | set(self.decoded_)
+
+    joint_data_ = property(lambda self: self.decode(JOINT_DATA))
+    cartesian_info_ = property(lambda self: self.decode(CARTESIAN_INFO))
+    robot_mode_data_ = property(lambda self: self.decode(ROBOT_MODE_DATA))
+    kinematics_info_ = property(lambda self: self.decode(KINEMATICS_INFO))
+    configuration_data_ = property(
+        lambda self: self.decode(CONFIGURATION_DATA))
+
+    def get(self, _ip, _port):
+        self.unpack(get_rs_message(_ip, _port))
+
+
+register_rs_decoder(ROBOT_MODE_DATA, cUrRobotModeData)
+register_rs_decoder(JOINT_DATA, cUrJointData)
+register_rs_decoder(CARTESIAN_INFO, cUrCartesianInfo)
+register_rs_decoder(KINEMATICS_INFO, cUrKinematicsInfo)
+register_rs_decoder(CONFIGURATION_DATA, cUrConfigurationData)
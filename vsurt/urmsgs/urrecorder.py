@@ -0,0 +1,180 @@
+'''
+    This module contains classes to record the joint data of the UR in
+    memory-mapped files and read it back.
+'''
+import numpy as np
+import json
+import os
+import time
+
+_INDEX_FILE = 'index.json'
+
+# Fields of cUrJointData recorded by default
+JOINT_RECORDER_FIELDS = ('q_actual_', 'qd_actual_', 'i_actual_', 't_motor_',
+                         't_micro_')
+
+
+def _column_file(_directory, _segment, _column):
+    return os.path.join(_directory,
+                        '{:06d}_{}.npy'.format(_segment, _column.strip('_')))
+
+
+class cUrJointRecorder(object):
+    '''
+        Records cUrJointData samples into preallocated columns, a N x 6
+        float64 array for each field plus a timestamp column. The columns
+        are .npy files mapped in memory, when they are full the recorder
+        rolls over to a new segment, so memory use does not grow with the
+        length of the recording.
+        The recorded data is read with cUrJointRecording.
+        self.directory_    (str) directory of the recording
+        self.segment_size_ (int) number of samples of each segment
+        self.fields_       (tuple) names of the recorded cUrJointData fields
+        self.count_        (int) samples in the current segment
+    '''
+
+    def __init__(self,
+                 _directory,
+                 _segment_size=125 * 600,
+                 _fields=JOINT_RECORDER_FIELDS):
+        """__init__
+
+        :param _directory: directory where the segments are written. If it
+            already contains a recording, the new segments are appended.
+        :param _segment_size: number of samples of each segment
+        :param _fields: names of the cUrJointData fields to record
+        """
+        self.directory_ = _directory
+        self.segment_size_ = _segment_size
+        self.fields_ = tuple(_fields)
+
+        os.makedirs(_directory, exist_ok=True)
+        self.index_ = _read_index(_directory)
+        if self.index_ is None:
+            self.index_ = {'fields': list(self.fields_), 'segments': []}
+        elif self.index_['fields'] != list(self.fields_):
+            raise ValueError('The recording in ' + _directory +
+                             ' has different fields')
+
+        self.segment_ = None
+        self.time_ = None
+        self.columns_ = None
+        self.count_ = 0
+
+    def record(self, _joint_data, _t=None):
+        """Write a sample in the current segment.
+
+        :param _joint_data: cUrJointData
+        :param _t: timestamp of the sample. By default time.time()
+        """
+        if self.columns_ is None or self.count_ == self.segment_size_:
+            self._rollover()
+        row = self.count_
+        self.time_[row] = time.time() if _t is None else _t
+        for name, column in self.columns_:
+            column[row] = getattr(_joint_data, name)
+        self.count_ += 1
+
+    def flush(self):
+        """Flush the current segment to disk and update the index."""
+        if self.columns_ is None:
+            return
+        self.time_.flush()
+        for _, column in self.columns_:
+            column.flush()
+        self.index_['segments'][-1]['count'] = self.count_
+        _write_index(self.directory_, self.index_)
+
+    def close(self):
+        """Flush and unmap the current segment."""
+        self.flush()
+        self.segment_ = None
+        self.time_ = None
+        self.columns_ = None
+        self.count_ = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def _rollover(self):
+        self.close()
+        segments = self.index_['segments']
+        self.segment_ = segments[-1]['segment'] + 1 if segments else 0
+        segments.append({
+            'segment': self.segment_,
+            'size': self.segment_size_,
+            'count': 0
+        })
+        open_memmap = np.lib.format.open_memmap
+        self.time_ = open_memmap(
+            _column_file(self.directory_, self.segment_, 't'),
+            mode='w+',
+            dtype=np.float64,
+            shape=(self.segment_size_, ))
+        self.columns_ = [(name,
+                          open_memmap(_column_file(self.directory_,
+                                                   self.segment_, name),
+                                      mode='w+',
+                                      dtype=np.float64,
+                                      shape=(self.segment_size_, 6)))
+                         for name in self.fields_]
+        _write_index(self.directory_, self.index_)
+
+
+class cUrJointRecording(object):
+    '''
+        Read-only access to the data written by cUrJointRecorder. The
+        segments are mapped in memory, so reading them does not copy the
+        data.
+        self.fields_ (tuple) names of the recorded fields
+    '''
+
+    def __init__(self, _directory):
+        self.directory_ = _directory
+        self.index_ = _read_index(_directory)
+        if self.index_ is None:
+            raise ValueError('No recording found in ' + _directory)
+        self.fields_ = tuple(self.index_['fields'])
+
+    def __len__(self):
+        return sum(s['count'] for s in self.index_['segments'])
+
+    def segments(self):
+        """Generator yielding a dict per segment which maps 't' and the
+        recorded fields to read-only memory-mapped arrays with the
+        samples of the segment."""
+        for s in self.index_['segments']:
+            count = s['count']
+            result = {}
+            for name in ('t', ) + self.fields_:
+                column = np.load(_column_file(self.directory_, s['segment'],
+                                              name),
+                                 mmap_mode='r')
+                result[name] = column[:count]
+            yield result
+
+    def get(self, _field):
+        """Return all the samples of _field in a single array. Unlike
+        segments, this copies the data.
+
+        :param _field: 't' or one of the recorded fields
+        """
+        return np.concatenate([s[_field] for s in self.segments()])
+
+
+def _read_index(_directory):
+    path = os.path.join(_directory, _INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_index(_directory, _index):
+    path = os.path.join(_directory, _INDEX_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(_index, f)
+    os.replace(path + '.tmp', path)
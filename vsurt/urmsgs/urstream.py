@@ -0,0 +1,156 @@
+'''
+    This module contains a long-lived client for the robot state messages
+    of the 30001-30002 ports.
+'''
+import copy
+import socket
+import struct
+import time
+
+from .urtransport import connect_tcp
+from .urmsgs import cUrMessage, cUrRobotState
+from .urmsgs import getRobotStatePacketIndex
+from .urmsgs import ROBOT_STATE, RS_DECODERS
+
+
+class cUrStateStream(object):
+    '''
+        Keeps a single connection open with the primary (or secondary)
+        interface of the UR and hands out the robot state messages at the
+        rate the controller publishes them.
+        If the connection drops the stream reconnects transparently.
+        self.ip_ (str) address of the robot
+        self.port_ (int) port of the interface
+        self.reconnects_ (int) number of times the stream has reconnected
+    '''
+
+    def __init__(self,
+                 _ip,
+                 _port=30001,
+                 _timeout=2.0,
+                 _reconnect=True,
+                 _reconnect_delay=0.5,
+                 _max_reconnects=None,
+                 _transport=None):
+        """__init__
+
+        :param _ip: address of the robot
+        :param _port: port of the interface
+        :param _timeout: socket timeout in seconds
+        :param _reconnect: reconnect if the connection is lost
+        :param _reconnect_delay: seconds to wait before reconnecting
+        :param _max_reconnects: consecutive failed reconnections before
+            giving up. None means forever.
+        :param _transport: function called without arguments to open the
+            connection, which returns a transport of urtransport, e.g.
+            lambda: cUrReplayTransport.from_capture(filename). By default a
+            TCP connection with _ip:_port. A replayed capture should be
+            read with _reconnect False, so it ends when it is exhausted.
+        """
+        self.ip_ = _ip
+        self.port_ = _port
+        self.timeout_ = _timeout
+        self.reconnect_ = _reconnect
+        self.reconnect_delay_ = _reconnect_delay
+        self.max_reconnects_ = _max_reconnects
+        self.transport_ = _transport
+
+        self.reconnects_ = 0
+        self.soc_ = None
+        self.msg_ = cUrMessage()
+
+    def connect(self):
+        ''' Open the connection with the robot if it is not open yet.'''
+        if self.soc_ is not None:
+            return
+        if self.transport_ is None:
+            self.soc_ = connect_tcp(self.ip_, self.port_, self.timeout_)
+        else:
+            self.soc_ = self.transport_()
+
+    def close(self):
+        ''' Close the connection with the robot.'''
+        if self.soc_ is not None:
+            self.soc_.close()
+            self.soc_ = None
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def next_message(self):
+        """Block until the next ROBOT_STATE message arrives and return it.
+        The returned cUrMessage is reused by the following call.
+        """
+        failures = 0
+        while True:
+            try:
+                self.connect()
+                self.msg_.get(self.soc_)
+            except (socket.error, struct.error, ValueError):
+                self.close()
+                if not self.reconnect_:
+                    raise
+                if self.max_reconnects_ is not None and \
+                        failures >= self.max_reconnects_:
+                    raise
+                failures += 1
+                self.reconnects_ += 1
+                time.sleep(self.reconnect_delay_)
+                continue
+            if self.msg_.type_ == ROBOT_STATE:
+                return self.msg_
+
+    def next_packet(self, _type):
+        """Block until a robot state packet of type _type arrives and return
+        it as a cUrRobotStatePacket.
+
+        :param _type: type of the robot state packet, e.g. JOINT_DATA
+        """
+        while True:
+            msg = self.next_message()
+            pac = getRobotStatePacketIndex(msg, (_type, )).get(_type)
+            if pac is not None:
+                return pac
+
+    def next_state(self, _types=None):
+        """Block until the next ROBOT_STATE message and return its decoded
+        packets.
+
+        :param _types: container with the packet types to decode. By
+            default all the types registered in RS_DECODERS. ValueError
+            is raised for a type without decoder, see register_rs_decoder.
+        :return: dict mapping the packet type to the decoded instance
+            (cUrJointData, cUrCartesianInfo, ...)
+        """
+        if _types is None:
+            _types = RS_DECODERS
+        unknown = [t for t in _types if t not in RS_DECODERS]
+        if unknown:
+            raise ValueError('No decoder registered for the packet types ' +
+                             str(unknown))
+        msg = self.next_message()
+        packets = getRobotStatePacketIndex(msg, _types)
+        return {t: RS_DECODERS[t](pac.data_) for t, pac in packets.items()}
+
+    def next_snapshot(self):
+        """Block until the next ROBOT_STATE message and return it as a
+        cUrRobotState. The snapshot views a copy of the message, so it stays
+        valid after the next message is read.
+        """
+        msg = self.next_message()
+        return cUrRobotState(copy.copy(msg).unpack(bytes(msg.data_)))
+
+    def states(self, _types=None):
+        """Generator yielding next_state(_types) forever.
+
+        :param _types: see next_state
+        """
+        while True:
+            yield self.next_state(_types)
+
+    def __iter__(self):
+        return self.states()
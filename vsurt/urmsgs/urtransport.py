@@ -0,0 +1,83 @@
+'''
+    This module contains the transports of the byte streams of the UR
+    interfaces. rtde.RTDE and the readers of the primary interface
+    (cUrFrameReader, cUrStateStream) only use the methods below, so they
+    run unchanged over TCP, a Unix socket, or a capture replayed in memory
+    by urcapture.cUrReplayTransport:
+
+        recv_into(view)   receive into a writable buffer, return the number
+                          of bytes received, 0 when the stream is closed
+        sendall(data)     send all the bytes of data
+        readable(timeout) True if recv_into will not block, waiting at most
+                          timeout seconds
+        writable(timeout) True if sendall will not block, waiting at most
+                          timeout seconds
+        close()
+
+    Failures raise OSError, as a socket does.
+'''
+import select
+import socket
+
+
+class cUrSocketTransport(object):
+    '''
+        Transport over a connected stream socket.
+        self.soc_ (socket.socket) the socket
+    '''
+
+    def __init__(self, _soc):
+        """__init__
+
+        :param _soc: connected stream socket
+        """
+        self.soc_ = _soc
+        # bound once, they are called for every packet
+        self.recv_into = _soc.recv_into
+        self.sendall = _soc.sendall
+
+    def readable(self, _timeout):
+        readable, _, _ = select.select([self.soc_], [], [], _timeout)
+        return len(readable) != 0
+
+    def writable(self, _timeout):
+        _, writable, _ = select.select([], [self.soc_], [], _timeout)
+        return len(writable) != 0
+
+    def fileno(self):
+        return self.soc_.fileno()
+
+    def close(self):
+        self.soc_.close()
+
+
+def connect_tcp(_host, _port, _timeout=None):
+    """Open a TCP connection with Nagle's algorithm disabled.
+
+    :param _host: address of the robot
+    :param _port: port of the interface
+    :param _timeout: socket timeout in seconds, None blocks
+    :return: cUrSocketTransport
+    """
+    soc = socket.create_connection((_host, _port), _timeout)
+    soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    soc.settimeout(_timeout)
+    return cUrSocketTransport(soc)
+
+
+def connect_unix(_path, _timeout=None):
+    """Open a connection with a Unix stream socket, e.g. a proxy or a
+    simulator on the same host.
+
+    :param _path: path of the socket
+    :param _timeout: socket timeout in seconds, None blocks
+    :return: cUrSocketTransport
+    """
+    soc = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        soc.settimeout(_timeout)
+        soc.connect(_path)
+    except OSError:
+        soc.close()
+        raise
+    return cUrSocketTransport(soc)